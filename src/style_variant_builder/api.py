@@ -0,0 +1,192 @@
+"""
+Build style variants in memory, without files or directories.
+
+    from style_variant_builder.api import build_variant
+
+    result = build_variant(template_bytes, diff_bytes)
+    if result.ok:
+        publish(result.data)
+    for diagnostic in result.diagnostics:
+        print(diagnostic)
+
+Every call works on its own copies of the documents, so the functions can be
+called from several threads at once.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+from lxml import etree
+
+from style_variant_builder.patch import (
+    LineMap,
+    PatchError,
+    apply_unified_diff,
+    split_lines,
+)
+from style_variant_builder.prune import CSLPruner, MacroGraph
+
+ERROR = "error"
+WARNING = "warning"
+INFO = "info"
+
+
+@dataclass(frozen=True, slots=True)
+class Diagnostic:
+    """A message about one stage of a build."""
+
+    severity: str  # ERROR, WARNING or INFO
+    stage: str  # "patch", "parse" or "prune"
+    message: str
+    # The line of the patched document the message refers to, if any
+    line: int | None = None
+
+    def __str__(self) -> str:
+        location = f" (line {self.line})" if self.line is not None else ""
+        return f"{self.severity}: {self.stage}: {self.message}{location}"
+
+
+@dataclass(frozen=True, slots=True)
+class VariantResult:
+    """The output of a build, or None if it failed, and its diagnostics."""
+
+    data: bytes | None
+    diagnostics: tuple[Diagnostic, ...] = ()
+
+    @property
+    def ok(self) -> bool:
+        return self.data is not None
+
+    @property
+    def errors(self) -> tuple[Diagnostic, ...]:
+        return tuple(d for d in self.diagnostics if d.severity == ERROR)
+
+
+def build_variant(
+    template: bytes,
+    diff: bytes,
+    *,
+    development: bool = False,
+    merge_macros: bool = False,
+    inline_macros: bool = False,
+    template_name: str = "template.csl",
+) -> VariantResult:
+    """
+    Apply `diff` to `template` and return the pruned variant.
+
+    With `development`, the patched style is returned as it is, without
+    pruning or reformatting. After pruning, `merge_macros` merges macros
+    with the same body, and `inline_macros` inlines single-use and trivial
+    macros. `template_name` is only used in the messages of the patch stage.
+    """
+    diagnostics: list[Diagnostic] = []
+    notes: list[str] = []
+    line_map = LineMap()
+    try:
+        # Normalize to LF so patches apply regardless of platform line endings
+        template = template.replace(b"\r\n", b"\n")
+        lines = split_lines(template)
+        patched = b"".join(
+            apply_unified_diff(
+                lines,
+                diff,
+                filename=template_name,
+                notes=notes,
+                line_map=line_map,
+            )
+        )
+    except PatchError as e:
+        return VariantResult(None, (Diagnostic(ERROR, "patch", str(e)),))
+    diagnostics.extend(Diagnostic(WARNING, "patch", note) for note in notes)
+    if development:
+        return VariantResult(patched, tuple(diagnostics))
+    return _prune(
+        patched,
+        diagnostics,
+        merge_macros,
+        inline_macros,
+        _macro_graph(template),
+        line_map,
+    )
+
+
+def prune_style(
+    style: bytes, *, merge_macros: bool = False, inline_macros: bool = False
+) -> VariantResult:
+    """Remove the unused macros of a style and return it reformatted.
+
+    `merge_macros` and `inline_macros` work as for `build_variant()`.
+    """
+    return _prune(style, [], merge_macros, inline_macros)
+
+
+# Variants of the same template are usually built one after another
+@lru_cache(maxsize=8)
+def _macro_graph(template: bytes) -> MacroGraph | None:
+    return MacroGraph.from_bytes(template)
+
+
+def _prune(
+    data: bytes,
+    diagnostics: list[Diagnostic],
+    merge_macros: bool = False,
+    inline_macros: bool = False,
+    graph: MacroGraph | None = None,
+    line_map: LineMap | None = None,
+) -> VariantResult:
+    try:
+        pruner = CSLPruner.from_bytes(data)
+    except etree.XMLSyntaxError as e:
+        diagnostics.append(Diagnostic(ERROR, "parse", e.msg, e.lineno))
+        return VariantResult(None, tuple(diagnostics))
+    except ValueError as e:
+        diagnostics.append(Diagnostic(ERROR, "parse", str(e)))
+        return VariantResult(None, tuple(diagnostics))
+    if flattened := pruner.flatten_layout_macros():
+        diagnostics.append(
+            Diagnostic(
+                INFO,
+                "prune",
+                f"Inlined the macros of {flattened} "
+                f"{'layout' if flattened == 1 else 'layouts'}",
+            )
+        )
+    macros = len(pruner.macro_defs)
+    pruner.prune_macros(graph, line_map)
+    if removed := macros - len(pruner.macro_defs):
+        diagnostics.append(
+            Diagnostic(
+                INFO,
+                "prune",
+                f"Removed {removed} unused "
+                f"{'macro' if removed == 1 else 'macros'}",
+            )
+        )
+    if terms := pruner.prune_locale_terms():
+        diagnostics.append(
+            Diagnostic(
+                INFO,
+                "prune",
+                f"Removed {terms} unused locale "
+                f"{'term' if terms == 1 else 'terms'}",
+            )
+        )
+    if merge_macros and (merged := pruner.merge_duplicate_macros()):
+        diagnostics.append(
+            Diagnostic(
+                INFO,
+                "prune",
+                f"Merged {merged} duplicate "
+                f"{'macro' if merged == 1 else 'macros'}",
+            )
+        )
+    if inline_macros and (inlined := pruner.inline_macros()):
+        diagnostics.append(
+            Diagnostic(
+                INFO,
+                "prune",
+                f"Inlined {inlined} macro "
+                f"{'call' if inlined == 1 else 'calls'}",
+            )
+        )
+    return VariantResult(pruner.to_bytes(), tuple(diagnostics))
@@ -0,0 +1,170 @@
+"""
+Stream build outputs into a zip or tar archive that is byte-for-byte reproducible.
+"""
+
+import gzip
+import io
+import os
+import tarfile
+import tempfile
+import time
+import zipfile
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+
+from style_variant_builder.cache import file_mode
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+# The earliest time a zip archive can record
+ZIP_EPOCH = 315532800  # 1980-01-01T00:00:00Z
+MEMBER_MODE = 0o644
+
+
+class ArchiveError(Exception):
+    """Raised when an output archive cannot be created."""
+
+
+def archive_format(path: Path) -> str:
+    """Return "zip", "tar" or "tar.gz" for the name of `path`."""
+    name = path.name.lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith((".tar.gz", ".tgz")):
+        return "tar.gz"
+    if name.endswith(".tar"):
+        return "tar"
+    raise ArchiveError(
+        f"Unsupported archive type: {path.name} "
+        f"(expected one of {', '.join(ARCHIVE_SUFFIXES)})"
+    )
+
+
+def archive_timestamp() -> int:
+    """Return the modification time recorded for every member.
+
+    This is SOURCE_DATE_EPOCH if it is set, as for reproducible builds, and
+    otherwise the earliest time a zip archive can hold.
+    """
+    try:
+        return max(int(os.environ["SOURCE_DATE_EPOCH"]), ZIP_EPOCH)
+    except (KeyError, ValueError):
+        return ZIP_EPOCH
+
+
+@dataclass(slots=True)
+class OutputArchive:
+    """An archive that members are added to in the order they were expected.
+
+    Members are announced with `expect()` as their tasks are discovered, and
+    written as soon as they and every member announced before them have been
+    added, so the archive does not depend on the order in which tasks
+    complete. The archive is written to a temporary file, which replaces
+    `path` on `close()`.
+    """
+
+    path: Path
+    timestamp: int = field(default_factory=archive_timestamp)
+    members: int = 0
+    _expected: deque[str] = field(default_factory=deque, repr=False)
+    _ready: dict[str, bytes | None] = field(default_factory=dict, repr=False)
+    _tmp_path: Path | None = field(default=None, repr=False)
+    _raw: BinaryIO | None = field(default=None, repr=False)
+    _gzip: gzip.GzipFile | None = field(default=None, repr=False)
+    _zip: zipfile.ZipFile | None = field(default=None, repr=False)
+    _tar: tarfile.TarFile | None = field(default=None, repr=False)
+
+    def open(self) -> "OutputArchive":
+        kind = archive_format(self.path)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(
+                dir=self.path.parent, prefix=f".{self.path.name}."
+            )
+        except OSError as e:
+            raise ArchiveError(f"Unable to create {self.path}: {e}") from e
+        self._tmp_path = Path(tmp_name)
+        self._raw = os.fdopen(fd, "wb")
+        if kind == "zip":
+            self._zip = zipfile.ZipFile(
+                self._raw, "w", compression=zipfile.ZIP_DEFLATED
+            )
+            return self
+        fileobj: BinaryIO = self._raw
+        if kind == "tar.gz":
+            # No file name and a fixed time in the gzip header
+            self._gzip = gzip.GzipFile(
+                filename="", mode="wb", fileobj=self._raw, mtime=self.timestamp
+            )
+            fileobj = self._gzip
+        self._tar = tarfile.open(
+            fileobj=fileobj, mode="w", format=tarfile.PAX_FORMAT
+        )
+        return self
+
+    def expect(self, name: str) -> None:
+        """Reserve the next place in the archive for the member `name`."""
+        self._expected.append(name)
+
+    def add(self, name: str, data: bytes) -> None:
+        """Add the member `name`, writing it once its turn has come."""
+        self._ready[name] = data
+        self._write_ready()
+
+    def discard(self, name: str) -> None:
+        """Give up the place of a member that will not be added."""
+        self._ready[name] = None
+        self._write_ready()
+
+    def _write_ready(self) -> None:
+        while self._expected and self._expected[0] in self._ready:
+            name = self._expected.popleft()
+            if (data := self._ready.pop(name)) is not None:
+                self._write(name, data)
+
+    def _write(self, name: str, data: bytes) -> None:
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, time.gmtime(self.timestamp)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.create_system = 3  # Unix, whatever the platform
+            info.external_attr = (0o100000 | MEMBER_MODE) << 16
+            self._zip.writestr(info, data)
+        elif self._tar is not None:
+            tar_info = tarfile.TarInfo(name)
+            tar_info.size = len(data)
+            tar_info.mtime = self.timestamp
+            tar_info.mode = MEMBER_MODE
+            self._tar.addfile(tar_info, io.BytesIO(data))
+        self.members += 1
+
+    def close(self) -> None:
+        """Write the members still waiting for earlier ones, and finish the archive."""
+        # Members whose tasks never ran do not hold up the ones after them
+        self._expected = deque(
+            name for name in self._expected if name in self._ready
+        )
+        try:
+            self._write_ready()
+            for part in (self._zip, self._tar, self._gzip, self._raw):
+                if part is not None:
+                    part.close()
+            if self._tmp_path is not None:
+                os.chmod(self._tmp_path, file_mode())
+                os.replace(self._tmp_path, self.path)
+                self._tmp_path = None
+        except OSError as e:
+            self.abort()
+            raise ArchiveError(f"Unable to write {self.path}: {e}") from e
+
+    def abort(self) -> None:
+        """Close the archive and delete it, leaving `path` untouched."""
+        for part in (self._zip, self._tar, self._gzip, self._raw):
+            if part is not None:
+                try:
+                    part.close()
+                except Exception:
+                    pass
+        if self._tmp_path is not None:
+            self._tmp_path.unlink(missing_ok=True)
+            self._tmp_path = None
@@ -0,0 +1,400 @@
+"""
+Measure the throughput of the builder on the bundled and generated corpora.
+
+Each corpus is built in production and development mode, and its diffs are
+regenerated from the development variants. Synthetic corpora scale the number
+of families, the variants per family, the template size and the depth of the
+macro graph one at a time, starting from a base corpus.
+
+    python -m style_variant_builder.benchmark --output bench.json
+    python -m style_variant_builder.benchmark --compare bench.json
+"""
+
+import argparse
+import difflib
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from style_variant_builder.build import (
+    TEMPLATE_SUFFIX,
+    BuildScheduler,
+    CSLBuilder,
+)
+from style_variant_builder.discovery import DiscoveryIndex
+from style_variant_builder.telemetry import TimingReport
+
+BENCHMARK_VERSION = 1
+KINDS = ("build", "development", "diffs")
+
+
+@dataclass(slots=True, frozen=True)
+class CorpusSpec:
+    """The shape of a generated corpus."""
+
+    families: int = 4
+    variants: int = 10  # Per family
+    macros: int = 100  # Per template
+    depth: int = 4  # Length of the macro call chains
+
+    @property
+    def name(self) -> str:
+        return (
+            f"synthetic-f{self.families}-v{self.variants}"
+            f"-m{self.macros}-d{self.depth}"
+        )
+
+
+BASE_SPEC = CorpusSpec()
+# Values each dimension takes while the others keep their base value
+SCALING = {
+    "families": (2, 8),
+    "variants": (5, 20),
+    "macros": (50, 200),
+    "depth": (2, 8),
+}
+
+
+def scaling_specs(base: CorpusSpec = BASE_SPEC) -> list[CorpusSpec]:
+    return [base] + [
+        replace(base, **{dimension: value})
+        for dimension, values in SCALING.items()
+        for value in values
+    ]
+
+
+def synthetic_template(spec: CorpusSpec) -> list[str]:
+    """Return the lines of a template with chains of `depth` nested macros.
+
+    The citation layout calls the first macro of every chain, so variants
+    that drop some of these calls leave whole chains for the pruner.
+    """
+    chains = range(0, spec.macros, spec.depth)
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>\n',
+        '<style xmlns="http://purl.org/net/xbiblio/csl" class="in-text" version="1.0">\n',
+        "  <info>\n",
+        "    <title>Synthetic template</title>\n",
+        "  </info>\n",
+    ]
+    for i in range(spec.macros):
+        lines.append(f'  <macro name="m{i}">\n')
+        if (i + 1) % spec.depth and i + 1 < spec.macros:
+            lines.append('    <group delimiter=" ">\n')
+            lines.append(f'      <text macro="m{i + 1}"/>\n')
+            lines.append(f'      <text variable="title" prefix="{i}"/>\n')
+            lines.append("    </group>\n")
+        else:
+            lines.append(f'    <text variable="title" prefix="{i}"/>\n')
+        lines.append("  </macro>\n")
+    lines.append("  <citation>\n")
+    lines.append('    <layout delimiter="; ">\n')
+    lines.extend(f'      <text macro="m{first}"/>\n' for first in chains)
+    lines.append("    </layout>\n")
+    lines.append("  </citation>\n")
+    lines.append("  <bibliography>\n")
+    lines.append("    <layout>\n")
+    lines.append('      <text macro="m0"/>\n')
+    lines.append("    </layout>\n")
+    lines.append("  </bibliography>\n")
+    lines.append("</style>\n")
+    return lines
+
+
+def synthetic_variant(template: list[str], index: int) -> list[str]:
+    """Return a variant of `template` that drops every third chain call."""
+    variant = []
+    calls = 0
+    in_citation = False
+    for line in template:
+        if line.strip() in ("<citation>", "</citation>"):
+            in_citation = not in_citation
+        elif in_citation and line.startswith('      <text macro="m'):
+            calls += 1
+            if (calls + index) % 3 == 0:
+                continue
+        variant.append(line)
+    variant[3] = f"    <title>Synthetic variant {index}</title>\n"
+    return variant
+
+
+def write_synthetic_corpus(root: Path, spec: CorpusSpec) -> tuple[Path, Path]:
+    """Write the templates and diffs of `spec` below `root`."""
+    templates_dir = root / "templates"
+    diffs_dir = root / "diffs"
+    templates_dir.mkdir(parents=True)
+    diffs_dir.mkdir(parents=True)
+    template = synthetic_template(spec)
+    for family_index in range(spec.families):
+        family = f"family{family_index}"
+        template_path = templates_dir / f"{family}{TEMPLATE_SUFFIX}"
+        template_path.write_text("".join(template), encoding="utf-8")
+        for index in range(spec.variants):
+            name = f"{family}-variant{index}"
+            diff = difflib.unified_diff(
+                template,
+                synthetic_variant(template, index),
+                fromfile=f"templates/{template_path.name}",
+                tofile=f"development/{name}.csl",
+            )
+            (diffs_dir / f"{name}.diff").write_text(
+                "".join(diff), encoding="utf-8"
+            )
+    return templates_dir, diffs_dir
+
+
+def _run(
+    kind: str,
+    templates_dir: Path,
+    diffs_dir: Path,
+    work_dir: Path,
+    max_workers: int | None,
+) -> tuple[float, list[CSLBuilder], TimingReport]:
+    """Run one kind of build from scratch and return its wall time."""
+    timing_report = TimingReport()
+    start = time.perf_counter()
+    development_dir = work_dir / "development"
+    index = (
+        DiscoveryIndex.scan(development_dir, ".csl")
+        if kind == "diffs"
+        else DiscoveryIndex.scan(diffs_dir, ".diff")
+    )
+    builders = [
+        CSLBuilder(
+            templates_dir=templates_dir,
+            diffs_dir=work_dir / "diffs" if kind == "diffs" else diffs_dir,
+            output_dir=work_dir / "output",
+            development_dir=development_dir,
+            style_family=template.name.removesuffix(TEMPLATE_SUFFIX),
+            export_development=kind == "development",
+            generate_diffs=kind == "diffs",
+            max_workers=max_workers,
+            diff_index=None if kind == "diffs" else index,
+            development_index=index if kind == "diffs" else None,
+            timing_report=timing_report,
+        )
+        for template in sorted(templates_dir.glob(f"*{TEMPLATE_SUFFIX}"))
+    ]
+    scheduler = BuildScheduler(builders, max_workers=max_workers)
+    if kind == "diffs":
+        scheduler.generate_diffs()
+    else:
+        scheduler.build_variants()
+    return time.perf_counter() - start, builders, timing_report
+
+
+def benchmark_corpus(
+    name: str,
+    templates_dir: Path,
+    diffs_dir: Path,
+    repeat: int = 3,
+    max_workers: int | None = None,
+) -> list[dict]:
+    """Time every kind of build of one corpus `repeat` times."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        for kind in KINDS:
+            times = []
+            for _ in range(repeat):
+                # The diffs are generated from the development variants
+                # of the last run, which must stay in place
+                if kind != "diffs":
+                    for directory in ("output", "development"):
+                        shutil.rmtree(work_dir / directory, ignore_errors=True)
+                else:
+                    shutil.rmtree(work_dir / "diffs", ignore_errors=True)
+                seconds, builders, timing_report = _run(
+                    kind, templates_dir, diffs_dir, work_dir, max_workers
+                )
+                times.append(seconds)
+            total = timing_report.to_dict()["total"]
+            fastest = min(times)
+            results.append(
+                {
+                    "benchmark": f"{name}/{kind}",
+                    "tasks": total["count"],
+                    "failed": sum(
+                        builder.failed_variants for builder in builders
+                    ),
+                    "seconds": {
+                        "min": round(fastest, 4),
+                        "median": round(statistics.median(times), 4),
+                        "max": round(max(times), 4),
+                    },
+                    "tasks_per_second": round(total["count"] / fastest, 2)
+                    if fastest
+                    else 0.0,
+                    # CPU seconds per stage of the last run
+                    "stages": {
+                        stage: round(values["cpu"]["total"], 4)
+                        for stage, values in total["stages"].items()
+                    },
+                }
+            )
+    return results
+
+
+def run_benchmarks(
+    templates_dir: Path | None,
+    diffs_dir: Path | None,
+    specs: list[CorpusSpec],
+    repeat: int = 3,
+    max_workers: int | None = None,
+) -> dict:
+    """Benchmark the bundled corpus (if given) and the synthetic corpora."""
+    results = []
+    if templates_dir is not None and diffs_dir is not None:
+        results.extend(
+            benchmark_corpus(
+                "bundled", templates_dir, diffs_dir, repeat, max_workers
+            )
+        )
+    for spec in specs:
+        with tempfile.TemporaryDirectory() as tmp:
+            spec_templates, spec_diffs = write_synthetic_corpus(Path(tmp), spec)
+            results.extend(
+                benchmark_corpus(
+                    spec.name, spec_templates, spec_diffs, repeat, max_workers
+                )
+            )
+    return {
+        "version": BENCHMARK_VERSION,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "max_workers": max_workers,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict) -> list[str]:
+    """Return one line per benchmark comparing the fastest times of two runs."""
+    previous = {
+        result["benchmark"]: result["seconds"]["min"]
+        for result in baseline.get("results", [])
+    }
+    lines = []
+    for result in current["results"]:
+        name = result["benchmark"]
+        seconds = result["seconds"]["min"]
+        if not previous.get(name):
+            lines.append(f"{name:<50} {seconds:>9.4f}s  (new)")
+            continue
+        change = (seconds - previous[name]) / previous[name] * 100
+        lines.append(
+            f"{name:<50} {previous[name]:>9.4f}s -> {seconds:>9.4f}s  {change:+6.1f}%"
+        )
+    return lines
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--templates-path",
+        "-T",
+        type=Path,
+        default=Path("templates"),
+        help="Directory containing the bundled CSL templates.",
+    )
+    parser.add_argument(
+        "--diffs-path",
+        "-D",
+        type=Path,
+        default=Path("diffs"),
+        help="Directory containing the bundled diff files.",
+    )
+    parser.add_argument(
+        "--no-bundled",
+        action="store_true",
+        help="Skip the bundled corpus.",
+    )
+    parser.add_argument(
+        "--no-synthetic",
+        action="store_true",
+        help="Skip the generated corpora.",
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="Only benchmark the base synthetic corpus, once.",
+    )
+    parser.add_argument(
+        "--repeat",
+        "-r",
+        type=int,
+        default=3,
+        help="Number of runs per benchmark; the fastest is compared.",
+    )
+    parser.add_argument(
+        "--max-workers",
+        "-w",
+        type=int,
+        default=None,
+        help="Maximum number of parallel workers.",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=Path,
+        default=None,
+        help="Write the results as JSON to this path instead of standard output.",
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        default=None,
+        help="Compare the results with an earlier JSON result file.",
+    )
+    args = parser.parse_args()
+
+    # Silence the per-variant progress output of the builder
+    logging.getLogger().setLevel(logging.WARNING)
+
+    bundled = not args.no_bundled and not args.quick
+    if bundled and not args.templates_path.is_dir():
+        logging.warning(
+            f"Skipping the bundled corpus: {args.templates_path} not found."
+        )
+        bundled = False
+    if args.no_synthetic:
+        specs = []
+    elif args.quick:
+        specs = [BASE_SPEC]
+    else:
+        specs = scaling_specs()
+    results = run_benchmarks(
+        args.templates_path if bundled else None,
+        args.diffs_path if bundled else None,
+        specs,
+        repeat=1 if args.quick else args.repeat,
+        max_workers=args.max_workers,
+    )
+
+    text = json.dumps(results, indent=2, sort_keys=True) + "\n"
+    if args.output is not None:
+        args.output.write_text(text, encoding="utf-8")
+    elif args.compare is None:
+        sys.stdout.write(text)
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare(baseline, results)))
+    return 1 if any(result["failed"] for result in results["results"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,22 +3,83 @@ Construct and manage Citation Style Language (CSL) variants.
 """
 
 import argparse
-import difflib
 import logging
-import shutil
-import subprocess
+import os
+import signal
 import sys
-import tempfile
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from contextlib import suppress
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    wait,
+)
 from dataclasses import dataclass, field
-from itertools import chain
+from itertools import chain, islice
 from pathlib import Path
+from typing import NamedTuple
 
-from style_variant_builder.prune import CSLPruner
+from style_variant_builder.archive import (
+    ArchiveError,
+    OutputArchive,
+    archive_format,
+)
+from style_variant_builder.cache import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_MAX_BYTES,
+    BuildCache,
+    DiffRecords,
+    cache_key,
+    content_hash,
+)
+from style_variant_builder.changes import (
+    ChangeListError,
+    git_changed_files,
+    git_file_at,
+    read_changed_files,
+)
+from style_variant_builder.discovery import DiscoveryIndex
+from style_variant_builder.executors import (
+    AUTO,
+    EXECUTORS,
+    PROCESS,
+    choose_executor,
+    create_executor,
+)
+from style_variant_builder.impact import HunkIndex, ImpactReport, analyse
+from style_variant_builder.linediff import (
+    DEFAULT_ENGINE,
+    ENGINES,
+    intern_lines,
+    opcodes_from_hunks,
+    unified_diff,
+)
+from style_variant_builder.outputs import (
+    UNCHANGED,
+    OutputReport,
+    write_if_changed,
+)
+from style_variant_builder.patch import (
+    LineMap,
+    PatchError,
+    apply_unified_diff,
+    parse_unified_diff,
+    split_lines,
+)
+from style_variant_builder.prune import CSLPruner, MacroGraph
+from style_variant_builder.telemetry import TaskTimings, TimingReport
+from style_variant_builder.watch import (
+    DEFAULT_DEBOUNCE,
+    DirectoryWatcher,
+    watch,
+)
 
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 TEMPLATE_SUFFIX = "-template.csl"
+# Tasks submitted per worker ahead of completion; keeps workers busy without
+# queueing the whole corpus in the pool
+IN_FLIGHT_PER_WORKER = 4
 
 
 class ColourFormatter(logging.Formatter):
@@ -63,6 +124,131 @@ _error_count_filter = ErrorCountingFilter()
 logging.getLogger().addFilter(_error_count_filter)
 
 
+@dataclass(frozen=True, slots=True)
+class TemplateData:
+    """The contents of a template, normalized to LF line endings."""
+
+    data: bytes
+    lines: list[bytes]
+    text_lines: list[str]
+    # The text lines interned to integer IDs for the Myers diff engine
+    line_ids: list[int]
+    line_table: dict[str, int]
+
+
+# Templates loaded by this process, keyed on path and validated by mtime/size
+_loaded_templates: dict[Path, tuple[int, int, TemplateData]] = {}
+
+
+def load_template(template_path: Path) -> TemplateData:
+    """
+    Return the contents of a template, reading it at most once per process.
+
+    Tasks only carry the template path, so each worker reads a template once
+    rather than receiving a copy of it with every task.
+    """
+    stat = template_path.stat()
+    cached = _loaded_templates.get(template_path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    # Normalize to LF so patches apply regardless of platform line endings
+    data = template_path.read_bytes().replace(b"\r\n", b"\n")
+    lines = split_lines(data)
+    text_lines = [line.decode("utf-8") for line in lines]
+    line_table: dict[str, int] = {}
+    template = TemplateData(
+        data,
+        lines,
+        text_lines,
+        intern_lines(text_lines, line_table),
+        line_table,
+    )
+    _loaded_templates[template_path] = (
+        stat.st_mtime_ns,
+        stat.st_size,
+        template,
+    )
+    return template
+
+
+# Macro graphs of the templates loaded by this process, or None for templates
+# that cannot have one, with the template contents they were built from
+_macro_graphs: dict[Path, tuple[TemplateData, MacroGraph | None]] = {}
+
+
+def load_macro_graph(
+    template_path: Path, template: TemplateData
+) -> MacroGraph | None:
+    """Return the macro graph of a template, building it at most once per process.
+
+    `template` is the template as loaded by `load_template()`. Variants are
+    pruned by updating the graph with the elements their diffs change,
+    rather than by reading every macro of every variant.
+    """
+    cached = _macro_graphs.get(template_path)
+    if cached is not None and cached[0] is template:
+        return cached[1]
+    graph = MacroGraph.from_bytes(template.data)
+    _macro_graphs[template_path] = (template, graph)
+    return graph
+
+
+def render_diff(
+    template: TemplateData,
+    template_path: Path,
+    dev_file: Path,
+    dev_lines: list[str],
+    previous: bytes | None,
+    engine: str = DEFAULT_ENGINE,
+) -> list[str]:
+    """
+    Return the lines of the diff from a template to a development file.
+
+    If the `previous` diff still turns the template into the development
+    file exactly, its hunks are kept, so that diffs only change when the
+    development file does. Otherwise `engine` computes a new diff.
+    """
+    opcodes = None
+    if previous is not None:
+        try:
+            opcodes = opcodes_from_hunks(
+                parse_unified_diff(previous), template.text_lines, dev_lines
+            )
+        except (PatchError, UnicodeDecodeError):
+            pass
+    if opcodes is None:
+        opcodes = ENGINES[engine](
+            template.text_lines,
+            dev_lines,
+            template.line_ids,
+            template.line_table,
+        )
+    return list(
+        unified_diff(
+            template.text_lines,
+            dev_lines,
+            fromfile=str(template_path),
+            tofile=str(dev_file),
+            opcodes=opcodes,
+        )
+    )
+
+
+class TaskResult(NamedTuple):
+    """The outcome of building one variant or generating one diff."""
+
+    name: str
+    success: bool
+    message: str
+    # The file that was written or found up to date, and which of the two
+    output: Path | None = None
+    status: str | None = None
+    # Stage timings, unless the result was restored from the build cache
+    timings: TaskTimings | None = None
+    # The output bytes, when they go into an archive instead of a file
+    data: bytes | None = None
+
+
 @dataclass(slots=True)
 class CSLBuilder:
     """Builder for CSL style variants with parallel processing support."""
@@ -75,51 +261,110 @@ class CSLBuilder:
     export_development: bool = False
     generate_diffs: bool = False
     group_by_family: bool = True
+    # Merge macros with the same body in pruned variants
+    merge_macros: bool = False
+    # Inline single-use and trivial macros into pruned variants
+    inline_macros: bool = False
     max_workers: int | None = None
+    # Executor backend, one of EXECUTORS
+    backend: str = AUTO
+    cache: BuildCache | None = None
+    # Name of the line-diff engine used to generate diffs
+    diff_engine: str = DEFAULT_ENGINE
+    # Hashes of previously generated diffs, to skip unchanged pairs
+    diff_records: DiffRecords | None = None
+    diff_index: DiscoveryIndex | None = None
+    development_index: DiscoveryIndex | None = None
+    # Names of the diff or development files to process; None selects all
+    selected_files: frozenset[str] | None = None
+    # Collects the output files written by this builder
+    report: OutputReport | None = None
+    # Receives the outputs instead of the output directories, if set
+    archive: OutputArchive | None = None
+    # Collects the stage timings of the tasks of this builder
+    timing_report: TimingReport | None = None
     successful_variants: int = 0
     failed_variants: int = 0
     failure_messages: list[str] = field(default_factory=list)
+    # Development file name -> (path, template hash, development hash) of
+    # the diff tasks in flight, to update `diff_records` with their results
+    _diff_hashes: dict[str, tuple[Path, str, str]] = field(
+        default_factory=dict, repr=False
+    )
 
     @staticmethod
     def _generate_single_diff(
         dev_file: Path,
-        template_lines: list[str],
         template_path: Path,
         diffs_dir: Path,
-    ) -> tuple[str, bool, str]:
+        engine: str = DEFAULT_ENGINE,
+    ) -> TaskResult:
         """
         Generate a diff file for a single development file.
 
-        Returns: (filename, success, message)
+        The diff file is only written if its content changed.
         """
+        timings = TaskTimings()
+        diff_path = diffs_dir / dev_file.with_suffix(".diff").name
         try:
-            with dev_file.open("r", encoding="utf-8") as df:
-                dev_lines = df.readlines()
+            with timings.stage("read"):
+                template = load_template(template_path)
+                dev_data = dev_file.read_bytes().replace(b"\r\n", b"\n")
+            timings.sizes["development"] = len(dev_data)
+            # Comparing bytes checks the sizes first
+            if dev_data == template.data:
+                return TaskResult(
+                    dev_file.name,
+                    True,
+                    f"  ≈ {dev_file.stem}",
+                    timings=timings,
+                )
 
-            diff = list(
-                difflib.unified_diff(
-                    template_lines,
+            with timings.stage("read"):
+                dev_lines = [
+                    line.decode("utf-8") for line in split_lines(dev_data)
+                ]
+                try:
+                    previous = diff_path.read_bytes()
+                except FileNotFoundError:
+                    previous = None
+
+            with timings.stage("diff"):
+                diff = render_diff(
+                    template,
+                    template_path,
+                    dev_file,
                     dev_lines,
-                    fromfile=str(template_path),
-                    tofile=str(dev_file),
-                    lineterm="\n",
+                    previous,
+                    engine,
                 )
-            )
 
             if not diff:
-                return (
+                return TaskResult(
                     dev_file.name,
                     True,
                     f"  ≈ {dev_file.stem}",
+                    timings=timings,
                 )
 
-            diff_path = diffs_dir / dev_file.with_suffix(".diff").name
-            diffs_dir.mkdir(parents=True, exist_ok=True)
-            diff_path.write_text("".join(diff), encoding="utf-8")
-            return (dev_file.name, True, f"  ✓ {diff_path.name}")
+            with timings.stage("write"):
+                data = "".join(diff).encode("utf-8")
+                diffs_dir.mkdir(parents=True, exist_ok=True)
+                status = write_if_changed(diff_path, data)
+            timings.sizes["diff"] = len(data)
+            return TaskResult(
+                dev_file.name,
+                True,
+                f"  ✓ {diff_path.name}",
+                diff_path,
+                status,
+                timings,
+            )
 
         except Exception as e:
-            return (dev_file.name, False, f"Error generating diff: {e}")
+            return TaskResult(
+                dev_file.name, False, f"Error generating diff: {e}"
+            )
 
     @staticmethod
     def _process_single_diff(
@@ -128,99 +373,175 @@ class CSLBuilder:
         target_output_dir: Path,
         development_dir: Path | None,
         export_development: bool,
-    ) -> tuple[str, bool, str]:
+        cache_dir: Path | None = None,
+        cache_key: str | None = None,
+        to_archive: bool = False,
+        merge_macros: bool = False,
+        inline_macros: bool = False,
+    ) -> TaskResult:
         """
         Process a single diff file in a worker process.
 
-        Returns: (diff_name, success, message)
+        The variant is only written if its content changed. With `to_archive`,
+        it is returned in the result instead of being written. If `cache_dir`
+        and `cache_key` are given, the result is stored in the build cache
+        under that key. After pruning, `merge_macros` merges macros with the
+        same body, and `inline_macros` inlines single-use and trivial macros.
         """
-        patched_file = None
+        timings = TaskTimings()
         try:
-            # Apply the patch
-            if not shutil.which("patch"):
-                return (
-                    diff_path.name,
-                    False,
-                    "Required command 'patch' not found in PATH.",
-                )
-
-            with tempfile.NamedTemporaryFile(
-                delete=False, mode="w+", encoding="utf-8"
-            ) as tmp_file:
-                shutil.copy(template_path, tmp_file.name)
-                tmp_file_path = Path(tmp_file.name)
-
-            # Normalize to LF so patch works regardless of platform line endings
-            tmp_file_path.write_bytes(
-                tmp_file_path.read_bytes().replace(b"\r\n", b"\n")
-            )
-
-            patched_file = tmp_file_path
-            result = subprocess.run(
-                ["patch", "-N", str(patched_file), str(diff_path)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-
-            if result.returncode != 0:
-                stdout_msg = result.stdout.strip()
-                stderr_msg = result.stderr.strip()
-                details = "\n".join(
-                    part
-                    for part in (
-                        stdout_msg if stdout_msg else None,
-                        stderr_msg if stderr_msg else None,
+            try:
+                with timings.stage("patch"):
+                    template = load_template(template_path)
+                    diff = diff_path.read_bytes()
+                    line_map = LineMap()
+                    patched = b"".join(
+                        apply_unified_diff(
+                            template.lines,
+                            diff,
+                            filename=template_path.name,
+                            line_map=line_map,
+                        )
                     )
-                    if part
-                )
-                return (
+            except PatchError as e:
+                return TaskResult(
                     diff_path.name,
                     False,
                     (
                         "Failed to apply patch "
                         f"(template={template_path.name}, diff={diff_path.name})."
-                        + (f"\n{details}" if details else "")
+                        f"\n{e}"
                     ),
                 )
+            timings.sizes["diff"] = len(diff)
+            timings.sizes["patched"] = len(patched)
 
             # Export or prune
             if export_development and development_dir is not None:
-                dev_variant = (
+                output_variant = (
                     development_dir / diff_path.with_suffix(".csl").name
                 )
-                shutil.copy(patched_file, dev_variant)
-                return (
-                    diff_path.name,
-                    True,
-                    f"  ✓ {dev_variant.stem}",
-                )
+                data = patched
             else:
                 output_variant = (
                     target_output_dir / diff_path.with_suffix(".csl").name
                 )
                 # Prune the variant
                 pruner = CSLPruner(
-                    input_path=patched_file,
+                    input_path=template_path,
                     output_path=output_variant,
                 )
-                pruner.parse_xml()
-                pruner.flatten_layout_macros()
-                pruner.prune_macros()
-                pruner.save()
-                return (
-                    diff_path.name,
-                    True,
-                    f"  ✓ {output_variant.stem}",
+                with timings.stage("parse"):
+                    pruner.parse_xml(patched)
+                with timings.stage("flatten"):
+                    pruner.flatten_layout_macros()
+                with timings.stage("prune"):
+                    pruner.prune_macros(
+                        load_macro_graph(template_path, template), line_map
+                    )
+                    pruner.prune_locale_terms()
+                if merge_macros:
+                    with timings.stage("merge"):
+                        pruner.merge_duplicate_macros()
+                if inline_macros:
+                    with timings.stage("inline"):
+                        pruner.inline_macros()
+                with timings.stage("serialize"):
+                    data = pruner.to_bytes()
+
+            with timings.stage("write"):
+                status = (
+                    None
+                    if to_archive
+                    else write_if_changed(output_variant, data)
                 )
+                if cache_dir is not None and cache_key is not None:
+                    BuildCache(cache_dir).put(cache_key, data)
+            timings.sizes["output"] = len(data)
+            return TaskResult(
+                diff_path.name,
+                True,
+                f"  ✓ {output_variant.stem}",
+                output_variant,
+                status,
+                timings,
+                data if to_archive else None,
+            )
 
         except Exception as e:
-            return (diff_path.name, False, f"Error processing diff: {e}")
+            return TaskResult(
+                diff_path.name, False, f"Error processing diff: {e}"
+            )
+
+    @staticmethod
+    def _check_single_diff(
+        diff_path: Path,
+        template_path: Path,
+        development_dir: Path,
+        engine: str = DEFAULT_ENGINE,
+    ) -> TaskResult:
+        """
+        Check a diff file in memory, without writing anything.
+
+        The diff must apply to its template, and diffing the result again
+        must give back the same bytes, as `--development` followed by
+        `--diffs` would.
+        """
+        timings = TaskTimings()
+        try:
+            with timings.stage("patch"):
+                template = load_template(template_path)
+                diff = diff_path.read_bytes()
+                try:
+                    patched = apply_unified_diff(
+                        template.lines, diff, filename=template_path.name
+                    )
+                except PatchError as e:
+                    return TaskResult(
+                        diff_path.name,
+                        False,
+                        (
+                            "Failed to apply patch "
+                            f"(template={template_path.name}, diff={diff_path.name})."
+                            f"\n{e}"
+                        ),
+                    )
+            timings.sizes["diff"] = len(diff)
 
-        finally:
-            if patched_file is not None:
-                with suppress(FileNotFoundError):
-                    patched_file.unlink()
+            with timings.stage("diff"):
+                regenerated = render_diff(
+                    template,
+                    template_path,
+                    development_dir / diff_path.with_suffix(".csl").name,
+                    [line.decode("utf-8") for line in patched],
+                    diff,
+                    engine,
+                )
+            if not regenerated:
+                return TaskResult(
+                    diff_path.name,
+                    False,
+                    "Diff does not change the template.",
+                    timings=timings,
+                )
+            if "".join(regenerated).encode("utf-8") != diff:
+                return TaskResult(
+                    diff_path.name,
+                    False,
+                    "Diff is not canonical; regenerating it with --diffs would change it.",
+                    timings=timings,
+                )
+            return TaskResult(
+                diff_path.name,
+                True,
+                f"  ✓ {diff_path.stem}",
+                timings=timings,
+            )
+
+        except Exception as e:
+            return TaskResult(
+                diff_path.name, False, f"Error checking diff: {e}"
+            )
 
     def _get_template_path(self) -> Path:
         template = self.templates_dir / f"{self.style_family}-template.csl"
@@ -229,151 +550,499 @@ class CSLBuilder:
         return template
 
     def _get_diff_files(self) -> list[Path]:
-        # Collect diff files that match the expected naming convention.
-        filename_diffs = set(self.diffs_dir.glob(f"{self.style_family}*.diff"))
-        reference_diffs = []
-        # Also examine all diff files for an internal reference to the template.
-        for diff_file in self.diffs_dir.glob("*.diff"):
-            if diff_file in filename_diffs:
-                continue
-            try:
-                with diff_file.open("r", encoding="utf-8") as f:
-                    content = f.read()
-                # Check for a template reference line, for example rel="template" that contains the expected style family.
-                if (
-                    'rel="template"' in content
-                    and f"/{self.style_family}" in content
-                ):
-                    reference_diffs.append(diff_file)
-            except Exception as e:
-                logging.error(
-                    f"Error reading diff file {diff_file.name}: {e}",
-                    exc_info=True,
-                )
-        all_diffs = sorted(chain(filename_diffs, reference_diffs))
+        # Collect diff files that match the expected naming convention, or
+        # that refer to the template of this family.
+        if self.diff_index is None:
+            self.diff_index = DiscoveryIndex.scan(self.diffs_dir, ".diff")
+        all_diffs = self.diff_index.files_for_family(self.style_family)
         if not all_diffs:
             raise FileNotFoundError(
                 f"No diff files found for style family '{self.style_family}' in {self.diffs_dir}"
             )
         return all_diffs
 
-    def build_variants(self) -> tuple[int, int]:
-        try:
-            template_path = self._get_template_path()
-        except FileNotFoundError as e:
-            logging.warning(f"Skipping style family '{self.style_family}': {e}")
-            self.failure_messages.append(f"{self.style_family}: {e}")
-            return (0, 0)
-        try:
-            diff_files = self._get_diff_files()
-        except FileNotFoundError as e:
-            logging.warning(f"Skipping style family '{self.style_family}': {e}")
-            self.failure_messages.append(f"{self.style_family}: {e}")
-            return (0, 0)
+    def _select(self, files: list[Path]) -> list[Path]:
+        if self.selected_files is None:
+            return files
+        return [path for path in files if path.name in self.selected_files]
 
-        # Prepare output directory (optionally group by family)
-        target_output_dir = (
+    def _target_output_dir(self) -> Path:
+        return (
             self.output_dir / self.style_family
             if self.group_by_family
             else self.output_dir
         )
-        target_output_dir.mkdir(parents=True, exist_ok=True)
+
+    def _cache_mode(self) -> str:
         if self.export_development:
-            self.development_dir.mkdir(parents=True, exist_ok=True)
-
-        # Process diff files in parallel
-        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = [
-                executor.submit(
-                    CSLBuilder._process_single_diff,
-                    diff_path,
-                    template_path,
-                    target_output_dir,
-                    self.development_dir if self.export_development else None,
-                    self.export_development,
+            return "development"
+        mode = "pruned" if self.group_by_family else "pruned-flat"
+        if self.merge_macros:
+            mode += "-merged"
+        if self.inline_macros:
+            mode += "-inlined"
+        return mode
+
+    def _variant_path(self, diff_path: Path) -> Path:
+        directory = (
+            self.development_dir
+            if self.export_development
+            else self._target_output_dir()
+        )
+        return directory / diff_path.with_suffix(".csl").name
+
+    def _archive_name(self, diff_path: Path) -> str:
+        """Return the path of a variant within the output archive."""
+        root = (
+            self.development_dir if self.export_development else self.output_dir
+        )
+        return self._variant_path(diff_path).relative_to(root).as_posix()
+
+    def prepare_build_tasks(self) -> Iterator[tuple | TaskResult]:
+        """
+        Discover the variants of this family and prepare its output directories.
+
+        Returns an iterator that yields, one variant at a time, either the
+        argument tuple for `_process_single_diff` or, for a variant found in
+        the build cache, the result of restoring it.
+        Raises FileNotFoundError if the family has no template or no diffs.
+        """
+        template_path = self._get_template_path()
+        diff_files = self._select(self._get_diff_files())
+
+        # Prepare output directory (optionally group by family)
+        target_output_dir = self._target_output_dir()
+        if self.archive is None:
+            target_output_dir.mkdir(parents=True, exist_ok=True)
+            if self.export_development:
+                self.development_dir.mkdir(parents=True, exist_ok=True)
+        return self._iter_build_tasks(
+            template_path, diff_files, target_output_dir
+        )
+
+    def _iter_build_tasks(
+        self,
+        template_path: Path,
+        diff_files: list[Path],
+        target_output_dir: Path,
+    ) -> Iterator[tuple | TaskResult]:
+        template = template_path.read_bytes() if self.cache is not None else b""
+        archive = self.archive
+        for diff_path in diff_files:
+            if archive is not None:
+                # Outputs are archived in the order of discovery
+                archive.expect(self._archive_name(diff_path))
+            key = None
+            if self.cache is not None:
+                key = cache_key(
+                    template, diff_path.read_bytes(), self._cache_mode()
                 )
-                for diff_path in diff_files
-            ]
-
-            for future in as_completed(futures):
-                diff_name, success, message = future.result()
-                if success:
-                    logging.info(message)
-                    self.successful_variants += 1
-                else:
-                    logging.error(f"  ✗ {diff_name}: {message}")
-                    self.failed_variants += 1
-                    variant_name = Path(diff_name).stem
-                    self.failure_messages.append(
-                        f"{self.style_family}/{variant_name}: {message}"
+                if (data := self.cache.get(key)) is not None:
+                    variant = self._variant_path(diff_path)
+                    yield TaskResult(
+                        diff_path.name,
+                        True,
+                        f"  ✓ {variant.stem}",
+                        variant,
+                        (
+                            write_if_changed(variant, data)
+                            if archive is None
+                            else None
+                        ),
+                        data=None if archive is None else data,
+                    )
+                    continue
+            yield (
+                diff_path,
+                template_path,
+                target_output_dir,
+                self.development_dir if self.export_development else None,
+                self.export_development,
+                self.cache.directory if self.cache is not None else None,
+                key,
+                archive is not None,
+                self.merge_macros,
+                self.inline_macros,
+            )
+
+    def prepare_check_tasks(self) -> Iterator[tuple | TaskResult]:
+        """
+        Discover the diffs of this family.
+
+        Returns an iterator over the argument tuples for `_check_single_diff`.
+        Raises FileNotFoundError if the family has no template or no diffs.
+        """
+        template_path = self._get_template_path()
+        return (
+            (diff_path, template_path, self.development_dir, self.diff_engine)
+            for diff_path in self._select(self._get_diff_files())
+        )
+
+    def skip_build(self, error: FileNotFoundError) -> list[tuple[int, str]]:
+        self.failure_messages.append(f"{self.style_family}: {error}")
+        return [
+            (
+                logging.WARNING,
+                f"Skipping style family '{self.style_family}': {error}",
+            )
+        ]
+
+    def _record_output(self, result: TaskResult) -> None:
+        if self.archive is not None and result.data is not None:
+            self.archive.add(
+                self._archive_name(Path(result.name)), result.data
+            )
+        elif self.report is not None and result.output is not None:
+            self.report.add(result.status or UNCHANGED, result.output)
+        if self.timing_report is not None:
+            if result.timings is None:
+                self.timing_report.add_cached(self.style_family)
+            else:
+                self.timing_report.add(
+                    self.style_family,
+                    Path(result.name).stem,
+                    result.timings,
+                )
+
+    def record_build_result(self, result: TaskResult) -> list[tuple[int, str]]:
+        """Update the variant counters and return the log lines for a result."""
+        if result.success:
+            self.successful_variants += 1
+            self._record_output(result)
+            return [(logging.INFO, result.message)]
+        self.failed_variants += 1
+        if self.archive is not None:
+            self.archive.discard(self._archive_name(Path(result.name)))
+        variant_name = Path(result.name).stem
+        self.failure_messages.append(
+            f"{self.style_family}/{variant_name}: {result.message}"
+        )
+        return [(logging.ERROR, f"  ✗ {result.name}: {result.message}")]
+
+    def prepare_diff_tasks(self) -> Iterator[tuple | TaskResult]:
+        """
+        Discover the development files of this family.
+
+        Returns an iterator over the argument tuples for
+        `_generate_single_diff`.
+        Raises FileNotFoundError if the family has no template or no
+        development files.
+        """
+        template_path = self._get_template_path()
+
+        # Collect development files that match the expected naming
+        # convention, or that refer to the template of this family.
+        if self.development_index is None:
+            self.development_index = DiscoveryIndex.scan(
+                self.development_dir, ".csl"
+            )
+        dev_files = self._select(
+            self.development_index.files_for_family(self.style_family)
+        )
+
+        if not dev_files:
+            raise FileNotFoundError(
+                f"No development CSL files found in {self.development_dir}"
+            )
+
+        return self._iter_diff_tasks(template_path, dev_files)
+
+    def _iter_diff_tasks(
+        self, template_path: Path, dev_files: list[Path]
+    ) -> Iterator[tuple | TaskResult]:
+        records = self.diff_records
+        template_hash = (
+            content_hash(template_path.read_bytes()) if records is not None else ""
+        )
+        for dev_file in dev_files:
+            if records is not None:
+                dev_hash = content_hash(dev_file.read_bytes())
+                diff_path = self.diffs_dir / dev_file.with_suffix(".diff").name
+                if dev_hash == template_hash:
+                    yield TaskResult(dev_file.name, True, f"  ≈ {dev_file.stem}")
+                    continue
+                if records.is_current(
+                    dev_file, template_hash, dev_hash, diff_path
+                ):
+                    yield TaskResult(
+                        dev_file.name,
+                        True,
+                        f"  ✓ {diff_path.name}",
+                        diff_path,
+                        UNCHANGED,
                     )
+                    continue
+                self._diff_hashes[dev_file.name] = (
+                    dev_file,
+                    template_hash,
+                    dev_hash,
+                )
+            yield (dev_file, template_path, self.diffs_dir, self.diff_engine)
+
+    def skip_diffs(self, error: FileNotFoundError) -> list[tuple[int, str]]:
+        return [
+            (
+                logging.WARNING,
+                f"Skipping diff generation for style family '{self.style_family}': {error}",
+            )
+        ]
 
+    def record_diff_result(self, result: TaskResult) -> list[tuple[int, str]]:
+        """Return the log lines for a diff generation result."""
+        hashes = self._diff_hashes.pop(result.name, None)
+        if result.success:
+            self._record_output(result)
+            if (
+                self.diff_records is not None
+                and hashes is not None
+                and result.output is not None
+            ):
+                dev_file, template_hash, dev_hash = hashes
+                self.diff_records.update(
+                    dev_file,
+                    template_hash,
+                    dev_hash,
+                    content_hash(result.output.read_bytes()),
+                )
+            return [(logging.INFO, result.message)]
+        return [(logging.ERROR, f"  ✗ {result.name}: {result.message}")]
+
+    def expected_outputs(self) -> set[Path]:
+        """Return the variant paths of all diffs of this family."""
+        if self.diff_index is None:
+            return set()
+        return {
+            self._variant_path(diff_path)
+            for diff_path in self.diff_index.files_for_family(self.style_family)
+        }
+
+    def build_variants(self) -> tuple[int, int]:
+        BuildScheduler(
+            [self], max_workers=self.max_workers, backend=self.backend
+        ).build_variants()
         return (self.successful_variants, self.failed_variants)
 
     def generate_diff_files(self) -> None:
-        try:
-            template_path = self._get_template_path()
-        except FileNotFoundError as e:
-            logging.warning(
-                f"Skipping diff generation for style family '{self.style_family}': {e}"
-            )
-            return
+        BuildScheduler(
+            [self], max_workers=self.max_workers, backend=self.backend
+        ).generate_diffs()
+
+
+@dataclass(slots=True)
+class BuildScheduler:
+    """
+    Run the tasks of several style families through one shared executor.
 
-        # Collect development files that match the expected naming convention.
-        expected_dev_files = set(
-            self.development_dir.glob(f"{self.style_family}*.csl")
+    Tasks are discovered lazily, family by family, and at most `max_in_flight`
+    of them are submitted at a time, so memory use and the time to the first
+    result do not grow with the size of the corpus. Results are folded into
+    the counters of their builder as they complete. The log output of each
+    family is buffered and written as one block once its last task has
+    completed.
+    """
+
+    builders: list[CSLBuilder]
+    max_workers: int | None = None
+    # Executor backend, one of EXECUTORS; AUTO picks one from the first tasks
+    backend: str = AUTO
+    # A long-lived executor to use instead of starting one for this run
+    executor: Executor | None = None
+    # Maximum number of submitted but uncollected tasks; None scales with
+    # the number of workers
+    max_in_flight: int | None = None
+
+    def build_variants(self) -> None:
+        self._run(
+            CSLBuilder._process_single_diff,
+            CSLBuilder.prepare_build_tasks,
+            CSLBuilder.skip_build,
+            CSLBuilder.record_build_result,
         )
-        additional_dev_files = []
-        # Examine .csl files for internal references to the template.
-        for dev_file in self.development_dir.glob("*.csl"):
-            if dev_file in expected_dev_files:
-                continue
+
+    def generate_diffs(self) -> None:
+        self._run(
+            CSLBuilder._generate_single_diff,
+            CSLBuilder.prepare_diff_tasks,
+            CSLBuilder.skip_diffs,
+            CSLBuilder.record_diff_result,
+        )
+
+    def check_diffs(self) -> None:
+        self._run(
+            CSLBuilder._check_single_diff,
+            CSLBuilder.prepare_check_tasks,
+            CSLBuilder.skip_build,
+            CSLBuilder.record_build_result,
+        )
+
+    @staticmethod
+    def _emit(builder: CSLBuilder, lines: list[tuple[int, str]]) -> None:
+        logging.info(
+            f"Processing style family: \033[1;36m{builder.style_family}\033[0m"
+        )  # Cyan for style family
+        for level, message in lines:
+            logging.log(level, message)
+
+    def _run(
+        self,
+        worker: Callable[..., TaskResult],
+        prepare: Callable[[CSLBuilder], Iterator[tuple | TaskResult]],
+        skip: Callable[[CSLBuilder, FileNotFoundError], list[tuple[int, str]]],
+        record: Callable[[CSLBuilder, TaskResult], list[tuple[int, str]]],
+    ) -> None:
+        workers = self.max_workers or os.cpu_count() or 1
+        window = self.max_in_flight or workers * IN_FLIGHT_PER_WORKER
+        progress = _FamilyProgress(record)
+        tasks = self._discover(prepare, skip, progress)
+        # Discover the first window before starting an executor, so that
+        # small runs start no more workers than they have tasks
+        first = list(islice(tasks, window))
+        if not first:
+            return
+        tasks = chain(first, tasks)
+
+        if self.executor is not None:
+            self._collect(self.executor, worker, tasks, window, progress)
+            return
+        backend = self.backend
+        if backend == AUTO:
+            backend = choose_executor(
+                workers,
+                len(first),
+                _template_bytes(first),
+                more_tasks=len(first) == window,
+            )
+        logging.debug(f"Running {len(first)}+ tasks with the {backend} executor")
+        with create_executor(backend, min(workers, len(first))) as executor:
+            self._collect(executor, worker, tasks, window, progress)
+
+    def _discover(
+        self,
+        prepare: Callable[[CSLBuilder], Iterator[tuple | TaskResult]],
+        skip: Callable[[CSLBuilder, FileNotFoundError], list[tuple[int, str]]],
+        progress: "_FamilyProgress",
+    ) -> Iterator[tuple[CSLBuilder, tuple]]:
+        """Yield the (builder, task) pairs of every family, one at a time."""
+        for builder in self.builders:
             try:
-                with dev_file.open("r", encoding="utf-8") as f:
-                    content = f.read()
-                if (
-                    'rel="template"' in content
-                    and f"/{self.style_family}" in content
-                ):
-                    additional_dev_files.append(dev_file)
+                items = prepare(builder)
+            except FileNotFoundError as e:
+                self._emit(builder, skip(builder, e))
+                continue
             except Exception as e:
+                self._emit(builder, [])
+                builder.failed_variants += 1
+                builder.failure_messages.append(f"{builder.style_family}: {e}")
                 logging.error(
-                    f"Error reading development file {dev_file.name}: {e}",
+                    f"Error processing style family {builder.style_family}: {e}",
                     exc_info=True,
                 )
-        dev_files = sorted(chain(expected_dev_files, additional_dev_files))
+                continue
+            progress.open(builder)
+            try:
+                for item in items:
+                    if isinstance(item, TaskResult):
+                        progress.record(builder, item)
+                    else:
+                        progress.submitted(builder)
+                        yield builder, item
+            except Exception as e:
+                progress.fail(builder, e)
+            progress.close(builder)
 
-        if not dev_files:
-            logging.warning(
-                f"Skipping diff generation: No development CSL files found for style family '{self.style_family}' in {self.development_dir}"
+    @staticmethod
+    def _collect(
+        executor: Executor,
+        worker: Callable[..., TaskResult],
+        tasks: Iterator[tuple[CSLBuilder, tuple]],
+        window: int,
+        progress: "_FamilyProgress",
+    ) -> None:
+        in_flight: dict[Future[TaskResult], CSLBuilder] = {}
+
+        def collect_completed() -> None:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                builder = in_flight.pop(future)
+                progress.record(builder, future.result())
+                progress.close(builder)
+
+        for builder, task in tasks:
+            if len(in_flight) >= window:
+                collect_completed()
+            in_flight[executor.submit(worker, *task)] = builder
+        while in_flight:
+            collect_completed()
+
+
+def _template_bytes(tasks: list[tuple[CSLBuilder, tuple]]) -> int:
+    """Return the total size of the template read by each of `tasks`."""
+    sizes: dict[Path, int] = {}
+    total = 0
+    for _, task in tasks:
+        # Every task takes its template path as its second argument
+        template_path = task[1]
+        if template_path not in sizes:
+            sizes[template_path] = template_path.stat().st_size
+        total += sizes[template_path]
+    return total
+
+
+@dataclass(slots=True)
+class _FamilyProgress:
+    """
+    Track the open tasks of each family and buffer its log lines.
+
+    A family is held open while its tasks are being discovered and while any
+    of them is running; its buffered lines are written once it closes.
+    """
+
+    record_result: Callable[[CSLBuilder, TaskResult], list[tuple[int, str]]]
+    # Keyed on id(builder): open tasks (plus one while discovering), lines
+    pending: dict[int, int] = field(default_factory=dict)
+    buffered: dict[int, list[tuple[int, str]]] = field(default_factory=dict)
+
+    def open(self, builder: CSLBuilder) -> None:
+        self.pending[id(builder)] = 1
+        self.buffered[id(builder)] = []
+
+    def submitted(self, builder: CSLBuilder) -> None:
+        self.pending[id(builder)] += 1
+
+    def record(self, builder: CSLBuilder, result: TaskResult) -> None:
+        self.buffered[id(builder)].extend(self.record_result(builder, result))
+
+    def fail(self, builder: CSLBuilder, error: Exception) -> None:
+        builder.failed_variants += 1
+        builder.failure_messages.append(f"{builder.style_family}: {error}")
+        self.buffered[id(builder)].append(
+            (
+                logging.ERROR,
+                f"Error processing style family {builder.style_family}: {error}",
             )
-            return
+        )
 
-        with template_path.open("r", encoding="utf-8") as tf:
-            template_lines = tf.readlines()
+    def close(self, builder: CSLBuilder) -> None:
+        key = id(builder)
+        self.pending[key] -= 1
+        if self.pending[key] == 0:
+            del self.pending[key]
+            BuildScheduler._emit(builder, self.buffered.pop(key))
 
-        # Process diff generation in parallel
-        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = [
-                executor.submit(
-                    CSLBuilder._generate_single_diff,
-                    dev_file,
-                    template_lines,
-                    template_path,
-                    self.diffs_dir,
-                )
-                for dev_file in dev_files
-            ]
 
-            for future in as_completed(futures):
-                filename, success, message = future.result()
-                if success:
-                    logging.info(message)
-                else:
-                    logging.error(f"  ✗ {filename}: {message}")
+def main(argv: list[str] | None = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] in (["serve"], ["client"]):
+        # Imported here, since the daemon builds on this module
+        from style_variant_builder.daemon import main as daemon_main
+
+        return daemon_main(argv)
+    return run(parse_args(argv))
 
 
-def main() -> int:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse the command-line options of a build."""
     parser = argparse.ArgumentParser(
         description=__doc__,
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
@@ -400,6 +1069,12 @@ def main() -> int:
         default=Path("output"),
         help="Directory to write pruned variants.",
     )
+    directories_group.add_argument(
+        "--output-archive",
+        type=Path,
+        default=None,
+        help="Write the pruned (or, with --development, development) variants into this .zip, .tar or .tar.gz archive instead of a directory.",
+    )
     directories_group.add_argument(
         "--development-path",
         "-E",
@@ -419,11 +1094,37 @@ def main() -> int:
         action="store_true",
         help="Generate new diff files by comparing development files against templates.",
     )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Check in memory that every diff applies and is the diff --diffs would generate; nothing is written.",
+    )
+    parser.add_argument(
+        "--diff-engine",
+        choices=sorted(ENGINES),
+        default=DEFAULT_ENGINE,
+        help="Line-diff algorithm used to generate new diff files.",
+    )
     parser.add_argument(
         "--flat-output",
         action="store_true",
         help="Write pruned output styles into a flat output directory (no per-family subfolders).",
     )
+    parser.add_argument(
+        "--remove-orphans",
+        action="store_true",
+        help="After a full production build, delete .csl files in the output directories that are not the variant of an existing diff.",
+    )
+    parser.add_argument(
+        "--merge-macros",
+        action="store_true",
+        help="Merge macros with the same body into one in pruned output styles.",
+    )
+    parser.add_argument(
+        "--inline-macros",
+        action="store_true",
+        help="Inline macros that are called from one place, or that render a single element, into pruned output styles.",
+    )
     parser.add_argument(
         "--max-workers",
         "-w",
@@ -431,21 +1132,112 @@ def main() -> int:
         default=None,
         help="Maximum number of parallel workers. Default is the number of CPU cores.",
     )
+    parser.add_argument(
+        "--executor",
+        choices=EXECUTORS,
+        default=AUTO,
+        help="How to run tasks: in worker processes, in threads, or serially in this process. 'auto' picks one from the number of tasks and the template sizes.",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=None,
+        help="Write a JSON list of the created, changed, unchanged and deleted output files to this path.",
+    )
+    parser.add_argument(
+        "--timings",
+        type=Path,
+        default=None,
+        help="Write per-stage timings of every variant, with per-family totals and percentiles, as JSON to this path.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and rebuild the affected variants whenever templates, diffs or (with --diffs) development files change.",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help="Seconds without further changes to wait before rebuilding in watch mode.",
+    )
+
+    selection_group = parser.add_argument_group("Selection Options")
+    selection_group.add_argument(
+        "--changed-files",
+        type=Path,
+        default=None,
+        help="Only build the variants affected by the files listed one per line in this file ('-' for stdin).",
+    )
+    selection_group.add_argument(
+        "--impact",
+        action="store_true",
+        help="Report which diffs overlap or are shifted by the template changes since --since (default HEAD), without building anything.",
+    )
+    selection_group.add_argument(
+        "--since",
+        metavar="REVISION",
+        default=None,
+        help="Only build the variants affected by files changed in the local git repository since this revision.",
+    )
 
-    args = parser.parse_args()
+    cache_group = parser.add_argument_group("Cache Options")
+    cache_group.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help="Directory for the incremental build cache.",
+    )
+    cache_group.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Rebuild every variant without reading or writing the build cache.",
+    )
+    cache_group.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="Maximum size of the build cache in MiB; least recently used entries are evicted.",
+    )
+
+    args = parser.parse_args(argv)
+    if args.check and (args.diffs or args.development):
+        parser.error("--check cannot be combined with --diffs or --development")
+    if args.output_archive is not None:
+        if args.check or args.diffs or args.watch:
+            parser.error(
+                "--output-archive cannot be combined with --check, --diffs or --watch"
+            )
+        try:
+            archive_format(args.output_archive)
+        except ArchiveError as e:
+            parser.error(str(e))
+    return args
+
+
+def run(args: argparse.Namespace, executor: Executor | None = None) -> int:
+    """
+    Run the build described by parsed options and return the exit status.
+
+    A long-lived `executor`, such as the warm pool of the build daemon, is
+    used instead of starting one for this run.
+    """
+    # Errors are counted per run
+    _error_count_filter.error_count = 0
 
     # Automatically determine style families by scanning template files.
-    template_files = list(args.templates_path.glob(f"*{TEMPLATE_SUFFIX}"))
-    if not template_files:
+    style_families = _find_style_families(args.templates_path)
+    if not style_families:
         logging.error(f"No template files found in {args.templates_path}.")
         return 1
-    style_families = [
-        template.stem.removesuffix(TEMPLATE_SUFFIX.removesuffix(".csl"))
-        for template in template_files
-    ]
+
+    if args.impact:
+        return _report_impact(args, style_families)
 
     # Print mode indicator
-    if args.diffs:
+    if args.check:
+        logging.info("Mode: \033[1;35mChecking diff files\033[0m\n")
+    elif args.diffs:
         logging.info("Mode: \033[1;35mGenerating diff files\033[0m\n")
     elif args.development:
         logging.info(
@@ -454,15 +1246,123 @@ def main() -> int:
     else:
         logging.info("Mode: \033[1;35mBuilding production variants\033[0m\n")
 
-    overall_success = True
-    family_results = {}  # Track results per family
-    failure_summaries: list[str] = []
+    selection = None
+    if args.changed_files is not None or args.since is not None:
+        try:
+            changes = _read_changes(args)
+            selection = _select_changed(args, changes)
+            if args.check and args.since is not None:
+                _limit_to_impact(args, selection, changes)
+        except ChangeListError as e:
+            logging.error(str(e))
+            return 1
+        style_families = sorted(selection)
+        if not selection:
+            logging.info("No changed templates or input files to build.")
+            if not args.watch:
+                return 0
+        else:
+            logging.info(
+                "Changed: " + ", ".join(sorted(path.name for path in changes))
+            )
 
-    for style_family in style_families:
-        logging.info(
-            f"Processing style family: \033[1;36m{style_family}\033[0m"
-        )  # Cyan for style family
-        builder = CSLBuilder(
+    build_cache = (
+        None
+        if args.no_cache or args.diffs or args.check
+        else BuildCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    )
+    if not args.watch:
+        builders = _create_builders(
+            args, style_families, build_cache, selection
+        )
+        try:
+            _run_builders(
+                args,
+                builders,
+                build_cache,
+                executor,
+                selective=selection is not None,
+            )
+        except ArchiveError as e:
+            logging.error(str(e))
+            return 1
+        return 0 if _report(args, builders) else 1
+
+    # Keep one warm pool for the initial build and every rebuild; with
+    # 'auto', its startup cost is paid only once, so use processes
+    with create_executor(
+        PROCESS if args.executor == AUTO else args.executor,
+        args.max_workers,
+        initializer=_ignore_interrupts,
+    ) as executor:
+        builders = _create_builders(
+            args, style_families, build_cache, selection
+        )
+        _run_builders(
+            args,
+            builders,
+            build_cache,
+            executor,
+            selective=selection is not None,
+        )
+        _report(args, builders)
+        _watch(args, build_cache, executor)
+    return 0
+
+
+def _ignore_interrupts() -> None:
+    # Ctrl+C stops the watch loop; the workers just wait to be shut down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _find_style_families(templates_path: Path) -> list[str]:
+    try:
+        with os.scandir(templates_path) as scanner:
+            return sorted(
+                entry.name.removesuffix(TEMPLATE_SUFFIX)
+                for entry in scanner
+                if entry.name.endswith(TEMPLATE_SUFFIX)
+            )
+    except FileNotFoundError:
+        return []
+
+
+# Discovery indexes scanned by this process, keyed on directory and suffix;
+# a later scan only stats the files and reads those that changed
+_resident_indexes: dict[tuple[Path, str], DiscoveryIndex] = {}
+
+
+def _scan_index(args: argparse.Namespace) -> DiscoveryIndex:
+    """Index the diff files, or the development files when generating diffs."""
+    index_path = None if args.no_cache else args.cache_dir / "discovery.json"
+    if args.diffs:
+        directory, suffix = args.development_path, ".csl"
+    else:
+        directory, suffix = args.diffs_path, ".diff"
+    key = (directory.resolve(), suffix)
+    resident = _resident_indexes.get(key)
+    if resident is not None and resident.directory != directory:
+        resident = None
+    index = DiscoveryIndex.scan(directory, suffix, index_path, resident)
+    _resident_indexes[key] = index
+    return index
+
+
+def _create_builders(
+    args: argparse.Namespace,
+    style_families: list[str],
+    build_cache: BuildCache | None,
+    selection: dict[str, frozenset[str] | None] | None = None,
+) -> list[CSLBuilder]:
+    # Index the diff or development files once for all style families
+    index = _scan_index(args)
+    diff_records = (
+        DiffRecords.load(args.cache_dir / "diffs.json")
+        if args.diffs and not args.no_cache
+        else None
+    )
+    return [
+        CSLBuilder(
             templates_dir=args.templates_path,
             diffs_dir=args.diffs_path,
             output_dir=args.output_path,
@@ -471,30 +1371,113 @@ def main() -> int:
             export_development=args.development,
             generate_diffs=args.diffs,
             group_by_family=(not args.flat_output),
+            merge_macros=args.merge_macros,
+            inline_macros=args.inline_macros,
             max_workers=args.max_workers,
+            backend=args.executor,
+            cache=build_cache,
+            diff_engine=args.diff_engine,
+            diff_records=diff_records,
+            diff_index=None if args.diffs else index,
+            development_index=index if args.diffs else None,
+            selected_files=selection.get(style_family) if selection else None,
         )
-        try:
-            if args.diffs:
-                builder.generate_diff_files()
-                family_results[style_family] = (
-                    0,
-                    0,
-                )  # diff generation doesn't track variants
-            else:
-                successful, failed = builder.build_variants()
-                family_results[style_family] = (successful, failed)
-                failure_summaries.extend(builder.failure_messages)
-                # Consider it a failure if any variants failed to build
-                if failed > 0:
-                    overall_success = False
-        except Exception as e:
-            overall_success = False
-            family_results[style_family] = (0, 1)  # Mark as failed
-            logging.error(
-                f"Error processing style family {style_family}: {e}",
-                exc_info=True,
-            )
-            failure_summaries.append(f"{style_family}: {e}")
+        for style_family in style_families
+    ]
+
+
+def _run_builders(
+    args: argparse.Namespace,
+    builders: list[CSLBuilder],
+    build_cache: BuildCache | None,
+    executor: Executor | None = None,
+    selective: bool = False,
+) -> None:
+    # Only keep every output path when they are to be written out
+    report = OutputReport(keep_paths=args.report is not None)
+    timing_report = TimingReport() if args.timings is not None else None
+    archive = (
+        OutputArchive(args.output_archive).open()
+        if args.output_archive is not None
+        else None
+    )
+    for builder in builders:
+        builder.report = report
+        builder.timing_report = timing_report
+        builder.archive = archive
+    scheduler = BuildScheduler(
+        builders,
+        max_workers=args.max_workers,
+        backend=args.executor,
+        executor=executor,
+    )
+    try:
+        if args.check:
+            scheduler.check_diffs()
+        elif args.diffs:
+            scheduler.generate_diffs()
+        else:
+            scheduler.build_variants()
+    except BaseException:
+        if archive is not None:
+            archive.abort()
+        raise
+    if archive is not None:
+        archive.close()
+    if build_cache is not None:
+        build_cache.evict()
+    # The builders of a run share one set of diff records
+    if builders and builders[0].diff_records is not None:
+        builders[0].diff_records.save()
+    # Only a full production build knows every variant that should exist,
+    # and the output directories may hold styles this tool did not write
+    if args.remove_orphans and not (
+        args.diffs
+        or args.development
+        or args.check
+        or selective
+        or archive is not None
+    ):
+        _remove_orphaned_variants(builders, report)
+    if archive is not None:
+        logging.info(
+            f"Output archive: {archive.path} ({archive.members} files)."
+        )
+    elif not args.check:
+        logging.info(f"Output files: {report.summary()}.")
+    if args.report is not None:
+        report.write(args.report)
+    if timing_report is not None:
+        timing_report.write(args.timings)
+
+
+def _remove_orphaned_variants(
+    builders: list[CSLBuilder], report: OutputReport
+) -> None:
+    """Delete .csl files that are not the variant of an existing diff."""
+    directories = {builder._target_output_dir() for builder in builders}
+    expected = set().union(
+        *(builder.expected_outputs() for builder in builders)
+    )
+    for path in report.remove_orphans(directories, ".csl", expected):
+        logging.info(f"Removed orphaned variant: {path}")
+
+
+def _report(args: argparse.Namespace, builders: list[CSLBuilder]) -> bool:
+    """Log the summary of a run and return whether it succeeded."""
+    family_results = {
+        builder.style_family: (
+            builder.successful_variants,
+            builder.failed_variants,
+        )
+        for builder in builders
+    }
+    failure_summaries: list[str] = list(
+        chain.from_iterable(builder.failure_messages for builder in builders)
+    )
+    # Consider it a failure if any variants failed to build
+    overall_success = not any(failed for _, failed in family_results.values())
+
     # Summary reporting
     if not args.diffs:  # Only report variant stats for build mode
         total_successful = sum(
@@ -510,19 +1493,22 @@ def main() -> int:
         ]
 
         if failed_families:
+            outcome = "passing checks" if args.check else "successful builds"
             logging.error(
-                f"Style families with no successful builds: {', '.join(failed_families)}",
+                f"Style families with no {outcome}: {', '.join(failed_families)}",
                 extra={"count_error": False},
             )
 
         if total_successful > 0:
+            outcome = "checked" if args.check else "built"
             logging.info(
-                f"Successfully built {total_successful} variants across {len(style_families)} style families."
+                f"Successfully {outcome} {total_successful} variants across {len(builders)} style families."
             )
 
         if total_failed > 0:
+            outcome = "pass the check for" if args.check else "build"
             logging.error(
-                f"Failed to build {total_failed} variants.",
+                f"Failed to {outcome} {total_failed} variants.",
                 extra={"count_error": False},
             )
 
@@ -542,7 +1528,185 @@ def main() -> int:
             f"Run completed with {_error_count_filter.error_count} {error_word}.",
             extra={"count_error": False},
         )
-    return 0 if overall_success else 1
+    return overall_success
+
+
+def _watch(
+    args: argparse.Namespace,
+    build_cache: BuildCache | None,
+    executor: Executor,
+) -> None:
+    """Rebuild the variants affected by each batch of file changes."""
+    watcher = DirectoryWatcher(_input_directories(args))
+
+    def rebuild(changes: set[Path]) -> None:
+        # Errors are counted per rebuild
+        _error_count_filter.error_count = 0
+        selection = _select_changed(args, changes)
+        if not selection:
+            return
+        logging.info(
+            "\nChanged: " + ", ".join(sorted(path.name for path in changes))
+        )
+        builders = _create_builders(
+            args, sorted(selection), build_cache, selection
+        )
+        _run_builders(args, builders, build_cache, executor, selective=True)
+        _report(args, builders)
+
+    logging.info("\nWatching for changes (press Ctrl+C to stop)...")
+    watch(watcher, rebuild, args.debounce)
+
+
+def _impact_reports(
+    args: argparse.Namespace, style_families: list[str], revision: str
+) -> list[ImpactReport]:
+    """Analyse the families whose template changed since `revision`."""
+    hunk_index = (
+        HunkIndex()
+        if args.no_cache
+        else HunkIndex.load(args.cache_dir / "hunks.json")
+    )
+    diff_index = _scan_index(args)
+    reports = []
+    for style_family in style_families:
+        template_path = args.templates_path / f"{style_family}{TEMPLATE_SUFFIX}"
+        old_template = git_file_at(revision, template_path)
+        new_template = template_path.read_bytes()
+        if old_template is None or old_template == new_template:
+            continue
+        reports.append(
+            analyse(
+                style_family,
+                old_template,
+                new_template,
+                diff_index.files_for_family(style_family),
+                hunk_index,
+            )
+        )
+    hunk_index.save()
+    return reports
+
+
+def _report_impact(args: argparse.Namespace, style_families: list[str]) -> int:
+    revision = args.since or "HEAD"
+    start = time.perf_counter()
+    try:
+        reports = _impact_reports(args, style_families, revision)
+    except ChangeListError as e:
+        logging.error(str(e))
+        return 1
+    for report in reports:
+        for level, message in report.log_lines():
+            logging.log(level, message)
+    logging.info(
+        f"{len(reports)} of {len(style_families)} templates changed since "
+        f"{revision} (analysed in {(time.perf_counter() - start) * 1000:.0f} ms)."
+    )
+    return 0
+
+
+def _limit_to_impact(
+    args: argparse.Namespace,
+    selection: dict[str, frozenset[str] | None],
+    changes: set[Path],
+) -> None:
+    """
+    Narrow the families selected by a template change to the affected diffs.
+
+    A diff whose hunks neither overlap nor follow a change of the template
+    stays canonical, so checking it again is not needed. Changed diffs of
+    the family stay selected.
+    """
+    families = [
+        family
+        for family, names in selection.items()
+        if names is None
+        and args.templates_path / f"{family}{TEMPLATE_SUFFIX}" in changes
+    ]
+    changed_diffs = [path.name for path in changes if path.suffix == ".diff"]
+    diff_index = _scan_index(args)
+    for report in _impact_reports(args, families, args.since):
+        names = set(report.affected()) | {
+            name
+            for name in changed_diffs
+            if diff_index.belongs_to(name, report.style_family)
+        }
+        if names:
+            selection[report.style_family] = frozenset(names)
+        else:
+            del selection[report.style_family]
+
+
+def _input_directories(args: argparse.Namespace) -> list[tuple[Path, str]]:
+    """Return the directories and file suffixes that a run reads from."""
+    if args.diffs:
+        return [
+            (args.templates_path, TEMPLATE_SUFFIX),
+            (args.development_path, ".csl"),
+        ]
+    return [(args.templates_path, TEMPLATE_SUFFIX), (args.diffs_path, ".diff")]
+
+
+def _read_changes(args: argparse.Namespace) -> set[Path]:
+    """
+    Return the input files named by --changed-files and --since.
+
+    Listed paths are kept if they lie in one of the input directories and
+    have its suffix, and are returned relative to that directory's option.
+    """
+    changed: set[Path] = set()
+    if args.changed_files is not None:
+        changed |= read_changed_files(args.changed_files)
+    if args.since is not None:
+        changed |= git_changed_files(args.since)
+    directories = {
+        directory.resolve(): (directory, suffix)
+        for directory, suffix in _input_directories(args)
+    }
+    inputs = set()
+    for path in changed:
+        match = directories.get(path.resolve().parent)
+        if match is not None and path.name.endswith(match[1]):
+            inputs.add(match[0] / path.name)
+    return inputs
+
+
+def _select_changed(
+    args: argparse.Namespace, changes: set[Path]
+) -> dict[str, frozenset[str] | None]:
+    """
+    Map changed files to the variants they affect.
+
+    A changed template selects its whole family (None); a changed diff or
+    development file selects that file in every family it belongs to.
+    Deleted files select nothing.
+    """
+    style_families = _find_style_families(args.templates_path)
+    selection: dict[str, frozenset[str] | None] = {}
+    changed_files = []
+    for path in changes:
+        if not path.exists():
+            continue
+        if path.name.endswith(TEMPLATE_SUFFIX):
+            selection[path.name.removesuffix(TEMPLATE_SUFFIX)] = None
+        else:
+            changed_files.append(path.name)
+    if changed_files:
+        index = _scan_index(args)
+        for style_family in style_families:
+            if style_family in selection and selection[style_family] is None:
+                continue
+            names = {
+                name
+                for name in changed_files
+                if index.belongs_to(name, style_family)
+            }
+            if names:
+                selection[style_family] = frozenset(
+                    names | (selection.get(style_family) or set())
+                )
+    return selection
 
 
 if __name__ == "__main__":
@@ -0,0 +1,202 @@
+"""
+Cache built variants on disk, keyed on the content that determines them.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import dataclass, field
+from functools import cache
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path(".cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DIFF_RECORDS_VERSION = 1
+
+# Modules whose source determines the bytes of a built variant; build.py
+# runs the stages of the pipeline, and chooses which of them run
+_OUTPUT_MODULES = ("build.py", "patch.py", "prune.py")
+
+
+@cache
+def code_version() -> str:
+    """Return a digest of the builder code that shapes the output files.
+
+    Hashing the source rather than relying on the package version means that
+    local edits to the pipeline, patcher or pruner invalidate cached variants
+    as well.
+    """
+    digest = hashlib.sha256()
+    package_dir = Path(__file__).parent
+    for name in _OUTPUT_MODULES:
+        digest.update((package_dir / name).read_bytes())
+    return digest.hexdigest()
+
+
+def cache_key(template: bytes, diff: bytes, mode: str) -> str:
+    """Return the key for a variant built from `template` and `diff` in `mode`."""
+    digest = hashlib.sha256()
+    for part in (code_version().encode(), mode.encode(), template, diff):
+        # Length-prefix every part so that their boundaries are unambiguous
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+@cache
+def file_mode() -> int:
+    """Return the mode that open() gives a new file under the current umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write `data` to `path` via a temporary file in the same directory."""
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        # mkstemp creates files readable by the owner only
+        os.chmod(tmp_name, file_mode())
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+@dataclass(slots=True)
+class BuildCache:
+    """A size-bounded, content-addressed store of built variants.
+
+    Entries are plain files named by their key. Reading an entry refreshes its
+    modification time, so `evict()` removes the least recently used entries
+    first.
+    """
+
+    directory: Path = DEFAULT_CACHE_DIR
+    max_bytes: int = DEFAULT_MAX_BYTES
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / "variants" / key[:2] / key
+
+    def get(self, key: str) -> bytes | None:
+        path = self._entry_path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._entry_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(path, data)
+        except OSError as e:
+            # A cache that cannot be written must never fail the build
+            logging.debug(f"Unable to write cache entry {key}: {e}")
+
+    def evict(self) -> int:
+        """Remove the least recently used entries beyond `max_bytes`.
+
+        Returns the number of entries removed.
+        """
+        entries = []
+        total = 0
+        for path in (self.directory / "variants").glob("*/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass(slots=True)
+class DiffRecords:
+    """The hashes of the inputs and output of each generated diff.
+
+    For every development file, the hashes of its template, of the file
+    itself and of the diff written for it are recorded. While all three still
+    hold, generating the diff again would give the same file, so it can be
+    skipped without running a diff.
+    """
+
+    path: Path
+    # Development file path -> [template hash, development hash, diff hash]
+    entries: dict[str, list[str]] = field(default_factory=dict)
+    changed: bool = False
+
+    @classmethod
+    def load(cls, path: Path) -> "DiffRecords":
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls(path)
+        if (
+            not isinstance(data, dict)
+            or data.get("version") != DIFF_RECORDS_VERSION
+        ):
+            return cls(path)
+        return cls(path, data.get("entries", {}))
+
+    def is_current(
+        self,
+        dev_file: Path,
+        template_hash: str,
+        dev_hash: str,
+        diff_path: Path,
+    ) -> bool:
+        entry = self.entries.get(str(dev_file))
+        if entry is None or entry[:2] != [template_hash, dev_hash]:
+            return False
+        try:
+            return content_hash(diff_path.read_bytes()) == entry[2]
+        except OSError:
+            return False
+
+    def update(
+        self,
+        dev_file: Path,
+        template_hash: str,
+        dev_hash: str,
+        diff_hash: str,
+    ) -> None:
+        entry = [template_hash, dev_hash, diff_hash]
+        if self.entries.get(str(dev_file)) != entry:
+            self.entries[str(dev_file)] = entry
+            self.changed = True
+
+    def save(self) -> None:
+        if not self.changed:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(
+                self.path,
+                json.dumps(
+                    {"version": DIFF_RECORDS_VERSION, "entries": self.entries}
+                ).encode("utf-8"),
+            )
+            self.changed = False
+        except OSError as e:
+            logging.debug(f"Unable to save the diff records: {e}")
@@ -0,0 +1,73 @@
+"""
+Find the input files changed by a pull request or local edits.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+
+class ChangeListError(Exception):
+    """Raised when the list of changed files cannot be determined."""
+
+
+def read_changed_files(list_path: Path) -> set[Path]:
+    """Return the paths listed one per line in `list_path` ("-" for stdin).
+
+    Blank lines are ignored, so the output of `git diff --name-only` or of a
+    CI changed-files action can be passed as is.
+    """
+    try:
+        if str(list_path) == "-":
+            text = sys.stdin.read()
+        else:
+            text = list_path.read_text(encoding="utf-8")
+    except OSError as e:
+        raise ChangeListError(f"Unable to read changed files: {e}") from e
+    return {Path(line.strip()) for line in text.splitlines() if line.strip()}
+
+
+def _git(args: list[str], cwd: Path) -> list[str]:
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except FileNotFoundError as e:
+        raise ChangeListError("git is not available") from e
+    except subprocess.CalledProcessError as e:
+        raise ChangeListError(
+            f"git {' '.join(args)} failed: {e.stderr.strip()}"
+        ) from e
+    return [line for line in result.stdout.splitlines() if line]
+
+
+def git_changed_files(revision: str, cwd: Path = Path(".")) -> set[Path]:
+    """Return the files changed in the working tree since `revision`.
+
+    This covers committed, staged and unstaged changes, and untracked files
+    that are not ignored. Paths are absolute.
+    """
+    root = Path(_git(["rev-parse", "--show-toplevel"], cwd)[0])
+    names = _git(["diff", "--name-only", revision, "--"], cwd)
+    names += _git(["ls-files", "--others", "--exclude-standard"], root)
+    return {root / name for name in names}
+
+
+def git_file_at(revision: str, path: Path) -> bytes | None:
+    """Return the content of `path` at `revision`, or None if it did not exist."""
+    try:
+        result = subprocess.run(
+            ["git", "show", f"{revision}:./{path.name}"],
+            cwd=path.parent,
+            capture_output=True,
+            check=True,
+        )
+    except FileNotFoundError as e:
+        raise ChangeListError("git is not available") from e
+    except subprocess.CalledProcessError:
+        return None
+    return result.stdout
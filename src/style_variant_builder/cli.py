@@ -0,0 +1,23 @@
+"""
+Dispatch the style-variant-builder command.
+
+`client` requests are handled without importing the builder, which is what
+a running daemon saves them from paying for.
+"""
+
+import sys
+
+
+def main() -> int:
+    argv = sys.argv[1:]
+    if argv[:1] == ["client"]:
+        from style_variant_builder.client import main as client_main
+
+        return client_main(argv[1:])
+    from style_variant_builder.build import main as build_main
+
+    return build_main(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Send requests to a running build daemon and stream back its output.
+
+The client only needs the standard library, so that a request does not pay
+for importing the builder and its dependencies.
+
+    style-variant-builder client [--socket PATH] [BUILD OPTIONS...]
+    style-variant-builder client [--socket PATH] prune INPUT OUTPUT
+"""
+
+import json
+import logging
+import os
+import socket
+import sys
+from pathlib import Path
+
+from style_variant_builder.cache import DEFAULT_CACHE_DIR
+
+DEFAULT_SOCKET = DEFAULT_CACHE_DIR / "daemon.sock"
+
+
+class DaemonError(Exception):
+    """Raised when the daemon cannot be started or reached."""
+
+
+def request(
+    socket_path: Path, argv: list[str], stdin: str | None = None
+) -> int:
+    """Send a request to the daemon, log its output and return its status."""
+    message: dict = {"argv": argv, "cwd": os.getcwd()}
+    if stdin is not None:
+        message["stdin"] = stdin
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(str(socket_path))
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise DaemonError(
+                f"No build daemon is listening on {socket_path}; "
+                "start one with 'style-variant-builder serve'."
+            ) from e
+        client.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        with client.makefile("r", encoding="utf-8") as responses:
+            for line in responses:
+                response = json.loads(line)
+                if "exit" in response:
+                    return response["exit"]
+                logging.log(response["level"], response["message"])
+    raise DaemonError("The build daemon closed the connection unexpectedly.")
+
+
+def main(argv: list[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    socket_path = DEFAULT_SOCKET
+    if argv[:1] == ["--socket"] and len(argv) > 1:
+        socket_path, argv = Path(argv[1]), argv[2:]
+    elif argv[:1] and argv[0].startswith("--socket="):
+        socket_path, argv = Path(argv[0].partition("=")[2]), argv[1:]
+    # The daemon cannot read the standard input of the client
+    stdin = sys.stdin.read() if "-" in argv else None
+    try:
+        return request(socket_path, argv, stdin)
+    except DaemonError as e:
+        logging.error(str(e))
+        return 1
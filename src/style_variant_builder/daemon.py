@@ -0,0 +1,295 @@
+"""
+Serve builds from a long-running process over a Unix domain socket.
+
+A command-line build pays for interpreter startup, imports, starting workers
+and reading templates before it does any work. The daemon pays for them
+once: its workers stay warm with their templates loaded, and the discovery
+indexes stay resident. Both are checked against the modification time and
+size of the files on every request, so edits are picked up without a
+restart. Requests are sent with `style-variant-builder client`.
+
+    style-variant-builder serve [--socket PATH]
+
+Requests and responses are JSON objects, one per line. A request holds the
+build options ("argv"), the working directory of the client ("cwd") and,
+for `--changed-files -`, the standard input of the client ("stdin"). The
+daemon streams back a {"level", "message"} object per log record, and ends
+with {"exit": status}. Requests are served one at a time, and only from
+the directory the daemon was started in, since paths in the options, and
+in the diffs they generate, are relative to it.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+from collections.abc import Iterator
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import BinaryIO
+
+from style_variant_builder.build import _ignore_interrupts, parse_args, run
+from style_variant_builder.client import DEFAULT_SOCKET, DaemonError
+from style_variant_builder.client import main as client_main
+from style_variant_builder.executors import (
+    AUTO,
+    EXECUTORS,
+    PROCESS,
+    create_executor,
+)
+from style_variant_builder.prune import prune_file
+
+
+class _ResponseHandler(logging.Handler):
+    """Stream log records to a client as JSON lines."""
+
+    def __init__(self, wfile: BinaryIO) -> None:
+        super().__init__()
+        self.setFormatter(logging.Formatter("%(message)s"))
+        self.wfile = wfile
+        self.disconnected = False
+
+    def send(self, response: dict) -> None:
+        # A client that went away does not stop the build
+        if self.disconnected:
+            return
+        try:
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+        except OSError:
+            self.disconnected = True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.send({"level": record.levelno, "message": self.format(record)})
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: "BuildDaemon"
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            # A connection that only probes whether the daemon is running
+            return
+        response = _ResponseHandler(self.wfile)
+        root = logging.getLogger()
+        root.addHandler(response)
+        try:
+            status = self.server.handle_request_line(line)
+        finally:
+            root.removeHandler(response)
+        response.send({"exit": status})
+
+
+class BuildDaemon(socketserver.UnixStreamServer):
+    """A socket server that runs each request on one long-lived executor."""
+
+    def __init__(self, socket_path: Path, executor: Executor) -> None:
+        self.executor = executor
+        super().__init__(str(socket_path), _RequestHandler)
+        # Requests can write files anywhere the daemon can
+        os.chmod(socket_path, 0o600)
+
+    def handle_request_line(self, line: bytes) -> int:
+        try:
+            request = json.loads(line)
+            argv = [str(arg) for arg in request.get("argv", [])]
+            cwd = Path(request.get("cwd", "."))
+            stdin = request.get("stdin")
+        except (ValueError, AttributeError, TypeError):
+            logging.error("Invalid request to the build daemon.")
+            return 2
+        if not _same_directory(cwd, Path.cwd()):
+            logging.error(
+                f"The build daemon serves {Path.cwd()}; send requests from "
+                "there, or start a daemon in this directory."
+            )
+            return 2
+        try:
+            with _client_stdin(stdin):
+                if argv[:1] == ["prune"]:
+                    return self._prune(argv[1:])
+                return self._build(argv)
+        except Exception as e:
+            logging.error(f"Request failed: {e}", exc_info=True)
+            return 1
+
+    def _build(self, argv: list[str]) -> int:
+        args = _parse(parse_args, argv)
+        if isinstance(args, int):
+            return args
+        if args.watch:
+            logging.error(
+                "--watch is not supported by the build daemon; "
+                "send a request for each rebuild instead."
+            )
+            return 2
+        return run(args, self.executor)
+
+    def _prune(self, argv: list[str]) -> int:
+        args = _parse(_parse_prune_args, argv)
+        if isinstance(args, int):
+            return args
+        try:
+            # Prune in a warm worker, which has lxml loaded already
+            future = self.executor.submit(
+                prune_file, args.input_path, args.output_path
+            )
+            modified = future.result()
+        except Exception as e:
+            logging.error(f"Unable to prune {args.input_path}: {e}")
+            return 1
+        if modified:
+            logging.info(f"Pruned {args.output_path}")
+        else:
+            logging.info(f"No macros pruned in {args.input_path}")
+        return 0
+
+
+def _parse_prune_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="style-variant-builder client prune",
+        description="Prune the unused macros of a CSL style.",
+    )
+    parser.add_argument(
+        "input_path", type=Path, help="Path to the input CSL file."
+    )
+    parser.add_argument(
+        "output_path", type=Path, help="Path to the output pruned CSL file."
+    )
+    return parser.parse_args(argv)
+
+
+def _parse(parse, argv: list[str]) -> argparse.Namespace | int:
+    """Parse the options of a request, or return the exit status on failure.
+
+    Usage and help messages are sent to the client instead of being written
+    to the console of the daemon.
+    """
+    output = io.StringIO()
+    try:
+        with (
+            contextlib.redirect_stdout(output),
+            contextlib.redirect_stderr(output),
+        ):
+            return parse(argv)
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else 2
+        if text := output.getvalue().rstrip():
+            logging.log(logging.INFO if status == 0 else logging.ERROR, text)
+        return status
+
+
+def _same_directory(a: Path, b: Path) -> bool:
+    try:
+        return a.samefile(b)
+    except OSError:
+        return False
+
+
+@contextlib.contextmanager
+def _client_stdin(text: str | None) -> Iterator[None]:
+    if text is None:
+        yield
+        return
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(text)
+    try:
+        yield
+    finally:
+        sys.stdin = stdin
+
+
+def _is_listening(socket_path: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def _stop(signum: int, frame: object) -> None:
+    raise KeyboardInterrupt
+
+
+def _init_worker() -> None:
+    _ignore_interrupts()
+    # Workers are forked after the daemon handles SIGTERM, and are shut down
+    # by it rather than stopping the same way
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def serve(socket_path: Path, executor: Executor) -> None:
+    """Serve requests on `socket_path` until interrupted or terminated."""
+    if socket_path.exists():
+        if _is_listening(socket_path):
+            raise DaemonError(
+                f"A build daemon is already listening on {socket_path}."
+            )
+        # Left behind by a daemon that did not shut down cleanly
+        socket_path.unlink()
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        daemon = BuildDaemon(socket_path, executor)
+    except OSError as e:
+        raise DaemonError(f"Unable to listen on {socket_path}: {e}") from e
+    signal.signal(signal.SIGTERM, _stop)
+    with daemon:
+        logging.info(
+            f"Build daemon listening on {socket_path} (press Ctrl+C to stop)..."
+        )
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+
+def main(argv: list[str]) -> int:
+    """Run `serve` or `client`, given as the first of `argv`."""
+    command, argv = argv[0], argv[1:]
+    if command == "client":
+        return client_main(argv)
+    parser = argparse.ArgumentParser(
+        prog="style-variant-builder serve",
+        description="Serve build requests from a long-running process.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=DEFAULT_SOCKET,
+        help="Path of the Unix domain socket to listen on.",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=EXECUTORS,
+        default=AUTO,
+        help="How to run tasks; 'auto' keeps a pool of worker processes.",
+    )
+    parser.add_argument(
+        "--max-workers",
+        "-w",
+        type=int,
+        default=None,
+        help="Maximum number of parallel workers. Default is the number of CPU cores.",
+    )
+    args = parser.parse_args(argv)
+    with create_executor(
+        PROCESS if args.executor == AUTO else args.executor,
+        args.max_workers,
+        initializer=_init_worker,
+    ) as executor:
+        try:
+            serve(args.socket, executor)
+        except DaemonError as e:
+            logging.error(str(e))
+            return 1
+    return 0
@@ -0,0 +1,218 @@
+"""
+Index the diff and development files of all style families in one pass.
+"""
+
+import json
+import logging
+import os
+import re
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from style_variant_builder.cache import write_atomic
+
+INDEX_VERSION = 1
+
+_HREF = re.compile(r'href="([^"]*)"')
+
+
+def read_template_links(path: Path, is_diff: bool) -> list[str]:
+    """Return the targets of the rel="template" links in the <info> of a file.
+
+    Reading stops at the closing </info> tag. In a diff, only the lines of the
+    patched file (context and additions) are considered, since removed lines
+    belong to the template itself.
+    """
+    links = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if is_diff:
+                if line.startswith(("-", "@@", "+++")):
+                    continue
+                line = line[1:]
+            if 'rel="template"' in line:
+                links.extend(_HREF.findall(line))
+            if "</info>" in line:
+                break
+    return links
+
+
+@dataclass(slots=True)
+class IndexEntry:
+    mtime_ns: int
+    size: int
+    template_links: list[str]
+
+
+@dataclass(slots=True)
+class DiscoveryIndex:
+    """Map the files of one directory to the style families that use them.
+
+    A file belongs to a family if its name starts with the family name, or if
+    it links to a template whose URL contains "/<family>". Each file is read
+    once per run at most, and not at all if the persisted index holds an entry
+    with the same modification time and size.
+
+    Both rules are prefix matches, so the files of a family are looked up by
+    bisection in sorted lists of the file names and of the link tails that
+    follow each "/", instead of testing every file against every family.
+    """
+
+    directory: Path
+    suffix: str
+    entries: dict[str, IndexEntry] = field(default_factory=dict)
+    # Sorted file names and sorted (link tail, file name) pairs, built lazily
+    _names: list[str] | None = field(default=None, init=False, repr=False)
+    _link_tails: list[tuple[str, str]] | None = field(
+        default=None, init=False, repr=False
+    )
+
+    @classmethod
+    def scan(
+        cls,
+        directory: Path,
+        suffix: str,
+        persist_path: Path | None = None,
+        resident: "DiscoveryIndex | None" = None,
+    ) -> "DiscoveryIndex":
+        """Index `directory`, reading only the files that changed.
+
+        Unchanged entries are taken from the `resident` index of an earlier
+        scan, or else from the index persisted at `persist_path`. If no file
+        changed, the `resident` index itself is returned.
+        """
+        if resident is not None:
+            previous = resident.entries
+        elif persist_path is not None:
+            previous = _load_persisted(persist_path, directory, suffix)
+        else:
+            previous = {}
+        index = cls(directory, suffix)
+        changed = False
+        try:
+            scanner = os.scandir(directory)
+        except FileNotFoundError:
+            return index
+        with scanner:
+            for dir_entry in scanner:
+                if not dir_entry.name.endswith(suffix):
+                    continue
+                try:
+                    stat = dir_entry.stat()
+                except OSError:
+                    continue
+                cached = previous.get(dir_entry.name)
+                if (
+                    cached is not None
+                    and cached.mtime_ns == stat.st_mtime_ns
+                    and cached.size == stat.st_size
+                ):
+                    index.entries[dir_entry.name] = cached
+                    continue
+                try:
+                    links = read_template_links(
+                        Path(dir_entry.path), is_diff=suffix == ".diff"
+                    )
+                except Exception as e:
+                    logging.error(
+                        f"Error reading file {dir_entry.name}: {e}",
+                        exc_info=True,
+                    )
+                    continue
+                index.entries[dir_entry.name] = IndexEntry(
+                    stat.st_mtime_ns, stat.st_size, links
+                )
+                changed = True
+        changed = changed or index.entries.keys() != previous.keys()
+        if persist_path is not None and changed:
+            _store_persisted(persist_path, index)
+        if resident is not None and not changed:
+            # Keeps the lookup lists the resident index has already built
+            return resident
+        return index
+
+    def belongs_to(self, name: str, style_family: str) -> bool:
+        """Return whether the indexed file `name` belongs to `style_family`."""
+        if name.startswith(style_family):
+            return True
+        entry = self.entries.get(name)
+        marker = f"/{style_family}"
+        return entry is not None and any(
+            marker in link for link in entry.template_links
+        )
+
+    def _build_lookup(self) -> tuple[list[str], list[tuple[str, str]]]:
+        if self._names is None or self._link_tails is None:
+            self._names = sorted(self.entries)
+            self._link_tails = sorted(
+                {
+                    (link[i + 1 :], name)
+                    for name, entry in self.entries.items()
+                    for link in entry.template_links
+                    for i, char in enumerate(link)
+                    if char == "/"
+                }
+            )
+        return self._names, self._link_tails
+
+    def files_for_family(self, style_family: str) -> list[Path]:
+        names, link_tails = self._build_lookup()
+        matches = set()
+        i = bisect_left(names, style_family)
+        while i < len(names) and names[i].startswith(style_family):
+            matches.add(names[i])
+            i += 1
+        i = bisect_left(link_tails, (style_family,))
+        while i < len(link_tails) and link_tails[i][0].startswith(style_family):
+            matches.add(link_tails[i][1])
+            i += 1
+        return sorted(self.directory / name for name in matches)
+
+
+def _index_id(directory: Path, suffix: str) -> str:
+    return f"{directory.resolve()}:{suffix}"
+
+
+def _read_persisted(persist_path: Path) -> dict:
+    try:
+        data = json.loads(persist_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+        return {}
+    return data
+
+
+def _load_persisted(
+    persist_path: Path, directory: Path, suffix: str
+) -> dict[str, IndexEntry]:
+    indexes = _read_persisted(persist_path).get("indexes", {})
+    try:
+        return {
+            name: IndexEntry(*values)
+            for name, values in indexes.get(
+                _index_id(directory, suffix), {}
+            ).items()
+        }
+    except TypeError:
+        return {}
+
+
+def _store_persisted(persist_path: Path, index: DiscoveryIndex) -> None:
+    data = _read_persisted(persist_path)
+    indexes = data.get("indexes", {})
+    indexes[_index_id(index.directory, index.suffix)] = {
+        name: [entry.mtime_ns, entry.size, entry.template_links]
+        for name, entry in index.entries.items()
+    }
+    try:
+        persist_path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(
+            persist_path,
+            json.dumps({"version": INDEX_VERSION, "indexes": indexes}).encode(
+                "utf-8"
+            ),
+        )
+    except OSError as e:
+        logging.debug(f"Unable to persist the discovery index: {e}")
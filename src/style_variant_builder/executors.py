@@ -0,0 +1,71 @@
+"""
+Choose and create the executor that runs build tasks.
+"""
+
+from collections.abc import Callable
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+
+AUTO = "auto"
+PROCESS = "process"
+THREAD = "thread"
+SERIAL = "serial"
+EXECUTORS = (AUTO, PROCESS, THREAD, SERIAL)
+
+# Below this much template data to process (summed over the tasks), about
+# a second of work, starting worker processes and pickling tasks costs more
+# than threads lose to the GIL; lxml parses and serializes without it
+PROCESS_THRESHOLD = 2 * 1024 * 1024
+
+
+class SerialExecutor(Executor):
+    """Run each task in the calling thread as soon as it is submitted.
+
+    Runs are deterministic and happen in one process, so they are easy to
+    debug and profile.
+    """
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        future: Future = Future()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        return future
+
+
+def choose_executor(
+    workers: int, tasks: int, template_bytes: int, more_tasks: bool = False
+) -> str:
+    """Pick a backend for `tasks` tasks that read `template_bytes` in total.
+
+    `more_tasks` is set when only the first tasks of the run are known, in
+    which case the run is assumed to be large.
+    """
+    if workers == 1 or (tasks <= 1 and not more_tasks):
+        return SERIAL
+    if not more_tasks and template_bytes < PROCESS_THRESHOLD:
+        return THREAD
+    return PROCESS
+
+
+def create_executor(
+    kind: str,
+    max_workers: int | None = None,
+    initializer: Callable[[], object] | None = None,
+) -> Executor:
+    """Return an executor of the given kind; AUTO starts a process pool.
+
+    The `initializer` only runs in worker processes.
+    """
+    if kind == SERIAL:
+        return SerialExecutor()
+    if kind == THREAD:
+        return ThreadPoolExecutor(max_workers=max_workers)
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=initializer)
@@ -0,0 +1,185 @@
+"""
+Find the variants affected by a template edit from the hunk ranges of diffs.
+"""
+
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from style_variant_builder.cache import content_hash, write_atomic
+from style_variant_builder.linediff import myers_opcodes
+
+HUNK_INDEX_VERSION = 1
+
+# Ordered from least to most affected
+UNTOUCHED = "untouched"
+OFFSET = "offset"
+OVERLAP = "overlap"
+IMPACTS = (UNTOUCHED, OFFSET, OVERLAP)
+
+_HUNK_HEADER = re.compile(rb"^@@ -(\d+)(?:,(\d+))? \+", re.MULTILINE)
+
+
+def hunk_ranges(diff: bytes) -> list[tuple[int, int]]:
+    """Return the template line range of each hunk, as 0-based (start, stop)."""
+    ranges = []
+    for match in _HUNK_HEADER.finditer(diff):
+        start = int(match[1])
+        count = int(match[2]) if match[2] is not None else 1
+        # An empty range is numbered by the line before it
+        first = start - 1 if count else start
+        ranges.append((first, first + count))
+    return ranges
+
+
+@dataclass(slots=True)
+class HunkIndex:
+    """The hunk ranges of diff files, cached by the hash of their content.
+
+    Only the `@@` headers of a diff are read, so the index stays valid for
+    any diff with the same bytes, whatever its name.
+    """
+
+    path: Path | None = None
+    ranges: dict[str, list[tuple[int, int]]] = field(default_factory=dict)
+    changed: bool = False
+
+    @classmethod
+    def load(cls, path: Path) -> "HunkIndex":
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls(path)
+        if (
+            not isinstance(data, dict)
+            or data.get("version") != HUNK_INDEX_VERSION
+        ):
+            return cls(path)
+        return cls(
+            path,
+            {
+                digest: [tuple(hunk) for hunk in hunks]
+                for digest, hunks in data.get("ranges", {}).items()
+            },
+        )
+
+    def get(self, diff_path: Path) -> list[tuple[int, int]]:
+        diff = diff_path.read_bytes()
+        digest = content_hash(diff)
+        ranges = self.ranges.get(digest)
+        if ranges is None:
+            ranges = self.ranges[digest] = hunk_ranges(diff)
+            self.changed = True
+        return ranges
+
+    def save(self) -> None:
+        if self.path is None or not self.changed:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(
+                self.path,
+                json.dumps(
+                    {"version": HUNK_INDEX_VERSION, "ranges": self.ranges}
+                ).encode("utf-8"),
+            )
+            self.changed = False
+        except OSError as e:
+            logging.debug(f"Unable to save the hunk index: {e}")
+
+
+def template_edits(
+    old_lines: list[str], new_lines: list[str]
+) -> list[tuple[int, int, int]]:
+    """Return the edited regions of a template as (start, stop, line delta).
+
+    Regions are 0-based line ranges of the old template; the delta is the
+    number of lines the edit adds (or, if negative, removes).
+    """
+    return [
+        (i1, i2, (j2 - j1) - (i2 - i1))
+        for tag, i1, i2, j1, j2 in myers_opcodes(old_lines, new_lines)
+        if tag != "equal"
+    ]
+
+
+def classify(
+    ranges: list[tuple[int, int]], edits: list[tuple[int, int, int]]
+) -> str:
+    """Return how template `edits` affect a diff with hunk `ranges`.
+
+    OVERLAP if an edit changes lines inside a hunk, so that the hunk may no
+    longer apply or may apply with fuzz, or inserts lines at either end of
+    it, so that the diff may no longer be the one --diffs generates. OFFSET if the hunks still apply as
+    they are, but some of them move. UNTOUCHED otherwise.
+    """
+    impact = UNTOUCHED
+    for start, stop in ranges:
+        shift = 0
+        for edit_start, edit_stop, delta in edits:
+            if edit_start < edit_stop:
+                if edit_start < stop and edit_stop > start:
+                    return OVERLAP
+            elif start <= edit_start <= stop:
+                # Lines inserted inside the hunk, or right next to it, where
+                # a regenerated diff may match them to lines of the hunk
+                return OVERLAP
+            if edit_stop <= start:
+                shift += delta
+        if shift:
+            impact = OFFSET
+    return impact
+
+
+@dataclass(slots=True)
+class ImpactReport:
+    """The variants of one style family, grouped by how a template edit affects them."""
+
+    style_family: str
+    edits: list[tuple[int, int, int]]
+    variants: dict[str, list[str]] = field(
+        default_factory=lambda: {impact: [] for impact in IMPACTS}
+    )
+
+    def affected(self) -> list[str]:
+        return sorted(self.variants[OFFSET] + self.variants[OVERLAP])
+
+    def log_lines(self) -> list[tuple[int, str]]:
+        lines = [
+            (
+                logging.INFO,
+                f"Template {self.style_family} changed in {len(self.edits)} regions:",
+            )
+        ]
+        for impact, level, label in (
+            (OVERLAP, logging.WARNING, "Hunks overlap the changes"),
+            (OFFSET, logging.INFO, "Hunks only move"),
+        ):
+            if names := self.variants[impact]:
+                lines.append((level, f"  {label} ({len(names)}):"))
+                lines.extend((level, f"    {name}") for name in sorted(names))
+        lines.append(
+            (logging.INFO, f"  Untouched: {len(self.variants[UNTOUCHED])}")
+        )
+        return lines
+
+
+def analyse(
+    style_family: str,
+    old_template: bytes,
+    new_template: bytes,
+    diff_files: list[Path],
+    index: HunkIndex,
+) -> ImpactReport:
+    """Classify the diffs of a family by the edit from `old_template` to `new_template`."""
+    edits = template_edits(
+        old_template.decode("utf-8").splitlines(keepends=True),
+        new_template.decode("utf-8").splitlines(keepends=True),
+    )
+    report = ImpactReport(style_family, edits)
+    for diff_path in diff_files:
+        impact = classify(index.get(diff_path), edits) if edits else UNTOUCHED
+        report.variants[impact].append(diff_path.name)
+    return report
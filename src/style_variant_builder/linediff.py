@@ -0,0 +1,413 @@
+"""
+Compute unified diffs between lists of lines.
+
+The output has the same format as `difflib.unified_diff`. Two engines find
+the matching lines: "difflib" uses `difflib.SequenceMatcher`, while "myers"
+interns each distinct line to an integer and runs the linear-space variant of
+Myers' O(ND) algorithm on those integers. Myers' algorithm is much faster on
+large templates with few changes, since its cost grows with the number of
+differences rather than with the number of repeated lines.
+"""
+
+import difflib
+from collections.abc import Callable, Iterator, Sequence
+
+from style_variant_builder.patch import Hunk
+
+# (tag, i1, i2, j1, j2), as returned by SequenceMatcher.get_opcodes()
+Opcode = tuple[str, int, int, int, int]
+# (i, j, size): a[i:i + size] == b[j:j + size]
+Block = tuple[int, int, int]
+
+
+def intern_lines(lines: Sequence[str], table: dict[str, int]) -> list[int]:
+    """Map each line to an integer ID, adding unseen lines to `table`."""
+    ids = []
+    for line in lines:
+        line_id = table.get(line)
+        if line_id is None:
+            line_id = table[line] = len(table)
+        ids.append(line_id)
+    return ids
+
+
+def _middle_snake(
+    a: Sequence[int],
+    a_lo: int,
+    a_hi: int,
+    b: Sequence[int],
+    b_lo: int,
+    b_hi: int,
+) -> tuple[int, int, int, int]:
+    """Return the start and end, relative to (a_lo, b_lo), of the middle snake.
+
+    Both ranges must be non-empty and differ in their first and last lines.
+    """
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    forward = [0] * (2 * offset + 1)
+    backward = [0] * (2 * offset + 1)
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (
+                k != d and forward[offset + k - 1] < forward[offset + k + 1]
+            ):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            x_start, y_start = x, y
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            if (
+                odd
+                and delta - (d - 1) <= k <= delta + (d - 1)
+                and x + backward[offset + delta - k] >= n
+            ):
+                return x_start, y_start, x, y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (
+                k != d and backward[offset + k - 1] < backward[offset + k + 1]
+            ):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            x_start, y_start = x, y
+            while x < n and y < m and a[a_hi - 1 - x] == b[b_hi - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            if (
+                not odd
+                and -d <= delta - k <= d
+                and x + forward[offset + delta - k] >= n
+            ):
+                return n - x, m - y, n - x_start, m - y_start
+    raise AssertionError("No middle snake found")
+
+
+def myers_matching_blocks(a: Sequence[int], b: Sequence[int]) -> list[Block]:
+    """Return the matching blocks of a shortest edit script from `a` to `b`.
+
+    Runs of changed lines that could equally sit further down, among repeated
+    lines, are moved down as far as possible. This is where SequenceMatcher
+    tends to put them, so the two engines mostly agree.
+    """
+    changed_a = [True] * len(a)
+    changed_b = [True] * len(b)
+    # Lines that occur in only one of the sequences are always changed, and
+    # leaving them out makes the search much shorter
+    in_a, in_b = set(a), set(b)
+    a_map = [i for i, line in enumerate(a) if line in in_b]
+    b_map = [j for j, line in enumerate(b) if line in in_a]
+    a_kept = [a[i] for i in a_map]
+    b_kept = [b[j] for j in b_map]
+
+    def unchanged(i: int, j: int, size: int) -> None:
+        for k in range(size):
+            changed_a[a_map[i + k]] = changed_b[b_map[j + k]] = False
+
+    stack = [(0, len(a_kept), 0, len(b_kept))]
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+        size = _common_length(a_kept, a_lo, b_kept, b_lo, a_hi, b_hi, 1)
+        unchanged(a_lo, b_lo, size)
+        a_lo += size
+        b_lo += size
+        size = _common_length(a_kept, a_hi, b_kept, b_hi, a_lo, b_lo, -1)
+        a_hi -= size
+        b_hi -= size
+        unchanged(a_hi, b_hi, size)
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+        x_start, y_start, x_end, y_end = _middle_snake(
+            a_kept, a_lo, a_hi, b_kept, b_lo, b_hi
+        )
+        unchanged(a_lo + x_start, b_lo + y_start, x_end - x_start)
+        stack.append((a_lo + x_end, a_hi, b_lo + y_end, b_hi))
+        stack.append((a_lo, a_lo + x_start, b_lo, b_lo + y_start))
+    _slide_down(a, changed_a)
+    _slide_down(b, changed_b)
+
+    # The unchanged lines of both sequences match up in order
+    blocks: list[Block] = []
+    unchanged_b = [j for j, is_changed in enumerate(changed_b) if not is_changed]
+    for i, j in zip(
+        [i for i, is_changed in enumerate(changed_a) if not is_changed],
+        unchanged_b,
+    ):
+        if blocks:
+            i0, j0, size = blocks[-1]
+            if i0 + size == i and j0 + size == j:
+                blocks[-1] = (i0, j0, size + 1)
+                continue
+        blocks.append((i, j, 1))
+    return blocks
+
+
+def _common_length(
+    a: Sequence[int],
+    a_start: int,
+    b: Sequence[int],
+    b_start: int,
+    a_stop: int,
+    b_stop: int,
+    direction: int,
+) -> int:
+    """Return the length of the common prefix (direction 1) or suffix (-1).
+
+    The prefix starts at, and the suffix ends before, the start positions.
+    Slices of growing size are compared, so long common runs are found at
+    the speed of list comparison rather than line by line.
+    """
+    limit = min(abs(a_stop - a_start), abs(b_stop - b_start))
+    size = 0
+    step = 16
+    while size < limit:
+        step = min(step, limit - size)
+        if direction > 0:
+            same = (
+                a[a_start + size : a_start + size + step]
+                == b[b_start + size : b_start + size + step]
+            )
+        else:
+            same = (
+                a[a_start - size - step : a_start - size]
+                == b[b_start - size - step : b_start - size]
+            )
+        if same:
+            size += step
+            step *= 2
+        elif step == 1:
+            break
+        else:
+            step //= 2
+    return size
+
+
+def _slide_down(lines: Sequence[int], changed: list[bool]) -> None:
+    """Move each run of changed lines down while the result is equivalent.
+
+    A run can move down by one line when its first line equals the unchanged
+    line that follows it; runs that meet are merged.
+    """
+    n = len(lines)
+    i = 0
+    while i < n:
+        if not changed[i]:
+            i += 1
+            continue
+        start = i
+        while i < n and changed[i]:
+            i += 1
+        while i < n and lines[start] == lines[i]:
+            changed[start] = False
+            changed[i] = True
+            start += 1
+            i += 1
+            while i < n and changed[i]:
+                i += 1
+
+
+def opcodes_from_blocks(blocks: list[Block], n: int, m: int) -> list[Opcode]:
+    """Turn matching blocks into opcodes, like SequenceMatcher.get_opcodes()."""
+    opcodes: list[Opcode] = []
+    i = j = 0
+    for ai, bj, size in [*blocks, (n, m, 0)]:
+        if i < ai and j < bj:
+            opcodes.append(("replace", i, ai, j, bj))
+        elif i < ai:
+            opcodes.append(("delete", i, ai, j, bj))
+        elif j < bj:
+            opcodes.append(("insert", i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            opcodes.append(("equal", ai, i, bj, j))
+    return opcodes
+
+
+def difflib_opcodes(
+    a: Sequence[str],
+    b: Sequence[str],
+    a_ids: list[int] | None = None,
+    table: dict[str, int] | None = None,
+) -> list[Opcode]:
+    return difflib.SequenceMatcher(None, a, b).get_opcodes()
+
+
+def myers_opcodes(
+    a: Sequence[str],
+    b: Sequence[str],
+    a_ids: list[int] | None = None,
+    table: dict[str, int] | None = None,
+) -> list[Opcode]:
+    """Return the opcodes of a Myers diff.
+
+    `a_ids` and `table`, the result of `intern_lines(a, table)`, let callers
+    intern a template once and diff it against many files.
+    """
+    if table is None or a_ids is None:
+        table = {}
+        a_ids = intern_lines(a, table)
+    # Lines that are not in `a` never match it, so they only need IDs that
+    # are distinct from each other and from those in `table`
+    new: dict[str, int] = {}
+    b_ids = [
+        table[line] if line in table else new.setdefault(line, -1 - len(new))
+        for line in b
+    ]
+    return opcodes_from_blocks(
+        myers_matching_blocks(a_ids, b_ids), len(a), len(b)
+    )
+
+
+Engine = Callable[
+    [Sequence[str], Sequence[str], list[int] | None, dict[str, int] | None],
+    list[Opcode],
+]
+ENGINES: dict[str, Engine] = {
+    "myers": myers_opcodes,
+    "difflib": difflib_opcodes,
+}
+# Myers' algorithm can place changes differently from difflib, so it would
+# rewrite diffs that were generated with difflib
+DEFAULT_ENGINE = "difflib"
+
+
+def opcodes_from_hunks(
+    hunks: list[Hunk], a: Sequence[str], b: Sequence[str]
+) -> list[Opcode] | None:
+    """Return the opcodes of `hunks` if they turn `a` into `b` exactly.
+
+    Every hunk must apply at the position it states, without fuzz, and the
+    lines between hunks must be equal. Otherwise None is returned.
+    """
+    blocks: list[Block] = []
+
+    def match(i: int, j: int, size: int) -> None:
+        if size:
+            if blocks and blocks[-1][0] + blocks[-1][2] == i:
+                i0, j0, size0 = blocks[-1]
+                if j0 + size0 == j:
+                    blocks[-1] = (i0, j0, size0 + size)
+                    return
+            blocks.append((i, j, size))
+
+    i = j = 0
+    for hunk in hunks:
+        # An empty range is numbered by the line before it
+        old_start = hunk.old_start - 1 if hunk.old_count else hunk.old_start
+        new_start = hunk.new_start - 1 if hunk.new_count else hunk.new_start
+        if (
+            old_start < i
+            or old_start - i != new_start - j
+            or a[i:old_start] != b[j:new_start]
+        ):
+            return None
+        match(i, j, old_start - i)
+        i, j = old_start, new_start
+        for line in hunk.lines:
+            marker, text = line[:1], line[1:].decode("utf-8")
+            if marker == b" ":
+                if i >= len(a) or j >= len(b) or a[i] != text or b[j] != text:
+                    return None
+                match(i, j, 1)
+                i += 1
+                j += 1
+            elif marker == b"-":
+                if i >= len(a) or a[i] != text:
+                    return None
+                i += 1
+            else:
+                if j >= len(b) or b[j] != text:
+                    return None
+                j += 1
+    if a[i:] != b[j:]:
+        return None
+    match(i, j, len(a) - i)
+    return opcodes_from_blocks(blocks, len(a), len(b))
+
+
+def group_opcodes(opcodes: list[Opcode], n: int = 3) -> Iterator[list[Opcode]]:
+    """Group opcodes into hunks with up to `n` lines of context.
+
+    This is SequenceMatcher.get_grouped_opcodes() applied to given opcodes.
+    """
+    codes = list(opcodes) or [("equal", 0, 1, 0, 1)]
+    # Fixup leading and trailing groups if they show no changes
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+
+    nn = n + n
+    group: list[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        # End the current group and start a new one whenever there is a
+        # large range with no changes
+        if tag == "equal" and i2 - i1 > nn:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _format_range(start: int, stop: int) -> str:
+    # Same as difflib._format_range_unified
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def unified_diff(
+    a: Sequence[str],
+    b: Sequence[str],
+    fromfile: str,
+    tofile: str,
+    opcodes: list[Opcode] | None = None,
+    n: int = 3,
+    lineterm: str = "\n",
+) -> Iterator[str]:
+    """Yield the lines of a unified diff, formatted like difflib.unified_diff.
+
+    `opcodes` default to those of the default engine.
+    """
+    if opcodes is None:
+        opcodes = ENGINES[DEFAULT_ENGINE](a, b)
+    started = False
+    for group in group_opcodes(opcodes, n):
+        if not started:
+            started = True
+            yield f"--- {fromfile}{lineterm}"
+            yield f"+++ {tofile}{lineterm}"
+        first, last = group[0], group[-1]
+        file1_range = _format_range(first[1], last[2])
+        file2_range = _format_range(first[3], last[4])
+        yield f"@@ -{file1_range} +{file2_range} @@{lineterm}"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in a[i1:i2]:
+                    yield " " + line
+                continue
+            if tag in {"replace", "delete"}:
+                for line in a[i1:i2]:
+                    yield "-" + line
+            if tag in {"replace", "insert"}:
+                for line in b[j1:j2]:
+                    yield "+" + line
@@ -0,0 +1,83 @@
+"""
+Write output files only when their content changes, and report what changed.
+"""
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from style_variant_builder.cache import write_atomic
+
+CREATED = "created"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+DELETED = "deleted"
+STATUSES = (CREATED, CHANGED, UNCHANGED, DELETED)
+
+
+def write_if_changed(path: Path, data: bytes) -> str:
+    """Atomically write `data` to `path` unless it already holds those bytes.
+
+    The sizes are compared first, so most changed files are detected without
+    reading them. Returns CREATED, CHANGED or UNCHANGED.
+    """
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return UNCHANGED
+        status = CHANGED
+    except FileNotFoundError:
+        status = CREATED
+    write_atomic(path, data)
+    return status
+
+
+@dataclass(slots=True)
+class OutputReport:
+    """The output files of a run, grouped by what happened to them.
+
+    Every file is counted; the paths themselves are only kept if
+    `keep_paths` is set, so that large runs need not hold them all.
+    """
+
+    keep_paths: bool = True
+    files: dict[str, list[Path]] = field(
+        default_factory=lambda: {status: [] for status in STATUSES}
+    )
+    counts: dict[str, int] = field(
+        default_factory=lambda: dict.fromkeys(STATUSES, 0)
+    )
+
+    def add(self, status: str, path: Path) -> None:
+        self.counts[status] += 1
+        if self.keep_paths:
+            self.files[status].append(path)
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{count} {status}" for status, count in self.counts.items()
+        )
+
+    def remove_orphans(
+        self, directories: set[Path], suffix: str, expected: set[Path]
+    ) -> list[Path]:
+        """Delete the files in `directories` that are not in `expected`."""
+        removed = []
+        for directory in sorted(directories):
+            for path in sorted(directory.glob(f"*{suffix}")):
+                if path not in expected:
+                    path.unlink(missing_ok=True)
+                    self.add(DELETED, path)
+                    removed.append(path)
+        return removed
+
+    def to_dict(self) -> dict[str, list[str]]:
+        return {
+            status: sorted(str(path) for path in paths)
+            for status, paths in self.files.items()
+        }
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(self.to_dict(), indent=2) + "\n", encoding="utf-8"
+        )
@@ -0,0 +1,364 @@
+"""
+Apply unified diffs to in-memory lines.
+
+This mirrors the behaviour of `patch -N` for the single-file unified diffs used
+by this repository: each hunk is first tried at its expected position (shifted
+by the offset of the previous hunk), then at increasing distances from it, and
+finally with up to two lines of leading and trailing context ignored (fuzz).
+Failures are reported with the same wording that GNU patch uses.
+"""
+
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+MAX_FUZZ = 2
+
+_HUNK_HEADER = re.compile(rb"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_NO_NEWLINE_MARKER = b"\\"
+
+
+class PatchError(Exception):
+    """Raised when a diff cannot be parsed or one of its hunks does not apply."""
+
+
+@dataclass(slots=True)
+class Hunk:
+    """A single hunk of a unified diff; `lines` keep their ' ', '-' or '+' prefix."""
+
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    lines: list[bytes] = field(default_factory=list)
+
+    @property
+    def old_lines(self) -> list[bytes]:
+        return [line[1:] for line in self.lines if line[:1] in (b" ", b"-")]
+
+    @property
+    def new_lines(self) -> list[bytes]:
+        return [line[1:] for line in self.lines if line[:1] in (b" ", b"+")]
+
+    def context_counts(self) -> tuple[int, int]:
+        """Return the number of leading and trailing context lines."""
+        prefix = 0
+        for line in self.lines:
+            if line[:1] != b" ":
+                break
+            prefix += 1
+        suffix = 0
+        for line in reversed(self.lines):
+            if line[:1] != b" ":
+                break
+            suffix += 1
+        return prefix, suffix
+
+
+@dataclass(slots=True)
+class LineMap:
+    """Which lines of a patched document were copied from the original."""
+
+    # Runs of copied lines, as (first index in the result, first index in the
+    # original, number of lines), in order
+    copied: list[tuple[int, int, int]] = field(default_factory=list)
+    # The number of lines of the result
+    lines: int = 0
+
+    def record(self, result_index: int, original_index: int, count: int) -> None:
+        """Record that `count` lines were copied, extending the last run."""
+        if not count:
+            return
+        if self.copied:
+            last_result, last_original, last_count = self.copied[-1]
+            if (
+                last_result + last_count == result_index
+                and last_original + last_count == original_index
+            ):
+                self.copied[-1] = (last_result, last_original, last_count + count)
+                return
+        self.copied.append((result_index, original_index, count))
+
+    def origins(
+        self, spans: Iterable[tuple[int, int]]
+    ) -> Iterator[int | None]:
+        """Yield the index in the original of the first line of each span.
+
+        Spans are (start, stop) ranges of result lines, in order. None is
+        yielded for a span whose lines were not all copied in one run.
+        """
+        runs = iter(self.copied)
+        run = next(runs, None)
+        for start, stop in spans:
+            # Skip the runs that end before the span starts
+            while run is not None and run[0] + run[2] <= start:
+                run = next(runs, None)
+            if run is not None and run[0] <= start and stop <= run[0] + run[2]:
+                yield run[1] + start - run[0]
+            else:
+                yield None
+
+
+def split_lines(data: bytes) -> list[bytes]:
+    """Split bytes into lines, keeping the line endings (LF only)."""
+    lines = data.split(b"\n")
+    tail = lines.pop()
+    result = [line + b"\n" for line in lines]
+    if tail:
+        result.append(tail)
+    return result
+
+
+def parse_unified_diff(diff: bytes) -> list[Hunk]:
+    """Parse the hunks of a unified diff, ignoring file headers and other text."""
+    lines = split_lines(diff.replace(b"\r\n", b"\n"))
+    hunks: list[Hunk] = []
+    i = 0
+    while i < len(lines):
+        match = _HUNK_HEADER.match(lines[i])
+        i += 1
+        if match is None:
+            continue
+        old_start, old_count, new_start, new_count = (
+            int(value) if value is not None else 1 for value in match.groups()
+        )
+        hunk = Hunk(old_start, old_count, new_start, new_count)
+        old_remaining, new_remaining = old_count, new_count
+        while i < len(lines) and (old_remaining > 0 or new_remaining > 0):
+            line = lines[i]
+            prefix = line[:1]
+            if line == b"\n":
+                # Editors may strip the space from empty context lines
+                line, prefix = b" \n", b" "
+            if prefix == b" ":
+                old_remaining -= 1
+                new_remaining -= 1
+            elif prefix == b"-":
+                old_remaining -= 1
+            elif prefix == b"+":
+                new_remaining -= 1
+            elif prefix != _NO_NEWLINE_MARKER:
+                break
+            if prefix == _NO_NEWLINE_MARKER:
+                _strip_newline(hunk)
+            else:
+                hunk.lines.append(line)
+            i += 1
+        if old_remaining > 0 or new_remaining > 0:
+            raise PatchError(
+                f"patch: **** malformed patch at line {i}: {lines[i - 1].decode('utf-8', 'replace').rstrip()}"
+            )
+        # A marker may follow the last line of the hunk
+        if i < len(lines) and lines[i][:1] == _NO_NEWLINE_MARKER:
+            _strip_newline(hunk)
+            i += 1
+        hunks.append(hunk)
+    return hunks
+
+
+def _strip_newline(hunk: Hunk) -> None:
+    if hunk.lines and hunk.lines[-1].endswith(b"\n"):
+        hunk.lines[-1] = hunk.lines[-1][:-1]
+
+
+def _matches(
+    lines: list[bytes],
+    position: int,
+    pattern: list[bytes],
+    skip_start: int,
+    skip_end: int,
+) -> bool:
+    end = len(pattern) - skip_end
+    return (
+        lines[position + skip_start : position + end] == pattern[skip_start:end]
+    )
+
+
+def _locate(
+    lines: list[bytes],
+    pattern: list[bytes],
+    context: tuple[int, int],
+    fuzz: int,
+    guess: int,
+    minimum: int,
+    at_start: bool,
+) -> int | None:
+    """
+    Find the position of `pattern` in `lines`, ignoring up to `fuzz` lines of
+    context at either end, the way patch's locate_hunk does.
+
+    A hunk with less leading than trailing context can only match the start of
+    the file, and one with less trailing context can only match its end.
+    """
+    prefix, suffix = context
+    longest = max(prefix, suffix)
+    prefix_fuzz = fuzz + prefix - longest
+    suffix_fuzz = fuzz + suffix - longest
+    # Only the context that is not fuzzed away has to lie after the lines
+    # already copied and before the end of the file
+    max_position = len(lines) - len(pattern) + max(suffix_fuzz, 0)
+    min_position = max(minimum - max(prefix_fuzz, 0), 0)
+    if max_position < min_position:
+        return None
+    if prefix_fuzz < 0 and at_start:
+        # Can only match the start of the file (or the entire file)
+        if suffix_fuzz < 0 and len(pattern) != len(lines):
+            return None
+        if minimum == 0 and _matches(lines, 0, pattern, 0, max(suffix_fuzz, 0)):
+            return 0
+        return None
+    if suffix_fuzz < 0:
+        # Can only match the end of the file
+        if _matches(lines, max_position, pattern, max(prefix_fuzz, 0), 0):
+            return max_position
+        return None
+    prefix_fuzz = max(prefix_fuzz, 0)
+    guess = min(max(guess, min_position), max_position)
+    for distance in range(max(guess - min_position, max_position - guess) + 1):
+        position = guess + distance
+        if position <= max_position and _matches(
+            lines, position, pattern, prefix_fuzz, suffix_fuzz
+        ):
+            return position
+        position = guess - distance
+        if (
+            distance
+            and position >= min_position
+            and _matches(lines, position, pattern, prefix_fuzz, suffix_fuzz)
+        ):
+            return position
+    return None
+
+
+def apply_unified_diff(
+    original: list[bytes],
+    diff: bytes,
+    filename: str = "file",
+    notes: list[str] | None = None,
+    line_map: LineMap | None = None,
+) -> list[bytes]:
+    """
+    Apply a unified diff to `original` and return the patched lines.
+
+    Raises PatchError carrying the messages that `patch -N` would print if the
+    diff contains no hunks, or if any hunk cannot be applied. If the diff
+    applies, the messages for hunks that applied at an offset or with fuzz
+    are appended to `notes`, and the lines that were copied from `original`
+    are recorded in `line_map`, if given.
+    """
+    copied = LineMap()
+    lone_cr = False
+    hunks = parse_unified_diff(diff)
+    if not hunks:
+        raise PatchError(
+            "patch: **** Only garbage was found in the patch input."
+        )
+
+    messages = [f"patching file {filename}"]
+    result: list[bytes] = []
+    consumed = 0  # Number of original lines already copied to the result
+    offset = 0
+    failed = 0
+    for number, hunk in enumerate(hunks, start=1):
+        # patch numbers an empty old range by the line that follows it
+        first = hunk.old_start if hunk.old_count else hunk.old_start + 1
+        guess = first - 1 + offset
+        context = hunk.context_counts()
+        growth = len(result) - consumed  # Lines added by the previous hunks
+
+        position = None
+        fuzz = 0
+        for fuzz in range(min(MAX_FUZZ, max(context)) + 1):
+            position = _locate(
+                original,
+                hunk.old_lines,
+                context,
+                fuzz,
+                guess,
+                consumed,
+                first <= 1,
+            )
+            if position is not None:
+                break
+            # Like patch, check whether the first hunk has already been
+            # applied before allowing more fuzz
+            if (
+                number == 1
+                and _locate(
+                    original,
+                    hunk.new_lines,
+                    context,
+                    fuzz,
+                    guess,
+                    consumed,
+                    hunk.new_start <= 1,
+                )
+                is not None
+            ):
+                raise PatchError(
+                    "\n".join(
+                        [
+                            *messages,
+                            "Reversed (or previously applied) patch detected!  Skipping patch.",
+                            f"{len(hunks)} out of {len(hunks)} {_plural(len(hunks), 'hunk')} ignored",
+                        ]
+                    )
+                )
+
+        if position is None:
+            failed += 1
+            messages.append(f"Hunk #{number} FAILED at {first + growth}.")
+            continue
+
+        # Like patch, copy the original up to each change, so context lines
+        # are taken from the original, as they may differ from the hunk when
+        # it was applied with fuzz, and the context after the last change is
+        # left for the next hunk to match
+        line_number = position  # The original line of the next hunk line
+        for line in hunk.lines:
+            marker, text = line[:1], line[1:]
+            if marker == b" ":
+                line_number += 1
+                continue
+            copied.record(len(result), consumed, line_number - consumed)
+            result.extend(original[consumed:line_number])
+            consumed = line_number
+            if marker == b"-":
+                line_number += 1
+                consumed = line_number
+            else:
+                result.append(text)
+                if b"\r" in text:
+                    # XML parsers count a lone CR as a line break, so the
+                    # lines after it are numbered differently from the result
+                    lone_cr = True
+
+        line_offset = position - (first - 1)
+        if line_offset or fuzz:
+            detail = f"Hunk #{number} succeeded at {position + 1 + growth}"
+            if fuzz:
+                detail += f" with fuzz {fuzz}"
+            if line_offset:
+                lines_word = "line" if line_offset == 1 else "lines"
+                detail += f" (offset {line_offset} {lines_word})"
+            messages.append(detail + ".")
+        offset = line_offset
+
+    if failed:
+        messages.append(
+            f"{failed} out of {len(hunks)} {_plural(len(hunks), 'hunk')} FAILED"
+        )
+        raise PatchError("\n".join(messages))
+
+    if notes is not None:
+        notes.extend(messages[1:])
+    copied.record(len(result), consumed, len(original) - consumed)
+    result.extend(original[consumed:])
+    if line_map is not None and not lone_cr:
+        line_map.copied = copied.copied
+        line_map.lines = len(result)
+    return result
+
+
+def _plural(count: int, word: str) -> str:
+    return word if abs(count) == 1 else f"{word}s"
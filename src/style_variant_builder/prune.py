@@ -6,15 +6,37 @@ import argparse
 import logging
 import re
 import sys
+from collections import Counter, deque
+from collections.abc import Container
 from copy import deepcopy
 from dataclasses import dataclass, field
 from pathlib import Path
 
 from lxml import etree
 
+from style_variant_builder.outputs import write_if_changed
+from style_variant_builder.patch import LineMap
+
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 
 NSMAP = {"csl": "http://purl.org/net/xbiblio/csl"}
+# The macro attributes of an element and of all its descendants
+_MACRO_REFS = etree.XPath("descendant-or-self::*/@macro")
+_NESTED_MACROS = etree.XPath("descendant::csl:macro", namespaces=NSMAP)
+_MACRO_CALLS = etree.XPath("descendant::*[@macro]")
+_BETWEEN_TAGS = re.compile(rb">\s+<")
+# Term names, some with spaces, and lists of variables, whose labels are
+# the terms named after them
+_TERM_REFS = etree.XPath("descendant::*/@term")
+_VARIABLE_REFS = etree.XPath("descendant::*/@variable")
+
+_LXML_DECLARATION = b"<?xml version='1.0' encoding='utf-8'?>"
+_DECLARATION = b'<?xml version="1.0" encoding="utf-8"?>'
+_EM_DASH = "\u2014".encode("utf-8")
+# A comment line that holds nothing but a tag
+_TAG_LINE = re.compile(r"^[ \t]*<[^>]+>[ \t]*$")
+_STYLE_TAG = re.compile(r"<style\s+([^>]+)>")
+_ATTRIBUTE = re.compile(r'(\S+="[^"]*")')
 
 
 def _tag(local_name: str) -> str:
@@ -22,10 +44,130 @@ def _tag(local_name: str) -> str:
     return f"{{{NSMAP['csl']}}}{local_name}"
 
 
+# The attributes of a macro call that the one element a macro renders can
+# take over, by the tag of that element: affixes, display and formatting,
+# and quotes for text
+_FORMATTING = frozenset(
+    {
+        "prefix",
+        "suffix",
+        "display",
+        "font-style",
+        "font-variant",
+        "font-weight",
+        "text-decoration",
+        "vertical-align",
+    }
+)
+_TRANSFERABLE = {
+    _tag("date"): _FORMATTING,
+    _tag("group"): _FORMATTING,
+    _tag("names"): _FORMATTING,
+    _tag("number"): _FORMATTING,
+    _tag("text"): _FORMATTING | {"quotes"},
+}
+# Terms that CSL processors use without an attribute naming them: quotes,
+# ordinals, dates, name lists and ranges
+_IMPLICIT_TERMS = frozenset(
+    {
+        "open-quote",
+        "close-quote",
+        "open-inner-quote",
+        "close-inner-quote",
+        "ordinal",
+        "ad",
+        "bc",
+        "and",
+        "and others",
+        "et-al",
+        "editortranslator",
+        "page-range-delimiter",
+        "year-range-delimiter",
+        "citation-range-delimiter",
+    }
+)
+_IMPLICIT_TERM_PREFIXES = ("ordinal-", "long-ordinal-", "month-", "season-")
+# The terms a label of the locator variable can render, one per type
+_LOCATOR_TERMS = frozenset(
+    {
+        "act",
+        "appendix",
+        "article-locator",
+        "book",
+        "canon",
+        "chapter",
+        "column",
+        "elocation",
+        "equation",
+        "figure",
+        "folio",
+        "issue",
+        "line",
+        "note",
+        "opus",
+        "page",
+        "paragraph",
+        "part",
+        "rule",
+        "scene",
+        "section",
+        "sub verbo",
+        "sub-verbo",
+        "supplement",
+        "table",
+        "timestamp",
+        "title-locator",
+        "verse",
+        "version",
+        "volume",
+    }
+)
+# The branches of a choose, which render into the parent of the choose
+_BRANCHES = frozenset({_tag("if"), _tag("else-if"), _tag("else")})
+
+
+def _canonical_comment(text: str) -> str:
+    """Return the text of a comment in the format of the styles repository.
+
+    Runs of lines that hold only tags, such as XML examples, are collapsed
+    into one line, and <style> tags in the comment get the default-locale
+    attribute last, like the <style> element itself.
+    """
+    if "\n" in text:
+        lines = text.split("\n")
+        new_lines: list[str] = []
+        i = 0
+        while i < len(lines):
+            if _TAG_LINE.match(lines[i]):
+                # Gather consecutive tag-only lines
+                seq: list[str] = []
+                while i < len(lines) and _TAG_LINE.match(lines[i]):
+                    seq.append(lines[i])
+                    i += 1
+                # Collapse sequence
+                indent_match = re.match(r"^([ \t]*)", seq[0])
+                indent = indent_match.group(1) if indent_match else ""
+                new_lines.append(indent + "".join(s.strip() for s in seq))
+            else:
+                new_lines.append(lines[i])
+                i += 1
+        text = "\n".join(new_lines)
+    return _STYLE_TAG.sub(_move_default_locale_last, text)
+
+
+def _move_default_locale_last(match: re.Match) -> str:
+    attrs = _ATTRIBUTE.findall(match.group(1))
+    # Separate default-locale from other attributes
+    other_attrs = [a for a in attrs if not a.startswith("default-locale=")]
+    locale_attrs = [a for a in attrs if a.startswith("default-locale=")]
+    return f"<style {' '.join(other_attrs + locale_attrs)}>"
+
+
 @dataclass(slots=True)
 class CSLPruner:
-    input_path: Path
-    output_path: Path
+    # Not needed for documents parsed and serialized in memory
+    input_path: Path | None = None
+    output_path: Path | None = None
     tree: etree._ElementTree | None = field(default=None, init=False)
     root: etree._Element | None = field(default=None, init=False)
     macro_defs: dict[str, etree._Element] = field(
@@ -34,6 +176,10 @@ class CSLPruner:
     modified: bool = field(
         default=False, init=False
     )  # Track whether changes have been made
+    # Top-level elements changed since parsing, whose source is out of date
+    edited: set[etree._Element] = field(
+        default_factory=set, init=False, repr=False
+    )
     notice_comment: str | None = field(
         default=(
             "This file was generated by the Style Variant Builder "
@@ -43,12 +189,25 @@ class CSLPruner:
         init=False,
     )
 
-    def parse_xml(self) -> None:
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CSLPruner":
+        """Return a pruner for a document held in memory."""
+        pruner = cls()
+        pruner.parse_xml(data)
+        return pruner
+
+    def parse_xml(self, data: bytes | None = None) -> None:
+        """Parse the input file, or `data` if the document is already in memory."""
+        if data is None and self.input_path is None:
+            raise ValueError("No input path or data to parse.")
         try:
             parser = etree.XMLParser(
                 remove_blank_text=True, resolve_entities=False, no_network=True
             )
-            self.tree = etree.parse(self.input_path, parser=parser)
+            if data is not None:
+                self.tree = etree.fromstring(data, parser=parser).getroottree()
+            else:
+                self.tree = etree.parse(self.input_path, parser=parser)
             if self.tree is None:
                 raise ValueError("Parsed XML tree is None.")
             self.root = self.tree.getroot()
@@ -121,6 +280,7 @@ class CSLPruner:
             for sub in list(macro_def):
                 layout.append(deepcopy(sub))
 
+            self._mark_edited(layout)
             updated += 1
 
         if updated:
@@ -129,200 +289,708 @@ class CSLPruner:
             self.collect_macro_definitions()
         return updated
 
+    def _mark_edited(self, element: etree._Element) -> None:
+        """Record that the top-level element holding `element` changed."""
+        self.edited.add([element, *element.iterancestors()][-2])
+
     def gather_macro_refs(self, element: etree._Element) -> set[str]:
-        """Recursively collect macro names to which the element refers."""
-        refs: set[str] = set()
-        if macro_attr := element.attrib.get("macro"):
-            refs.add(macro_attr)
-        for child in element:
-            refs.update(self.gather_macro_refs(child))
-        return refs
+        """Collect the macro names to which the element or its descendants refer."""
+        return {str(ref) for ref in _MACRO_REFS(element) if ref}
 
     def build_used_macros(self) -> set[str]:
+        """Return the names of the macros referred to anywhere in the style.
+
+        This includes references from macros that are themselves unused;
+        `prune_macros()` removes those along with the macros they use.
+        """
         if self.root is None:
             msg = "Root is None. Ensure parse_xml() is called successfully."
             logging.error(msg)
             raise ValueError(msg)
-        used_macros: set[str] = set()
-
-        def add_macro_and_deps(macro_name: str) -> None:
-            if macro_name in used_macros:
-                return
-            used_macros.add(macro_name)
-            if (macro := self.macro_defs.get(macro_name)) is not None:
-                refs = self.gather_macro_refs(macro)
-                for ref in refs:
-                    add_macro_and_deps(ref)
-
-        # Entry points: <citation> and <bibliography>
-        entry_tags = [_tag("citation"), _tag("bibliography")]
-        entry_macro_refs = {
-            ref
-            for tag in entry_tags
-            for entry in self.root.iter(tag)
-            for ref in self.gather_macro_refs(entry)
-        }
-        entry_macro_refs.update(self.gather_macro_refs(self.root))
-        for ref in entry_macro_refs:
-            add_macro_and_deps(ref)
-        return used_macros
-
-    def prune_macros(self) -> None:
-        total_removed_count = 0
-        while True:
-            used_macros = self.build_used_macros()
-            removed = []
-            for name, macro in list(self.macro_defs.items()):
-                if name not in used_macros:
-                    if (parent := macro.getparent()) is not None:
-                        parent.remove(macro)
-                        removed.append(name)
-                        logging.debug(f"Removed macro: {name}")
-            if removed:
-                self.modified = True
-                total_removed_count += len(removed)
-                self.collect_macro_definitions()
-            else:
-                logging.debug("No unused macros found.")
-                break
-        if total_removed_count > 0:
-            logging.debug(
-                f"Removed a total of {total_removed_count} unused macros."
-            )
+        return self.gather_macro_refs(self.root)
+
+    def prune_macros(
+        self,
+        graph: "MacroGraph | None" = None,
+        line_map: LineMap | None = None,
+    ) -> None:
+        """Remove the macros that nothing outside unused macros refers to.
+
+        Each macro counts the references to it. A macro with none is removed,
+        which drops the counts of the macros it refers to, and so on, until
+        every remaining macro is referred to. Macros that only refer to each
+        other in a cycle are kept. Every element is visited a bounded number
+        of times, so this takes time linear in the size of the style.
+
+        With the `graph` of the template the document was patched from, and
+        the `line_map` of the patch, only the top-level elements that the
+        patch changed are read.
+        """
+        if self.root is None:
+            msg = "Root is None. Ensure parse_xml() is called successfully."
+            logging.error(msg)
+            raise ValueError(msg)
+        kept = None
+        if graph is not None and line_map is not None:
+            kept = graph.surviving_macros(self.root, line_map, self.edited)
+        removed = (
+            self._remove_unused_macros(self.root)
+            if kept is None
+            else self._remove_macros_except(self.root, kept)
+        )
+        if removed:
+            self.modified = True
+            logging.debug(f"Removed a total of {removed} unused macros.")
         else:
             logging.debug("No macros pruned.")
 
-    def _normalize_xml_declaration(self, text: str) -> str:
-        """Ensure XML declaration uses double quotes."""
-        return re.sub(
-            r"<\?xml version='1\.0' encoding='utf-8'\?>",
-            '<?xml version="1.0" encoding="utf-8"?>',
-            text,
-        )
+    def _remove_unused_macros(self, root: etree._Element) -> int:
+        counts = Counter(str(ref) for ref in _MACRO_REFS(root) if ref)
+        # All definitions of a name, since duplicates are removed together
+        definitions: dict[str, list[etree._Element]] = {}
+        for macro in root.iter(_tag("macro")):
+            if name := macro.attrib.get("name"):
+                definitions.setdefault(name, []).append(macro)
+
+        unused = deque(name for name in definitions if not counts[name])
+        removed = 0
+        while unused:
+            name = unused.popleft()
+            for macro in definitions.pop(name):
+                if (parent := macro.getparent()) is None:
+                    continue
+                for ref in map(str, _MACRO_REFS(macro)):
+                    if not ref:
+                        continue
+                    counts[ref] -= 1
+                    if counts[ref] == 0 and ref in definitions:
+                        unused.append(ref)
+                parent.remove(macro)
+                removed += 1
+                logging.debug(f"Removed macro: {name}")
+            self.macro_defs.pop(name, None)
+        return removed
+
+    def _remove_macros_except(self, root: etree._Element, kept: set[str]) -> int:
+        removed = 0
+        for node in list(root.iterchildren(_tag("macro"))):
+            if (name := node.attrib.get("name")) and name not in kept:
+                root.remove(node)
+                removed += 1
+                logging.debug(f"Removed macro: {name}")
+                self.macro_defs.pop(name, None)
+        return removed
+
+    def prune_locale_terms(self) -> int:
+        """Remove the terms that the locales of the style define but nothing
+        uses.
+
+        A term is used if a term attribute names it, or if a variable
+        attribute names it, since a label renders the term of its variable.
+        The terms that CSL processors use without either are always kept:
+        quotes, ordinals, month and season names, the terms of name lists
+        and ranges, and, if the locator is used, the terms of every type of
+        locator. Lists of terms left empty are removed.
+
+        Returns the number of terms removed.
+        """
+        if self.root is None:
+            msg = "Root is None. Ensure parse_xml() is called successfully."
+            logging.error(msg)
+            raise ValueError(msg)
+        used = set(map(str, _TERM_REFS(self.root)))
+        for variables in set(_VARIABLE_REFS(self.root)):
+            used.update(variables.split())
+        if "locator" in used:
+            used |= _LOCATOR_TERMS
+        removed = 0
+        for locale in self.root.iterchildren(_tag("locale")):
+            for terms in list(locale.iterchildren(_tag("terms"))):
+                before = removed
+                for term in list(terms.iterchildren(_tag("term"))):
+                    name = term.attrib.get("name")
+                    if (
+                        not name
+                        or name in used
+                        or name in _IMPLICIT_TERMS
+                        or name.startswith(_IMPLICIT_TERM_PREFIXES)
+                    ):
+                        continue
+                    terms.remove(term)
+                    removed += 1
+                    logging.debug(f"Removed term: {name}")
+                if removed == before:
+                    continue
+                if not any(isinstance(child.tag, str) for child in terms):
+                    locale.remove(terms)
+                self._mark_edited(locale)
+        if removed:
+            self.modified = True
+        return removed
 
-    def _escape_em_dashes(self, text: str) -> str:
-        """Replace em-dashes with numeric entities."""
-        return re.sub(r"—+", lambda m: "&#8212;" * len(m.group(0)), text)
-
-    def normalize_xml_content(self, xml_data: bytes) -> bytes:
-        """Revert Python changes to XML content and reorder the default-locale attribute in <style> tags."""
-        text = xml_data.decode("utf-8")
-        text = self._normalize_xml_declaration(text)
-        text = self._escape_em_dashes(text)
-
-        # Collapse XML fragments inside multi-line comments to match CSL repository indentation
-        # Pattern captures the entire comment body (non-greedy) so we can post-process line breaks
-        comment_pattern = re.compile(r"<!--(.*?)-->", re.DOTALL)
-
-        def collapse_comment(match: re.Match) -> str:
-            body = match.group(1)
-            # Quick exit if no newline (single-line comment)
-            if "\n" not in body:
-                return f"<!--{body}-->"
-            lines = body.split("\n")
-            tag_line_regex = re.compile(r"^[ \t]*<[^>]+>[ \t]*$")
-            new_lines: list[str] = []
-            i = 0
-            while i < len(lines):
-                if tag_line_regex.match(lines[i]):
-                    # Gather consecutive tag-only lines
-                    seq: list[str] = []
-                    while i < len(lines) and tag_line_regex.match(lines[i]):
-                        seq.append(lines[i])
-                        i += 1
-                    # Collapse sequence
-                    indent_match = re.match(r"^([ \t]*)", seq[0])
-                    indent = indent_match.group(1) if indent_match else ""
-                    collapsed = indent + "".join(s.strip() for s in seq)
-                    new_lines.append(collapsed)
-                else:
-                    new_lines.append(lines[i])
-                    i += 1
-            collapsed_body = "\n".join(new_lines)
-            return f"<!--{collapsed_body}-->"
+    def merge_duplicate_macros(self) -> int:
+        """Merge macros whose bodies are the same into the first of them.
+
+        Bodies are compared in canonical form, with sorted attributes and
+        without comments or whitespace between tags. The calls to a merged
+        macro are renamed and it is removed. That can make the bodies of
+        the macros calling it the same, so merging repeats, with only those
+        bodies read again, until no two bodies are. Macros defined more than
+        once are left alone.
+
+        Returns the number of macros removed.
+        """
+        if self.root is None:
+            msg = "Root is None. Ensure parse_xml() is called successfully."
+            logging.error(msg)
+            raise ValueError(msg)
+        definitions: dict[str, list[etree._Element]] = {}
+        for macro in self.root.iter(_tag("macro")):
+            if name := macro.attrib.get("name"):
+                definitions.setdefault(name, []).append(macro)
+        bodies = {
+            name: _canonical_body(macros[0])
+            for name, macros in definitions.items()
+            if len(macros) == 1
+        }
+        # The calls to each macro, once there is one to merge
+        calls: dict[str, list[etree._Element]] | None = None
 
-        text = comment_pattern.sub(collapse_comment, text)
+        merged = 0
+        while True:
+            # The first macro with each body, in document order
+            first: dict[bytes, str] = {}
+            renamed = {
+                name: kept
+                for name, body in bodies.items()
+                if (kept := first.setdefault(body, name)) != name
+            }
+            if not renamed:
+                break
+            if calls is None:
+                calls = {}
+                for call in _MACRO_CALLS(self.root):
+                    calls.setdefault(call.attrib["macro"], []).append(call)
+            callers: set[str] = set()
+            for name, kept in renamed.items():
+                del bodies[name]
+                macro = definitions[name][0]
+                if (parent := macro.getparent()) is not None:
+                    parent.remove(macro)
+                logging.debug(f"Merged macro {name} into {kept}")
+                for call in calls.pop(name, ()):
+                    call.attrib["macro"] = kept
+                    self._mark_edited(call)
+                    for caller in call.iterancestors(_tag("macro")):
+                        callers.add(caller.attrib.get("name", ""))
+                    calls.setdefault(kept, []).append(call)
+            for name in callers & bodies.keys():
+                bodies[name] = _canonical_body(definitions[name][0])
+            merged += len(renamed)
+
+        if merged:
+            self.modified = True
+            self.collect_macro_definitions()
+        return merged
 
-        # Reorder the default-locale attribute to the end in <style ...> tags.
-        def reorder_default_locale(match: re.Match) -> str:
-            attribs = match.group(1)
-            attrs = re.findall(r'(\S+="[^"]*")', attribs)
+    def inline_macros(self) -> int:
+        """Inline macros called from one place, and trivial macros.
 
-            # Separate default-locale from other attributes
-            other_attrs = [
-                a for a in attrs if not a.startswith("default-locale=")
-            ]
-            locale_attrs = [a for a in attrs if a.startswith("default-locale=")]
+        A call from a <text macro> element is replaced with the body of the
+        macro if nothing else calls the macro, or if the body is a single
+        element without children. A single element takes over the affixes,
+        display and formatting of the call, provided it has none of its own;
+        several elements are only inlined where nothing separates them, and
+        only without other attributes on the call. Calls from sort keys,
+        macros defined more than once and macros that call themselves are
+        left alone. Macros whose calls were all inlined are removed.
 
-            # Reorder: other attributes first, then locale
-            new_attribs = " ".join(other_attrs + locale_attrs)
-            return f"<style {new_attribs}>"
+        The calls within a macro are inlined before the calls to it, so the
+        copies of a body hold no call that could still be inlined, and one
+        pass over the calls leaves none that could.
 
-        text = re.sub(r"<style\s+([^>]+)>", reorder_default_locale, text)
-        return text.encode("utf-8")
+        Returns the number of calls inlined.
+        """
+        if self.root is None:
+            msg = "Root is None. Ensure parse_xml() is called successfully."
+            logging.error(msg)
+            raise ValueError(msg)
+        if inlined := self._inline_macros(self.root):
+            self.modified = True
+            self.collect_macro_definitions()
+            logging.debug(f"Inlined a total of {inlined} macro calls.")
+        return inlined
+
+    def _inline_macros(self, root: etree._Element) -> int:
+        counts = _element_refs(root)
+        definitions: dict[str, list[etree._Element]] = {}
+        for macro in root.iter(_tag("macro")):
+            if name := macro.attrib.get("name"):
+                definitions.setdefault(name, []).append(macro)
+        order = _callees_first(definitions)
+        acyclic = set(order)
+        containers = [macro for name in order for macro in definitions[name]]
+        containers.extend(
+            element
+            for element in root.iterchildren(etree.Element)
+            if _macro_name(element) not in acyclic
+        )
+        calls = [
+            call
+            for container in containers
+            for call in container.iter(_tag("text"))
+            if call.attrib.get("macro") in acyclic
+        ]
+
+        # Neither the body of a macro nor the references in it change once
+        # the calls to it are reached
+        trivial: dict[str, bool] = {}
+        refs: dict[str, Counter[str]] = {}
+        inlined: set[str] = set()
+        count = 0
+        for call in calls:
+            name = call.attrib["macro"]
+            macro = definitions[name][0]
+            if len(definitions[name]) != 1:
+                continue
+            if name not in trivial:
+                trivial[name] = _is_trivial(macro)
+            if counts[name] != 1 and not trivial[name]:
+                continue
+            body = [child for child in macro if isinstance(child.tag, str)]
+            if (nodes := _inlined_nodes(call, macro, body)) is None:
+                continue
+            self._mark_edited(call)
+            parent = call.getparent()
+            index = parent.index(call)
+            parent[index : index + 1] = nodes
+            counts[name] -= 1
+            if name not in refs:
+                refs[name] = _element_refs(macro)
+            counts.update(refs[name])
+            inlined.add(name)
+            count += 1
+            logging.debug(f"Inlined macro: {name}")
+
+        for name in inlined:
+            if counts[name]:
+                continue
+            macro = definitions[name][0]
+            if (parent := macro.getparent()) is not None:
+                parent.remove(macro)
+                logging.debug(f"Removed macro: {name}")
+        return count
 
-    def reindent_xml_bytes(self, xml_data: bytes) -> bytes:
-        """Reindent the XML by stripping blank text nodes and pretty-printing.
+    def to_bytes(self) -> bytes:
+        """Serialize the document in the format of the CSL styles repository.
 
-        This should be applied as a final structural formatter to ensure
-        consistent indentation after all tree edits and notice insertion.
+        The tree is brought into that format, serialized once and restored,
+        so serializing is repeatable and leaves the document as it was.
         """
+        if self.tree is None or self.root is None:
+            msg = (
+                "Cannot save file because the XML was not successfully loaded."
+            )
+            logging.error(msg)
+            raise ValueError(msg)
+        root = self.root
+        notice = None
+        # Insert notice comment if set
+        if self.notice_comment:
+            # Add spaces around comment text for proper XML comment formatting
+            notice = etree.Comment(f" {self.notice_comment.strip()} ")
+            root.insert(0, notice)
+        comments = [
+            (comment, comment.text)
+            for comment in root.iter(etree.Comment)
+            if comment.text and ("\n" in comment.text or "<style" in comment.text)
+        ]
+        # The styles repository puts the default-locale attribute last
+        attributes = root.keys()
+        reordered = "default-locale" in attributes[:-1]
+        original_attributes = dict(root.attrib) if reordered else {}
         try:
-            parser = etree.XMLParser(remove_blank_text=True)
-            root = etree.fromstring(xml_data, parser)
-            new_tree = etree.ElementTree(root)
-            return etree.tostring(
-                new_tree,
+            for comment, text in comments:
+                comment.text = _canonical_comment(text)
+            if reordered:
+                root.set("default-locale", root.attrib.pop("default-locale"))
+            # Serialize from the element root to avoid including any
+            # document-level processing instructions (e.g., xml-model)
+            xml_data = etree.tostring(
+                root,
                 encoding="utf-8",
                 xml_declaration=True,
                 pretty_print=True,
             )
-        except Exception:
-            # If reindent fails for any reason, fall back to the original bytes
-            logging.warning(
-                "Reindent step failed; writing original formatted XML.",
+        finally:
+            # Leave the tree as it was, so that serializing is repeatable
+            for comment, text in comments:
+                comment.text = text
+            if reordered:
+                root.attrib.clear()
+                root.attrib.update(original_attributes)
+            if notice is not None:
+                root.remove(notice)
+        # Double quotes in the declaration, and em-dashes as numeric entities
+        xml_data = xml_data.replace(_LXML_DECLARATION, _DECLARATION, 1)
+        return xml_data.replace(_EM_DASH, b"&#8212;")
+
+    def save(self) -> None:
+        if self.output_path is None:
+            raise ValueError("No output path to save to; use to_bytes().")
+        data = self.to_bytes()
+        try:
+            write_if_changed(self.output_path, data)
+        except Exception as e:
+            logging.error(
+                "Failed to save the pruned XML file. Please ensure the output path is valid and writable.",
                 exc_info=True,
             )
-            return xml_data
+            raise e
 
-    def save(self) -> None:
-        if self.tree is not None:
-            try:
-                # Insert notice comment if set
-                if self.notice_comment and self.root is not None:
-                    # Add spaces around comment text for proper XML comment formatting
-                    comment_text = f" {self.notice_comment.strip()} "
-                    self.root.insert(0, etree.Comment(comment_text))
-
-                # Serialize from the element root to avoid including any
-                # document-level processing instructions (e.g., xml-model)
-                xml_data = etree.tostring(
-                    self.root if self.root is not None else self.tree,
-                    encoding="utf-8",
-                    xml_declaration=True,
-                    pretty_print=True,
-                )
-                # Normalize textual content, then reindent the entire file
-                xml_data = self.normalize_xml_content(xml_data)
-                xml_data = self.reindent_xml_bytes(xml_data)
-                # Ensure XML declaration uses double quotes
-                xml_text = xml_data.decode("utf-8")
-                xml_text = self._normalize_xml_declaration(xml_text)
-                # lxml will decode character entities during reparse; restore em-dashes as numeric entities
-                xml_text = self._escape_em_dashes(xml_text)
-                self.output_path.write_text(xml_text, encoding="utf-8")
-            except Exception as e:
-                logging.error(
-                    "Failed to save the pruned XML file. Please ensure the output path is valid and writable.",
-                    exc_info=True,
-                )
-                raise e
-        else:
-            msg = (
-                "Cannot save file because the XML was not successfully loaded."
+
+def _macro_name(element: etree._Element) -> str | None:
+    """Return the name of the macro a top-level element defines, if any."""
+    if element.tag != _tag("macro"):
+        return None
+    return element.attrib.get("name") or None
+
+
+def _element_refs(element: etree._Element) -> Counter[str]:
+    return Counter(str(ref) for ref in _MACRO_REFS(element) if ref)
+
+
+def _callees_first(definitions: dict[str, list[etree._Element]]) -> list[str]:
+    """Return the names of the macros that do not lead into a cycle of
+    calls, each after the macros it calls.
+
+    Macros that call themselves, directly or through other macros, and the
+    macros that call those, are left out.
+    """
+    calls = {
+        name: Counter(
+            ref
+            for macro in macros
+            for ref in map(str, _MACRO_REFS(macro))
+            if ref in definitions
+        )
+        for name, macros in definitions.items()
+    }
+    callers: dict[str, set[str]] = {name: set() for name in calls}
+    for name, refs in calls.items():
+        for ref in refs:
+            callers[ref].add(name)
+    # Peel off the macros that call no remaining macro
+    remaining = {name: len(refs) for name, refs in calls.items()}
+    order = [name for name, count in remaining.items() if not count]
+    for name in order:
+        for caller in callers[name]:
+            remaining[caller] -= 1
+            if not remaining[caller]:
+                order.append(caller)
+    return order
+
+
+def _canonical_body(macro: etree._Element) -> bytes:
+    """Return the body of `macro` in canonical form."""
+    data = etree.tostring(macro, method="c14n", with_comments=False)
+    # Leave out the tags of the macro, which hold its name
+    return _BETWEEN_TAGS.sub(b"><", data[data.index(b">") + 1 : data.rindex(b"<")])
+
+
+def _is_trivial(macro: etree._Element) -> bool:
+    """Return whether `macro` renders one element without children."""
+    body = [child for child in macro if isinstance(child.tag, str)]
+    return len(body) == 1 and len(body[0]) == 0
+
+
+def _concatenates(parent: etree._Element | None) -> bool:
+    """Return whether `parent` renders its children with nothing between
+    them, and without special rules for its direct children."""
+    while parent is not None and parent.tag in _BRANCHES:
+        choose = parent.getparent()
+        parent = choose.getparent() if choose is not None else None
+    if parent is None:
+        return False
+    if parent.tag == _tag("macro"):
+        return True
+    return parent.tag == _tag("group") and "delimiter" not in parent.attrib
+
+
+def _inlined_nodes(
+    call: etree._Element, macro: etree._Element, body: list[etree._Element]
+) -> list[etree._Element] | None:
+    """Return copies of the nodes that render the same as `call` in its
+    place, or None if the body of `macro` cannot be inlined there."""
+    parent = call.getparent()
+    # A <names> directly in <substitute> inherits the options of the one it
+    # substitutes for, which a <names> in a macro does not
+    if not body or parent is None or parent.tag == _tag("substitute"):
+        return None
+    attributes = {
+        str(key): str(value)
+        for key, value in call.attrib.items()
+        if key != "macro"
+    }
+    # A choose renders the elements of its branch into its parent, so it
+    # is inlined as if those were the body
+    if len(body) == 1 and body[0].tag != _tag("choose"):
+        element = body[0]
+        transferable = _TRANSFERABLE.get(element.tag, frozenset())
+        if not attributes.keys() <= transferable or any(
+            key in element.attrib for key in attributes
+        ):
+            return None
+    elif attributes or not _concatenates(parent):
+        return None
+    nodes = [deepcopy(child) for child in macro]
+    for node in nodes:
+        node.tail = None
+        if isinstance(node.tag, str):
+            node.attrib.update(attributes)
+    return nodes
+
+
+def _top_level_elements(
+    root: etree._Element,
+) -> tuple[list[etree._Element], list[int]] | None:
+    """Return the top-level elements of `root` and the lines they start on.
+
+    Comments are left out, since they hold no references. Returns None
+    unless each element starts on a line of its own.
+    """
+    elements = list(root.iterchildren(etree.Element))
+    starts: list[int] = []
+    for element in elements:
+        start = element.sourceline
+        if start is None or (starts and start <= starts[-1]):
+            return None
+        starts.append(start)
+    return elements, starts
+
+
+def _peel(
+    counts: Counter[str],
+    edges: dict[str, Counter[str]],
+    kept: set[str],
+    names: set[str],
+) -> None:
+    """Drop the macros among `names` that nothing refers to from `kept`,
+    and then the macros that only those referred to."""
+    unused = deque(name for name in names if name in kept and not counts[name])
+    while unused:
+        name = unused.popleft()
+        if name not in kept:
+            continue
+        kept.remove(name)
+        for ref, count in edges[name].items():
+            counts[ref] -= count
+            if counts[ref] == 0 and ref in kept:
+                unused.append(ref)
+
+
+def _revive(
+    counts: Counter[str],
+    edges: dict[str, Counter[str]],
+    kept: set[str],
+    names: set[str],
+) -> None:
+    """Add to `kept` the defined macros among `names` that something refers
+    to, and then the macros that those refer to."""
+    used = deque(
+        name
+        for name in names
+        if name in edges and name not in kept and counts[name] > 0
+    )
+    while used:
+        name = used.popleft()
+        if name in kept:
+            continue
+        kept.add(name)
+        for ref, count in edges[name].items():
+            counts[ref] += count
+            if ref in edges and ref not in kept:
+                used.append(ref)
+
+
+@dataclass(frozen=True, slots=True)
+class MacroGraph:
+    """The macros of a template and which of them survive pruning.
+
+    Variants differ from their template in a few top-level elements, so the
+    graph is built once per template and updated for each variant from the
+    elements its patch changed. The result is the same as pruning the
+    variant from scratch.
+    """
+
+    # The macro each top-level element defines, if any, and the references
+    # in it, keyed on the index of the line the element starts on
+    elements: dict[int, tuple[str | None, Counter[str]]]
+    # The root element, whose namespaces decide which elements are macros,
+    # and its macro attribute, if any
+    root_tag: str
+    namespaces: dict[str | None, str]
+    root_ref: str
+    # The number of definitions of each macro and the references in them
+    definitions: Counter[str]
+    edges: dict[str, Counter[str]]
+    # The macros that survive pruning, and the references to each macro
+    # from them and from outside macros
+    kept: frozenset[str]
+    counts: Counter[str]
+
+    @classmethod
+    def from_bytes(cls, template: bytes) -> "MacroGraph | None":
+        """Return the graph of a template, or None if it cannot have one."""
+        # XML parsers count a lone CR as a line break, and patches do not
+        if b"\r" in template:
+            return None
+        parser = etree.XMLParser(
+            remove_blank_text=True, resolve_entities=False, no_network=True
+        )
+        try:
+            root = etree.fromstring(template, parser=parser)
+        except etree.XMLSyntaxError:
+            return None
+        # Macros defined below the top level are left to a full prune
+        if (found := _top_level_elements(root)) is None or any(
+            _NESTED_MACROS(element) for element in found[0]
+        ):
+            return None
+        lines = template.split(b"\n")
+        elements: dict[int, tuple[str | None, Counter[str]]] = {}
+        definitions: Counter[str] = Counter()
+        edges: dict[str, Counter[str]] = {}
+        counts: Counter[str] = Counter()
+        for element, start in zip(*found):
+            # Only an element that starts its line is known to be the same
+            # element wherever the line is copied to
+            opening = b"<" + element.tag.rpartition("}")[2].encode("utf-8")
+            if not lines[start - 1].lstrip().startswith(opening):
+                return None
+            name, refs = elements[start - 1] = (
+                _macro_name(element),
+                _element_refs(element),
             )
-            logging.error(msg)
-            raise ValueError(msg)
+            if name is None:
+                counts.update(refs)
+            else:
+                definitions[name] += 1
+                edges.setdefault(name, Counter()).update(refs)
+        if root_ref := str(root.attrib.get("macro") or ""):
+            counts[root_ref] += 1
+        for refs in edges.values():
+            counts.update(refs)
+        kept = set(edges)
+        _peel(counts, edges, kept, set(edges))
+        return cls(
+            elements,
+            root.tag,
+            root.nsmap,
+            root_ref,
+            definitions,
+            edges,
+            frozenset(kept),
+            counts,
+        )
+
+    def surviving_macros(
+        self,
+        root: etree._Element,
+        line_map: LineMap,
+        edited: Container[etree._Element] = (),
+    ) -> set[str] | None:
+        """Return the names of the macros of a variant that survive pruning.
+
+        `line_map` records the lines the variant was patched from, and
+        `edited` holds its top-level elements that were changed since it was
+        parsed. Returns None if the variant cannot be compared with the
+        template.
+        """
+        if (
+            not line_map.lines
+            or root.tag != self.root_tag
+            or root.nsmap != self.namespaces
+            or (found := _top_level_elements(root)) is None
+        ):
+            return None
+        elements, starts = found
+        # An element is unchanged if it was copied from the template along
+        # with the line the next element starts on
+        origins = line_map.origins(
+            zip((start - 1 for start in starts), [*starts[1:], line_map.lines])
+        )
+        unchanged: set[int] = set()
+        changes: list[tuple[str | None, Counter[str], int]] = []
+        for element, origin in zip(elements, origins):
+            if origin in self.elements and element not in edited:
+                unchanged.add(origin)
+                continue
+            if _NESTED_MACROS(element):
+                return None
+            changes.append((_macro_name(element), _element_refs(element), 1))
+        for origin, (name, refs) in self.elements.items():
+            if origin not in unchanged:
+                changes.append((name, refs, -1))
+
+        counts = self.counts.copy()
+        definitions = self.definitions.copy()
+        edges = dict(self.edges)
+        kept = set(self.kept)
+        # Names whose counts may have changed either way
+        touched: set[str] = set()
+        # The references in the changed macros, as they are in the variant
+        changed: dict[str, Counter[str]] = {}
+        for name, refs, sign in changes:
+            touched.update(refs)
+            if name is None:
+                target = counts
+            elif (target := changed.get(name)) is None:
+                target = changed[name] = Counter(edges.get(name, ()))
+            if sign > 0:
+                target.update(refs)
+            else:
+                target.subtract(refs)
+            if name is not None:
+                definitions[name] += sign
+        if (root_ref := str(root.attrib.get("macro") or "")) != self.root_ref:
+            for ref, sign in ((self.root_ref, -1), (root_ref, 1)):
+                if ref:
+                    counts[ref] += sign
+                    touched.add(ref)
+
+        # Changed macros are kept until they are found to be unused
+        for name, refs in changed.items():
+            touched.add(name)
+            touched.update(edges.get(name, ()))
+            if name in kept:
+                counts.subtract(edges[name])
+                kept.remove(name)
+            if definitions[name] > 0:
+                edges[name] = +refs
+                counts.update(edges[name])
+                touched.update(edges[name])
+                kept.add(name)
+            else:
+                edges.pop(name, None)
+        _revive(counts, edges, kept, touched)
+        _peel(counts, edges, kept, touched)
+        return kept
+
+
+def prune_file(input_path: Path, output_path: Path) -> bool:
+    """Prune the style at `input_path` into `output_path`.
+
+    Returns whether any macros or terms were pruned.
+    """
+    pruner = CSLPruner(input_path, output_path)
+    pruner.parse_xml()
+    # Inline trivial macro-only layouts so wrapper macros become removable
+    pruner.flatten_layout_macros()
+    pruner.prune_macros()
+    pruner.prune_locale_terms()
+    pruner.save()
+    return pruner.modified
 
 
 def main() -> int:
@@ -338,14 +1006,8 @@ def main() -> int:
     )
     args: argparse.Namespace = parser.parse_args()
 
-    pruner = CSLPruner(args.input_path, args.output_path)
     try:
-        pruner.parse_xml()
-        # Inline trivial macro-only layouts so wrapper macros become removable
-        pruner.flatten_layout_macros()
-        pruner.prune_macros()
-        pruner.save()
-        if pruner.modified:
+        if prune_file(args.input_path, args.output_path):
             logging.info(f"Pruned {args.output_path}")
         else:
             logging.info(f"No macros pruned in {args.input_path}")
@@ -0,0 +1,161 @@
+"""
+Measure the stages of each build task and aggregate them per family.
+"""
+
+import json
+import math
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+@dataclass(slots=True)
+class TaskTimings:
+    """Wall and CPU seconds per stage of one task, and the bytes it handled.
+
+    CPU time is measured for the calling thread, so it stays meaningful when
+    tasks run in threads rather than processes.
+    """
+
+    # Stage name -> [wall seconds, CPU seconds], in the order of execution
+    stages: dict[str, list[float]] = field(default_factory=dict)
+    sizes: dict[str, int] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            totals = self.stages.setdefault(name, [0.0, 0.0])
+            totals[0] += time.perf_counter() - wall_start
+            totals[1] += time.thread_time() - cpu_start
+
+    @property
+    def wall(self) -> float:
+        return sum(wall for wall, _ in self.stages.values())
+
+    @property
+    def cpu(self) -> float:
+        return sum(cpu for _, cpu in self.stages.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "wall": _round(self.wall),
+            "cpu": _round(self.cpu),
+            "stages": {
+                name: {"wall": _round(wall), "cpu": _round(cpu)}
+                for name, (wall, cpu) in self.stages.items()
+            },
+            "bytes": dict(self.sizes),
+        }
+
+
+@dataclass(slots=True)
+class TimingReport:
+    """The timings of all measured tasks of a run, grouped by style family."""
+
+    families: dict[str, dict[str, TaskTimings]] = field(default_factory=dict)
+    # Number of variants per family that were restored from the cache
+    cached: dict[str, int] = field(default_factory=dict)
+
+    def add(self, style_family: str, name: str, timings: TaskTimings) -> None:
+        self.families.setdefault(style_family, {})[name] = timings
+
+    def add_cached(self, style_family: str) -> None:
+        self.cached[style_family] = self.cached.get(style_family, 0) + 1
+
+    def to_dict(self) -> dict:
+        families = sorted(self.families.keys() | self.cached.keys())
+        return {
+            "variants": {
+                f"{family}/{name}": timings.to_dict()
+                for family in families
+                for name, timings in sorted(
+                    self.families.get(family, {}).items()
+                )
+            },
+            "families": {
+                family: _summarize(
+                    list(self.families.get(family, {}).values()),
+                    self.cached.get(family, 0),
+                )
+                for family in families
+            },
+            "total": _summarize(
+                [
+                    timings
+                    for variants in self.families.values()
+                    for timings in variants.values()
+                ],
+                sum(self.cached.values()),
+            ),
+        }
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(self.to_dict(), indent=2) + "\n", encoding="utf-8"
+        )
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Return the nearest-rank `q`th percentile of `values` (0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def _round(seconds: float) -> float:
+    return round(seconds, 6)
+
+
+def _statistics(values: list[float]) -> dict[str, float]:
+    return {
+        "total": _round(sum(values)),
+        "p50": _round(percentile(values, 50)),
+        "p95": _round(percentile(values, 95)),
+    }
+
+
+def _summarize(timings: list[TaskTimings], cached: int) -> dict:
+    stage_names = list(
+        dict.fromkeys(name for task in timings for name in task.stages)
+    )
+    size_names = list(
+        dict.fromkeys(name for task in timings for name in task.sizes)
+    )
+    return {
+        "count": len(timings),
+        "cached": cached,
+        "wall": _statistics([task.wall for task in timings]),
+        "cpu": _statistics([task.cpu for task in timings]),
+        "stages": {
+            name: {
+                "wall": _statistics(
+                    [
+                        task.stages[name][0]
+                        for task in timings
+                        if name in task.stages
+                    ]
+                ),
+                "cpu": _statistics(
+                    [
+                        task.stages[name][1]
+                        for task in timings
+                        if name in task.stages
+                    ]
+                ),
+            }
+            for name in stage_names
+        },
+        "bytes": {
+            name: sum(task.sizes.get(name, 0) for task in timings)
+            for name in size_names
+        },
+    }
@@ -0,0 +1,93 @@
+"""
+Watch template, diff and development directories for changes.
+"""
+
+import os
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+POLL_INTERVAL = 0.1
+DEFAULT_DEBOUNCE = 0.2
+
+
+@dataclass(slots=True)
+class DirectoryWatcher:
+    """Detect created, modified and deleted files by polling directories.
+
+    Each directory is paired with the file suffix of interest. Files are
+    compared by modification time and size, which costs one stat per file and
+    poll and needs no platform-specific notification API.
+    """
+
+    directories: list[tuple[Path, str]]
+    snapshot: dict[Path, tuple[int, int]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.snapshot = self._take_snapshot()
+
+    def _take_snapshot(self) -> dict[Path, tuple[int, int]]:
+        snapshot: dict[Path, tuple[int, int]] = {}
+        for directory, suffix in self.directories:
+            try:
+                scanner = os.scandir(directory)
+            except FileNotFoundError:
+                continue
+            with scanner:
+                for entry in scanner:
+                    if not entry.name.endswith(suffix):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    snapshot[directory / entry.name] = (
+                        stat.st_mtime_ns,
+                        stat.st_size,
+                    )
+        return snapshot
+
+    def poll(self) -> set[Path]:
+        """Return the files that changed since the previous poll."""
+        current = self._take_snapshot()
+        changed = {
+            path
+            for path in current.keys() | self.snapshot.keys()
+            if current.get(path) != self.snapshot.get(path)
+        }
+        self.snapshot = current
+        return changed
+
+    def wait_for_changes(
+        self,
+        debounce: float = DEFAULT_DEBOUNCE,
+        poll_interval: float = POLL_INTERVAL,
+    ) -> set[Path]:
+        """Block until files change, then until they stay unchanged for `debounce` seconds.
+
+        A burst of saves, such as an editor writing several files, is returned
+        as a single set of changes.
+        """
+        changed: set[Path] = set()
+        last_change = 0.0
+        while True:
+            if new_changes := self.poll():
+                changed |= new_changes
+                last_change = time.monotonic()
+            elif changed and time.monotonic() - last_change >= debounce:
+                return changed
+            time.sleep(poll_interval)
+
+
+def watch(
+    watcher: DirectoryWatcher,
+    on_change: Callable[[set[Path]], None],
+    debounce: float = DEFAULT_DEBOUNCE,
+) -> None:
+    """Call `on_change` with every debounced batch of changes until interrupted."""
+    try:
+        while True:
+            on_change(watcher.wait_for_changes(debounce))
+    except KeyboardInterrupt:
+        return
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import pytest
+
+TEMPLATE = """<style xmlns="http://purl.org/net/xbiblio/csl">
+<macro name="foo"/>
+</style>
+"""
+
+# Adds a macro that nothing uses, so the variant prunes back to the template
+DIFF = """--- a/template.csl
++++ b/template.csl
+@@ -1,3 +1,4 @@
+ <style xmlns="http://purl.org/net/xbiblio/csl">
+ <macro name="foo"/>
++<macro name="bar"/>
+ </style>
+"""
+
+
+class StyleTree:
+    """A directory with the templates/ and diffs/ of a build."""
+
+    TEMPLATE = TEMPLATE
+    DIFF = DIFF
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        (root / "templates").mkdir()
+        (root / "diffs").mkdir()
+
+    def add_template(self, family: str, text: str = TEMPLATE) -> Path:
+        path = self.root / "templates" / f"{family}-template.csl"
+        path.write_text(text)
+        return path
+
+    def add_diff(self, name: str, text: str = DIFF) -> Path:
+        path = self.root / "diffs" / f"{name}.diff"
+        path.write_text(text)
+        return path
+
+
+@pytest.fixture
+def style_tree(tmp_path: Path) -> StyleTree:
+    return StyleTree(tmp_path)
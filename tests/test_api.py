@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from style_variant_builder.api import (
+    ERROR,
+    INFO,
+    WARNING,
+    build_variant,
+    prune_style,
+)
+
+TEMPLATE = b"""<?xml version="1.0" encoding="utf-8"?>
+<style xmlns="http://purl.org/net/xbiblio/csl">
+  <macro name="author"><text variable="author"/></macro>
+  <macro name="title"><text variable="title"/></macro>
+  <citation>
+    <layout>
+      <text macro="author"/>
+    </layout>
+  </citation>
+</style>
+"""
+
+DIFF = b"""--- a/template.csl
++++ b/template.csl
+@@ -6,5 +6,6 @@
+     <layout>
+       <text macro="author"/>
++      <text macro="title"/>
+     </layout>
+   </citation>
+ </style>
+"""
+
+
+def test_build_variant_prunes_in_memory():
+    result = build_variant(TEMPLATE, b"")
+    assert not result.ok
+    assert result.errors[0].stage == "patch"
+
+    result = build_variant(TEMPLATE, DIFF)
+    assert result.ok and result.diagnostics == ()
+    assert b'<text macro="title"/>' in result.data
+    assert b"generated by the Style Variant Builder" in result.data
+
+
+def test_build_variant_development_output_is_the_patched_style():
+    result = build_variant(TEMPLATE, DIFF, development=True)
+    assert result.data == TEMPLATE.replace(
+        b'      <text macro="author"/>\n',
+        b'      <text macro="author"/>\n      <text macro="title"/>\n',
+    )
+
+
+def test_build_variant_reports_offsets_and_pruning():
+    # An unused macro before the hunk moves it down by one line
+    shifted = TEMPLATE.replace(
+        b'  <macro name="author">',
+        b'  <macro name="unused"/>\n  <macro name="author">',
+    )
+    result = build_variant(shifted, DIFF)
+    assert result.ok
+    assert [(d.severity, d.stage) for d in result.diagnostics] == [
+        (WARNING, "patch"),
+        (INFO, "prune"),
+    ]
+    assert "offset 1 line" in result.diagnostics[0].message
+    assert result.diagnostics[1].message == "Removed 1 unused macro"
+
+
+def test_build_variant_inlines_macros():
+    result = build_variant(TEMPLATE, DIFF, inline_macros=True)
+    assert result.ok
+    assert b"<macro" not in result.data
+    assert b'<text variable="title"/>' in result.data
+    assert [d.message for d in result.diagnostics] == ["Inlined 2 macro calls"]
+    assert prune_style(result.data, inline_macros=True).diagnostics == ()
+
+
+def test_prune_style_merges_macros():
+    # "title" renders the author too, and is called as well
+    style = TEMPLATE.replace(b'"title"/></macro>', b'"author"/></macro>').replace(
+        b"</layout>", b'<text macro="title"/></layout>'
+    )
+    result = prune_style(style, merge_macros=True)
+    assert result.ok
+    assert b'<macro name="title">' not in result.data
+    assert result.data.count(b'<text macro="author"/>') == 2
+    assert [d.message for d in result.diagnostics] == ["Merged 1 duplicate macro"]
+
+
+def test_prune_style_reports_parse_errors():
+    result = prune_style(b"<style>\n<macro>\n</style>\n")
+    assert not result.ok
+    (error,) = result.diagnostics
+    assert (error.severity, error.stage, error.line) == (ERROR, "parse", 3)
+
+
+def test_build_variant_is_thread_safe():
+    expected = build_variant(TEMPLATE, DIFF)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(
+            executor.map(lambda _: build_variant(TEMPLATE, DIFF), range(32))
+        )
+    assert all(result == expected for result in results)
@@ -0,0 +1,70 @@
+import tarfile
+import zipfile
+
+import pytest
+
+from style_variant_builder.archive import ArchiveError, OutputArchive
+from style_variant_builder.build import BuildScheduler, CSLBuilder
+
+
+def _write(path, completion_order):
+    archive = OutputArchive(path).open()
+    for name in ("a.csl", "b.csl", "c.csl"):
+        archive.expect(name)
+    for name in completion_order:
+        if name == "b.csl":
+            archive.discard(name)
+        else:
+            archive.add(name, name.encode())
+    archive.close()
+
+
+@pytest.mark.parametrize("suffix", [".zip", ".tar", ".tar.gz"])
+def test_archive_is_ordered_and_reproducible(tmp_path, suffix):
+    first, second = tmp_path / f"1{suffix}", tmp_path / f"2{suffix}"
+    _write(first, ["c.csl", "b.csl", "a.csl"])
+    _write(second, ["a.csl", "c.csl", "b.csl"])
+
+    assert first.read_bytes() == second.read_bytes()
+    if suffix == ".zip":
+        with zipfile.ZipFile(first) as archive:
+            assert archive.namelist() == ["a.csl", "c.csl"]
+            assert archive.getinfo("a.csl").date_time == (1980, 1, 1, 0, 0, 0)
+    else:
+        with tarfile.open(first) as archive:
+            assert archive.getnames() == ["a.csl", "c.csl"]
+            assert archive.extractfile("c.csl").read() == b"c.csl"
+
+
+def test_unknown_archive_type(tmp_path):
+    with pytest.raises(ArchiveError, match="Unsupported archive type"):
+        OutputArchive(tmp_path / "out.rar").open()
+
+
+def test_build_into_archive(style_tree, tmp_path):
+    style_tree.add_template("alpha")
+    for name in ("alpha-two", "alpha-one", "alpha-three"):
+        style_tree.add_diff(name)
+    style_tree.add_diff("alpha-broken", "not a diff")
+    archive = OutputArchive(tmp_path / "out.zip").open()
+    builder = CSLBuilder(
+        templates_dir=tmp_path / "templates",
+        diffs_dir=tmp_path / "diffs",
+        output_dir=tmp_path / "output",
+        development_dir=tmp_path / "development",
+        style_family="alpha",
+        archive=archive,
+    )
+
+    BuildScheduler([builder], max_workers=2).build_variants()
+    archive.close()
+
+    assert (builder.successful_variants, builder.failed_variants) == (3, 1)
+    assert not (tmp_path / "output").exists()
+    with zipfile.ZipFile(tmp_path / "out.zip") as result:
+        assert result.namelist() == [
+            "alpha/alpha-one.csl",
+            "alpha/alpha-three.csl",
+            "alpha/alpha-two.csl",
+        ]
+        assert b'<macro name="bar"/>' not in result.read("alpha/alpha-one.csl")
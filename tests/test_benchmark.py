@@ -0,0 +1,57 @@
+import pytest
+
+from style_variant_builder.benchmark import (
+    CorpusSpec,
+    compare,
+    run_benchmarks,
+    synthetic_template,
+    synthetic_variant,
+    write_synthetic_corpus,
+)
+from style_variant_builder.build import BuildScheduler, CSLBuilder
+
+
+def test_synthetic_variants_drop_chain_calls():
+    template = synthetic_template(CorpusSpec(macros=6, depth=2))
+    variant = synthetic_variant(template, 0)
+
+    assert sum('<text macro="m' in line for line in template) == 7
+    # One in three of the chain calls in the citation layout is dropped
+    assert sum('<text macro="m' in line for line in variant) == 6
+
+
+def test_pruned_synthetic_variants_drop_unused_chains(tmp_path):
+    spec = CorpusSpec(families=1, variants=1, macros=8, depth=2)
+    templates_dir, diffs_dir = write_synthetic_corpus(tmp_path, spec)
+    builder = CSLBuilder(
+        templates_dir=templates_dir,
+        diffs_dir=diffs_dir,
+        output_dir=tmp_path / "output",
+        development_dir=tmp_path / "development",
+        style_family="family0",
+        max_workers=1,
+    )
+    BuildScheduler([builder], max_workers=1).build_variants()
+
+    output = (tmp_path / "output" / "family0" / "family0-variant0.csl").read_text()
+    # The variant drops the call of the chain m4 -> m5
+    for macro in ("m0", "m1", "m2", "m3", "m6", "m7"):
+        assert f'<macro name="{macro}">' in output
+    for macro in ("m4", "m5"):
+        assert f'<macro name="{macro}">' not in output
+
+
+@pytest.mark.slow
+def test_benchmark_smoke():
+    spec = CorpusSpec(families=2, variants=2, macros=8, depth=2)
+
+    results = run_benchmarks(None, None, [spec], repeat=1, max_workers=1)
+
+    assert [result["benchmark"] for result in results["results"]] == [
+        f"{spec.name}/build",
+        f"{spec.name}/development",
+        f"{spec.name}/diffs",
+    ]
+    assert [result["failed"] for result in results["results"]] == [0, 0, 0]
+    assert "prune" in results["results"][0]["stages"]
+    assert len(compare(results, results)) == 3
@@ -1,4 +1,4 @@
-from style_variant_builder.build import CSLBuilder
+from style_variant_builder.build import CSLBuilder, load_template
 
 
 def test_apply_patch_success(tmp_path):
@@ -13,7 +13,7 @@ def test_apply_patch_success(tmp_path):
     output_dir.mkdir()
 
     # Test the static worker method directly
-    diff_name, success, message = CSLBuilder._process_single_diff(
+    result = CSLBuilder._process_single_diff(
         diff_path=diff,
         template_path=template,
         target_output_dir=output_dir,
@@ -21,9 +21,11 @@ def test_apply_patch_success(tmp_path):
         export_development=False,
     )
 
-    assert success is True
-    assert diff_name == "patch.diff"
+    assert result.success is True
+    assert result.name == "patch.diff"
+    assert result.status == "created"
     output_file = output_dir / "patch.csl"
+    assert result.output == output_file
     assert output_file.exists()
     patched = output_file.read_text()
     # Check that the new macro was added
@@ -42,7 +44,7 @@ def test_apply_patch_failure(tmp_path):
     output_dir.mkdir()
 
     # Test the static worker method directly
-    diff_name, success, message = CSLBuilder._process_single_diff(
+    result = CSLBuilder._process_single_diff(
         diff_path=diff,
         template_path=template,
         target_output_dir=output_dir,
@@ -50,5 +52,17 @@ def test_apply_patch_failure(tmp_path):
         export_development=False,
     )
 
-    assert success is False
-    assert "Failed to apply patch" in message
+    assert result.success is False
+    assert "Failed to apply patch" in result.message
+
+
+def test_template_is_loaded_once_per_process(tmp_path):
+    template = tmp_path / "template.csl"
+    template.write_bytes(b"<style>\r\n</style>\r\n")
+
+    loaded = load_template(template)
+    assert loaded.lines == [b"<style>\n", b"</style>\n"]
+    assert load_template(template) is loaded
+
+    template.write_bytes(b"<style/>\n")
+    assert load_template(template).lines == [b"<style/>\n"]
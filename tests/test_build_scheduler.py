@@ -0,0 +1,134 @@
+import os
+
+from style_variant_builder.build import BuildScheduler, CSLBuilder
+from style_variant_builder.cache import DiffRecords
+from style_variant_builder.outputs import OutputReport
+from style_variant_builder.telemetry import TimingReport
+
+
+def _builder(tmp_path, family):
+    return CSLBuilder(
+        templates_dir=tmp_path / "templates",
+        diffs_dir=tmp_path / "diffs",
+        output_dir=tmp_path / "output",
+        development_dir=tmp_path / "development",
+        style_family=family,
+        max_workers=2,
+    )
+
+
+def test_scheduler_shares_pool_across_families(style_tree, tmp_path):
+    for family in ("alpha", "beta"):
+        style_tree.add_template(family)
+    style_tree.add_diff("alpha-one")
+    style_tree.add_diff("alpha-two")
+    style_tree.add_diff("beta-one", "not a diff")
+
+    builders = [_builder(tmp_path, "alpha"), _builder(tmp_path, "beta")]
+    BuildScheduler(builders, max_workers=2).build_variants()
+
+    alpha, beta = builders
+    assert (alpha.successful_variants, alpha.failed_variants) == (2, 0)
+    assert (beta.successful_variants, beta.failed_variants) == (0, 1)
+    assert beta.failure_messages[0].startswith("beta/beta-one:")
+    assert (tmp_path / "output" / "alpha" / "alpha-one.csl").exists()
+    assert (tmp_path / "output" / "alpha" / "alpha-two.csl").exists()
+
+
+def test_scheduler_records_skipped_families(tmp_path):
+    builder = _builder(tmp_path, "missing")
+    BuildScheduler([builder]).build_variants()
+
+    assert (builder.successful_variants, builder.failed_variants) == (0, 0)
+    assert builder.failure_messages[0].startswith("missing: Template not found")
+
+
+def test_selected_files_limit_the_build(style_tree, tmp_path):
+    style_tree.add_template("alpha")
+    style_tree.add_diff("alpha-one")
+    style_tree.add_diff("alpha-two")
+
+    builder = _builder(tmp_path, "alpha")
+    builder.selected_files = frozenset({"alpha-two.diff"})
+    BuildScheduler([builder]).build_variants()
+
+    assert builder.successful_variants == 1
+    assert not (tmp_path / "output" / "alpha" / "alpha-one.csl").exists()
+    assert (tmp_path / "output" / "alpha" / "alpha-two.csl").exists()
+
+
+def test_unchanged_outputs_are_not_rewritten(style_tree, tmp_path):
+    style_tree.add_template("alpha")
+    style_tree.add_diff("alpha-one")
+    output = tmp_path / "output" / "alpha" / "alpha-one.csl"
+
+    first = _builder(tmp_path, "alpha")
+    first.report = OutputReport()
+    BuildScheduler([first]).build_variants()
+    os.utime(output, ns=(1, 1))
+
+    second = _builder(tmp_path, "alpha")
+    second.report = OutputReport()
+    BuildScheduler([second]).build_variants()
+
+    assert first.report.to_dict()["created"] == [str(output)]
+    assert second.report.to_dict()["unchanged"] == [str(output)]
+    assert output.stat().st_mtime_ns == 1
+
+
+def test_bounded_window_builds_every_variant(style_tree, tmp_path):
+    for family in ("alpha", "beta"):
+        style_tree.add_template(family)
+        for i in range(5):
+            style_tree.add_diff(f"{family}-{i}")
+
+    builders = [_builder(tmp_path, "alpha"), _builder(tmp_path, "beta")]
+    BuildScheduler(builders, max_workers=2, max_in_flight=1).build_variants()
+
+    assert [b.successful_variants for b in builders] == [5, 5]
+    assert len(list((tmp_path / "output").glob("*/*.csl"))) == 10
+
+
+def test_unchanged_development_files_are_not_diffed(style_tree, tmp_path):
+    (tmp_path / "development").mkdir()
+    style_tree.add_template("alpha")
+    (tmp_path / "development" / "alpha-same.csl").write_text(style_tree.TEMPLATE)
+    changed = tmp_path / "development" / "alpha-changed.csl"
+    changed.write_text(style_tree.TEMPLATE.replace("foo", "bar"))
+    records = DiffRecords(tmp_path / "diffs.json")
+
+    first = _builder(tmp_path, "alpha")
+    first.diff_records = records
+    first.timing_report = TimingReport()
+    BuildScheduler([first]).generate_diffs()
+    second = _builder(tmp_path, "alpha")
+    second.diff_records = records
+    second.timing_report = TimingReport()
+    BuildScheduler([second]).generate_diffs()
+
+    assert (tmp_path / "diffs" / "alpha-changed.diff").exists()
+    assert not (tmp_path / "diffs" / "alpha-same.diff").exists()
+    # Identical files are never sent to a worker, unchanged pairs only once
+    assert first.timing_report.to_dict()["total"]["count"] == 1
+    assert second.timing_report.to_dict()["total"]["count"] == 0
+
+
+def test_check_reports_non_canonical_diffs_without_writing(style_tree, tmp_path):
+    template = style_tree.add_template("alpha")
+    canonical = style_tree.DIFF.replace("a/template.csl", str(template)).replace(
+        "b/template.csl", str(tmp_path / "development" / "alpha-one.csl")
+    )
+    style_tree.add_diff("alpha-one", canonical)
+    # Applies, but with different file names in its header
+    style_tree.add_diff("alpha-two")
+    style_tree.add_diff("alpha-three", "not a diff")
+
+    builder = _builder(tmp_path, "alpha")
+    BuildScheduler([builder]).check_diffs()
+
+    assert (builder.successful_variants, builder.failed_variants) == (1, 2)
+    assert sorted(builder.failure_messages)[1].startswith(
+        "alpha/alpha-two: Diff is not canonical"
+    )
+    assert not (tmp_path / "output").exists()
+    assert not (tmp_path / "development").exists()
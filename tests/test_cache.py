@@ -0,0 +1,53 @@
+import os
+
+from style_variant_builder.cache import (
+    BuildCache,
+    DiffRecords,
+    cache_key,
+    content_hash,
+)
+
+
+def test_cache_key_depends_on_every_input():
+    key = cache_key(b"template", b"diff", "pruned")
+    assert key == cache_key(b"template", b"diff", "pruned")
+    assert key != cache_key(b"template2", b"diff", "pruned")
+    assert key != cache_key(b"template", b"diff2", "pruned")
+    assert key != cache_key(b"template", b"diff", "development")
+    # Part boundaries are unambiguous
+    assert cache_key(b"ab", b"c", "pruned") != cache_key(b"a", b"bc", "pruned")
+
+
+def test_cache_round_trip(tmp_path):
+    cache = BuildCache(tmp_path)
+    assert cache.get("abcdef") is None
+    cache.put("abcdef", b"<style/>")
+    assert cache.get("abcdef") == b"<style/>"
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = BuildCache(tmp_path, max_bytes=10)
+    for age, key in enumerate(["aa01", "bb02", "cc03"]):
+        cache.put(key, b"x" * 5)
+        path = tmp_path / "variants" / key[:2] / key
+        os.utime(path, ns=(age * 10**9, age * 10**9))
+
+    assert cache.evict() == 1
+    assert cache.get("aa01") is None
+    assert cache.get("bb02") == b"x" * 5
+    assert cache.get("cc03") == b"x" * 5
+
+
+def test_diff_records_detect_changed_inputs_and_outputs(tmp_path):
+    diff = tmp_path / "variant.diff"
+    diff.write_bytes(b"diff")
+    records = DiffRecords(tmp_path / "diffs.json")
+    records.update(tmp_path / "variant.csl", "t", "d", content_hash(b"diff"))
+    records.save()
+
+    loaded = DiffRecords.load(tmp_path / "diffs.json")
+    assert loaded.is_current(tmp_path / "variant.csl", "t", "d", diff)
+    assert not loaded.is_current(tmp_path / "variant.csl", "t2", "d", diff)
+    assert not loaded.is_current(tmp_path / "variant.csl", "t", "d2", diff)
+    diff.write_bytes(b"edited")
+    assert not loaded.is_current(tmp_path / "variant.csl", "t", "d", diff)
@@ -0,0 +1,67 @@
+import subprocess
+import sys
+
+from style_variant_builder.changes import git_changed_files, read_changed_files
+
+
+def _git(tmp_path, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        cwd=tmp_path,
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_read_changed_files_skips_blank_lines(tmp_path):
+    listing = tmp_path / "changed.txt"
+    listing.write_text("diffs/a.diff\n\n  templates/b-template.csl \n")
+
+    assert {str(p) for p in read_changed_files(listing)} == {
+        "diffs/a.diff",
+        "templates/b-template.csl",
+    }
+
+
+def test_git_changed_files_includes_untracked(tmp_path):
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "committed.diff").write_text("one")
+    (tmp_path / "untouched.diff").write_text("one")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "initial")
+    (tmp_path / "committed.diff").write_text("two")
+    (tmp_path / "new.diff").write_text("new")
+
+    changed = git_changed_files("HEAD", tmp_path)
+
+    assert {path.name for path in changed} == {"committed.diff", "new.diff"}
+
+
+def test_changed_files_build_only_affected_variants(style_tree, tmp_path):
+    for family in ("alpha", "beta"):
+        style_tree.add_template(family)
+        for name in ("one", "two"):
+            style_tree.add_diff(f"{family}-{name}")
+    (tmp_path / "changed.txt").write_text(
+        "diffs/alpha-one.diff\ntemplates/beta-template.csl\nREADME.md\n"
+    )
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "style_variant_builder.build",
+            "--changed-files",
+            "changed.txt",
+            "--no-cache",
+        ],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert sorted(
+        str(path.relative_to(tmp_path / "output"))
+        for path in (tmp_path / "output").glob("*/*.csl")
+    ) == ["alpha/alpha-one.csl", "beta/beta-one.csl", "beta/beta-two.csl"]
@@ -27,6 +27,8 @@ def test_cli_main_builds_and_errors(tmp_path):
             str(diffs),
             "--output-path",
             str(output),
+            "--cache-dir",
+            str(tmp_path / ".cache"),
         ],
         capture_output=True,
         text=True,
@@ -47,6 +49,8 @@ def test_cli_main_builds_and_errors(tmp_path):
             str(diffs),
             "--output-path",
             str(output),
+            "--cache-dir",
+            str(tmp_path / ".cache"),
         ],
         capture_output=True,
         text=True,
@@ -54,3 +58,42 @@ def test_cli_main_builds_and_errors(tmp_path):
     assert result2.returncode != 0
     combined2 = result2.stdout + result2.stderr
     assert "No template files found" in combined2
+
+
+def _build(root, *options):
+    return subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "style_variant_builder.build",
+            "--templates-path",
+            str(root / "templates"),
+            "--diffs-path",
+            str(root / "diffs"),
+            "--output-path",
+            str(root / "output"),
+            "--no-cache",
+            "--flat-output",
+            *options,
+        ],
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_full_build_removes_orphans_only_when_asked(style_tree, tmp_path):
+    style_tree.add_template("foo")
+    style_tree.add_diff("foo-one")
+    output = tmp_path / "output"
+    output.mkdir()
+    foreign = output / "foreign.csl"
+    foreign.write_text("<style/>\n")
+
+    assert _build(tmp_path).returncode == 0
+    assert (output / "foo-one.csl").exists()
+    assert foreign.exists()
+
+    result = _build(tmp_path, "--remove-orphans")
+    assert result.returncode == 0
+    assert (output / "foo-one.csl").exists()
+    assert not foreign.exists()
@@ -0,0 +1,48 @@
+import logging
+import threading
+
+import pytest
+
+from style_variant_builder.client import DaemonError, request
+from style_variant_builder.daemon import BuildDaemon
+from style_variant_builder.executors import SerialExecutor
+
+
+@pytest.fixture
+def daemon(style_tree, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    style_tree.add_template("alpha")
+    style_tree.add_diff("alpha-one")
+    server = BuildDaemon(tmp_path / "daemon.sock", SerialExecutor())
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield tmp_path / "daemon.sock"
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def test_daemon_builds_and_picks_up_new_files(daemon, style_tree, tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    assert request(daemon, ["--no-cache"]) == 0
+    assert (tmp_path / "output" / "alpha" / "alpha-one.csl").exists()
+
+    style_tree.add_diff("alpha-two")
+    assert request(daemon, ["--no-cache"]) == 0
+    assert (tmp_path / "output" / "alpha" / "alpha-two.csl").exists()
+
+    (tmp_path / "input.csl").write_text(style_tree.TEMPLATE)
+    assert request(daemon, ["prune", "input.csl", "pruned.csl"]) == 0
+    assert "<macro" not in (tmp_path / "pruned.csl").read_text()
+    assert "Pruned pruned.csl" in caplog.text
+
+
+def test_daemon_reports_bad_requests(daemon, caplog):
+    assert request(daemon, ["--bogus"]) == 2
+    assert "unrecognized arguments: --bogus" in caplog.text
+    assert request(daemon, ["--watch"]) == 2
+
+
+def test_client_without_daemon(tmp_path):
+    with pytest.raises(DaemonError, match="No build daemon"):
+        request(tmp_path / "missing.sock", [])
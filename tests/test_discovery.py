@@ -0,0 +1,63 @@
+import os
+
+from style_variant_builder.discovery import DiscoveryIndex
+
+LINKED_DIFF = """--- templates/foo-template.csl
++++ development/other.csl
+@@ -3,5 +3,5 @@
+   <info>
+-    <link href="http://www.zotero.org/styles/old" rel="template"/>
++    <link href="http://www.zotero.org/styles/foo-notes" rel="template"/>
+   </info>
+"""
+
+
+def test_index_matches_names_and_template_links(tmp_path):
+    (tmp_path / "foo-variant.diff").write_text("")
+    (tmp_path / "other.diff").write_text(LINKED_DIFF)
+    (tmp_path / "unrelated.diff").write_text(LINKED_DIFF.replace("foo", "bar"))
+
+    index = DiscoveryIndex.scan(tmp_path, ".diff")
+
+    assert index.files_for_family("foo") == [
+        tmp_path / "foo-variant.diff",
+        tmp_path / "other.diff",
+    ]
+    # Links on removed lines belong to the template, not the variant
+    assert index.files_for_family("old") == []
+
+
+def test_persisted_index_skips_unchanged_files(tmp_path):
+    diffs = tmp_path / "diffs"
+    diffs.mkdir()
+    persist_path = tmp_path / "cache" / "discovery.json"
+    diff = diffs / "other.diff"
+    diff.write_text(LINKED_DIFF)
+    DiscoveryIndex.scan(diffs, ".diff", persist_path)
+
+    # Same size and modification time: the file is not read again
+    stat = diff.stat()
+    diff.write_text(LINKED_DIFF.replace("foo", "baz"))
+    os.utime(diff, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    index = DiscoveryIndex.scan(diffs, ".diff", persist_path)
+    assert index.files_for_family("foo") == [diff]
+
+    # A changed modification time invalidates the entry
+    os.utime(diff, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    index = DiscoveryIndex.scan(diffs, ".diff", persist_path)
+    assert index.files_for_family("foo") == []
+    assert index.files_for_family("baz") == [diff]
+
+
+def test_resident_index_is_reused_until_files_change(tmp_path):
+    (tmp_path / "foo-one.diff").write_text("")
+    index = DiscoveryIndex.scan(tmp_path, ".diff")
+    assert index.files_for_family("foo") == [tmp_path / "foo-one.diff"]
+
+    assert DiscoveryIndex.scan(tmp_path, ".diff", resident=index) is index
+
+    (tmp_path / "foo-two.diff").write_text("")
+    rescanned = DiscoveryIndex.scan(tmp_path, ".diff", resident=index)
+    assert rescanned is not index
+    assert rescanned.entries["foo-one.diff"] is index.entries["foo-one.diff"]
+    assert len(rescanned.files_for_family("foo")) == 2
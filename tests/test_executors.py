@@ -0,0 +1,47 @@
+import pytest
+
+from style_variant_builder.build import BuildScheduler, CSLBuilder
+from style_variant_builder.executors import (
+    PROCESS,
+    PROCESS_THRESHOLD,
+    SERIAL,
+    THREAD,
+    SerialExecutor,
+    choose_executor,
+)
+
+
+def test_choose_executor():
+    assert choose_executor(1, 100, 10 * PROCESS_THRESHOLD, True) == SERIAL
+    assert choose_executor(4, 1, PROCESS_THRESHOLD) == SERIAL
+    assert choose_executor(4, 10, PROCESS_THRESHOLD // 2) == THREAD
+    assert choose_executor(4, 10, PROCESS_THRESHOLD) == PROCESS
+    assert choose_executor(4, 16, 1000, more_tasks=True) == PROCESS
+
+
+def test_serial_executor_runs_on_submit():
+    calls = []
+    executor = SerialExecutor()
+    future = executor.submit(calls.append, 1)
+    assert calls == [1] and future.done()
+    with pytest.raises(ZeroDivisionError):
+        executor.submit(lambda: 1 / 0).result()
+
+
+@pytest.mark.parametrize("backend", [PROCESS, THREAD, SERIAL])
+def test_backends_build_the_same_variants(style_tree, tmp_path, backend):
+    style_tree.add_template("alpha")
+    style_tree.add_diff("alpha-one")
+    style_tree.add_diff("alpha-two", "not a diff")
+    builder = CSLBuilder(
+        templates_dir=tmp_path / "templates",
+        diffs_dir=tmp_path / "diffs",
+        output_dir=tmp_path / "output",
+        development_dir=tmp_path / "development",
+        style_family="alpha",
+    )
+
+    BuildScheduler([builder], max_workers=2, backend=backend).build_variants()
+
+    assert (builder.successful_variants, builder.failed_variants) == (1, 1)
+    assert (tmp_path / "output" / "alpha" / "alpha-one.csl").exists()
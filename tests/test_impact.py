@@ -0,0 +1,58 @@
+from style_variant_builder.impact import (
+    OFFSET,
+    OVERLAP,
+    UNTOUCHED,
+    HunkIndex,
+    analyse,
+    classify,
+    hunk_ranges,
+)
+
+DIFF = b"""--- a
++++ b
+@@ -10,4 +10,5 @@
+ a
+ b
++c
+ d
+ e
+@@ -30 +31,2 @@
+ x
++y
+"""
+
+
+def test_hunk_ranges_are_read_from_headers():
+    assert hunk_ranges(DIFF) == [(9, 13), (29, 30)]
+
+
+def test_classify_edits_by_position():
+    ranges = [(9, 13), (29, 30)]
+    # Edits after every hunk, or that keep the line count before them
+    assert classify(ranges, [(40, 41, 3)]) == UNTOUCHED
+    assert classify(ranges, [(2, 3, 0)]) == UNTOUCHED
+    # Lines added or removed before a hunk
+    assert classify(ranges, [(20, 20, 2)]) == OFFSET
+    assert classify(ranges, [(8, 9, -1)]) == OFFSET
+    # Changed or inserted lines inside a hunk, or inserted at either end
+    assert classify(ranges, [(12, 13, 0)]) == OVERLAP
+    assert classify(ranges, [(11, 11, 1)]) == OVERLAP
+    assert classify(ranges, [(9, 9, 1)]) == OVERLAP
+    assert classify(ranges, [(13, 13, 1)]) == OVERLAP
+    assert classify(ranges, [(0, 1, -1), (29, 30, 0)]) == OVERLAP
+
+
+def test_analyse_groups_variants_and_caches_ranges(tmp_path):
+    diff = tmp_path / "foo-one.diff"
+    diff.write_bytes(DIFF)
+    template = b"".join(b"line %d\n" % i for i in range(50))
+    edited = template.replace(b"line 20\n", b"line 20\nnew\n")
+    index = HunkIndex(tmp_path / "hunks.json")
+
+    report = analyse("foo", template, edited, [diff], index)
+    index.save()
+
+    assert report.edits == [(21, 21, 1)]
+    assert report.affected() == ["foo-one.diff"]
+    assert HunkIndex.load(tmp_path / "hunks.json").ranges == index.ranges
+    assert analyse("foo", template, template, [diff], index).affected() == []
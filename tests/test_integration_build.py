@@ -27,6 +27,8 @@ def test_full_build_outputs_are_valid(tmp_path):
             str(tmp_path / "diffs"),
             "--output-path",
             str(output_dir),
+            "--cache-dir",
+            str(tmp_path / ".cache"),
         ],
         capture_output=True,
         text=True,
@@ -0,0 +1,73 @@
+import difflib
+import random
+
+from style_variant_builder.linediff import (
+    ENGINES,
+    myers_opcodes,
+    opcodes_from_hunks,
+    unified_diff,
+)
+from style_variant_builder.patch import apply_unified_diff, parse_unified_diff
+
+TEMPLATE = [f"line {i % 7}\n" for i in range(40)]
+
+
+def _variant(seed):
+    rng = random.Random(seed)
+    lines = list(TEMPLATE)
+    for _ in range(rng.randint(0, 6)):
+        i = rng.randrange(len(lines) + 1)
+        if rng.random() < 0.5 and i < len(lines):
+            del lines[i]
+        else:
+            lines.insert(i, rng.choice([f"new {i}\n", lines[i - 1]]))
+    return lines
+
+
+def test_myers_diffs_apply_and_are_minimal():
+    for seed in range(200):
+        variant = _variant(seed)
+        opcodes = myers_opcodes(TEMPLATE, variant)
+        diff = "".join(unified_diff(TEMPLATE, variant, "a", "b", opcodes))
+        if diff:
+            patched = apply_unified_diff(
+                [line.encode() for line in TEMPLATE], diff.encode()
+            )
+            assert patched == [line.encode() for line in variant]
+
+        def changes(codes):
+            return sum(
+                max(i2 - i1, j2 - j1) + min(i2 - i1, j2 - j1)
+                for tag, i1, i2, j1, j2 in codes
+                if tag != "equal"
+            )
+
+        # Myers finds a shortest edit script
+        assert changes(opcodes) <= changes(ENGINES["difflib"](TEMPLATE, variant))
+
+
+def test_unified_diff_matches_difflib_format():
+    variant = _variant(3)
+    opcodes = ENGINES["difflib"](TEMPLATE, variant)
+    assert list(unified_diff(TEMPLATE, variant, "a", "b", opcodes)) == list(
+        difflib.unified_diff(TEMPLATE, variant, "a", "b", lineterm="\n")
+    )
+
+
+def test_existing_hunks_are_reused_only_if_exact():
+    variant = _variant(5)
+    diff = "".join(difflib.unified_diff(TEMPLATE, variant, "a", "b"))
+    hunks = parse_unified_diff(diff.encode())
+
+    opcodes = opcodes_from_hunks(hunks, TEMPLATE, variant)
+    assert "".join(unified_diff(TEMPLATE, variant, "a", "b", opcodes)) == diff
+    assert opcodes_from_hunks(hunks, TEMPLATE, [*variant, "extra\n"]) is None
+    assert opcodes_from_hunks(hunks, ["shifted\n", *TEMPLATE], variant) is None
+
+
+def test_default_engine_matches_difflib():
+    for seed in range(20):
+        variant = _variant(seed)
+        assert list(unified_diff(TEMPLATE, variant, "a", "b")) == list(
+            difflib.unified_diff(TEMPLATE, variant, "a", "b", lineterm="\n")
+        )
@@ -0,0 +1,47 @@
+import json
+import stat
+
+from style_variant_builder.outputs import OutputReport, write_if_changed
+
+
+def test_write_if_changed(tmp_path):
+    path = tmp_path / "variant.csl"
+
+    assert write_if_changed(path, b"one") == "created"
+    assert write_if_changed(path, b"one") == "unchanged"
+    assert write_if_changed(path, b"two") == "changed"
+    assert write_if_changed(path, b"three") == "changed"
+    assert path.read_bytes() == b"three"
+    # Atomic writes keep the permissions of a normally written file
+    assert stat.S_IMODE(path.stat().st_mode) & 0o044
+    assert [p.name for p in tmp_path.iterdir()] == ["variant.csl"]
+
+
+def test_report_removes_orphans(tmp_path):
+    kept = tmp_path / "kept.csl"
+    orphan = tmp_path / "orphan.csl"
+    for path in (kept, orphan, tmp_path / "notes.txt"):
+        path.write_text("")
+    report = OutputReport()
+    report.add("unchanged", kept)
+
+    assert report.remove_orphans({tmp_path}, ".csl", {kept}) == [orphan]
+    assert not orphan.exists()
+    assert (tmp_path / "notes.txt").exists()
+
+    report.write(tmp_path / "report.json")
+    assert json.loads((tmp_path / "report.json").read_text()) == {
+        "created": [],
+        "changed": [],
+        "unchanged": [str(kept)],
+        "deleted": [str(orphan)],
+    }
+
+
+def test_report_counts_without_keeping_paths(tmp_path):
+    report = OutputReport(keep_paths=False)
+    report.add("created", tmp_path / "one.csl")
+    report.add("unchanged", tmp_path / "two.csl")
+
+    assert report.to_dict()["created"] == []
+    assert report.summary() == "1 created, 0 changed, 1 unchanged, 0 deleted"
@@ -0,0 +1,124 @@
+import pytest
+
+from style_variant_builder.patch import (
+    LineMap,
+    PatchError,
+    apply_unified_diff,
+    parse_unified_diff,
+    split_lines,
+)
+
+ORIGINAL = split_lines(b"".join(b"line %d\n" % i for i in range(1, 21)))
+
+DIFF = b"""--- a/file.csl
++++ b/file.csl
+@@ -9,7 +9,7 @@
+ line 9
+ line 10
+ line 11
+-line 12
++changed 12
+ line 13
+ line 14
+ line 15
+"""
+
+
+def test_apply_diff_at_expected_position():
+    patched = apply_unified_diff(ORIGINAL, DIFF)
+    assert patched[11] == b"changed 12\n"
+    assert len(patched) == len(ORIGINAL)
+
+
+def test_apply_diff_with_offset():
+    shifted = [b"extra\n", b"extra\n", *ORIGINAL]
+    notes = []
+    patched = apply_unified_diff(shifted, DIFF, notes=notes)
+    assert patched[13] == b"changed 12\n"
+    assert notes == ["Hunk #1 succeeded at 11 (offset 2 lines)."]
+
+
+def test_line_map_records_copied_lines():
+    shifted = [b"extra\n", b"extra\n", *ORIGINAL]
+    line_map = LineMap()
+    apply_unified_diff(shifted, DIFF, line_map=line_map)
+
+    # Line 12 of the original (index 13 after the extra lines) was replaced
+    assert line_map.copied == [(0, 0, 13), (14, 14, 8)]
+    assert line_map.lines == 22
+    spans = [(0, 13), (5, 12), (12, 14), (13, 14), (15, 22)]
+    assert list(line_map.origins(spans)) == [0, 5, None, None, 15]
+
+
+def test_failed_hunk_reports_like_patch():
+    broken = [line.replace(b"line 12", b"other") for line in ORIGINAL]
+    with pytest.raises(PatchError) as excinfo:
+        apply_unified_diff(broken, DIFF, filename="file.csl")
+    assert str(excinfo.value) == (
+        "patching file file.csl\nHunk #1 FAILED at 9.\n1 out of 1 hunk FAILED"
+    )
+
+
+def test_reversed_patch_is_detected():
+    patched = apply_unified_diff(ORIGINAL, DIFF)
+    with pytest.raises(
+        PatchError, match="Reversed \\(or previously applied\\)"
+    ):
+        apply_unified_diff(patched, DIFF)
+
+
+def test_garbage_input_is_rejected():
+    assert parse_unified_diff(b"this is not a valid diff") == []
+    with pytest.raises(PatchError, match="Only garbage"):
+        apply_unified_diff(ORIGINAL, b"this is not a valid diff")
+
+
+def test_fuzzed_context_may_lie_past_the_end():
+    # Like patch, the trailing context fuzzed away need not exist
+    diff = b"""@@ -16,6 +16,5 @@
+ line 16
+ line 17
+ line 18
+-line 19
+ line 20
+ line 21
+"""
+    notes = []
+    patched = apply_unified_diff(ORIGINAL, diff, notes=notes)
+    assert patched == [line for line in ORIGINAL if line != b"line 19\n"]
+    assert notes == ["Hunk #1 succeeded at 16 with fuzz 2."]
+
+
+def test_fuzzed_context_may_not_lie_before_the_start():
+    diff = b"""@@ -1,5 +1,5 @@
+ line 0
+ line 1
+-line 2
++changed 2
+ line 3
+ line 4
+"""
+    with pytest.raises(PatchError, match="Hunk #1 FAILED at 1."):
+        apply_unified_diff(ORIGINAL, diff)
+
+
+def test_hunk_may_start_in_the_trailing_context_of_the_previous_one():
+    diff = b"""@@ -2,3 +2,4 @@
+ line 2
++new 2
+ line 3
+ line 4
+@@ -4,2 +5,3 @@
+ line 4
++new 4
+ line 5
+"""
+    patched = apply_unified_diff(ORIGINAL, diff)
+    assert patched[1:7] == [
+        b"line 2\n",
+        b"new 2\n",
+        b"line 3\n",
+        b"line 4\n",
+        b"new 4\n",
+        b"line 5\n",
+    ]
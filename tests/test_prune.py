@@ -1,4 +1,10 @@
-from style_variant_builder.prune import CSLPruner, _tag
+import difflib
+
+import pytest
+from lxml import etree
+
+from style_variant_builder.patch import LineMap, apply_unified_diff, split_lines
+from style_variant_builder.prune import NSMAP, CSLPruner, MacroGraph, _tag
 
 EXAMPLE_XML = """<?xml version="1.0"?>
 <style xmlns="http://purl.org/net/xbiblio/csl">
@@ -69,3 +75,387 @@ def test_xml_model_pi_excluded_from_output(tmp_path):
     # Verify the actual content is preserved
     assert "<macro" in output_content
     assert "<citation>" in output_content
+
+
+def test_prune_in_memory():
+    pruner = CSLPruner.from_bytes(EXAMPLE_XML.encode("utf-8"))
+    pruner.prune_macros()
+    data = pruner.to_bytes()
+
+    assert b'name="used-macro"' in data
+    assert b"unused-macro" not in data
+    assert pruner.to_bytes() == data
+
+
+CANONICAL_XML = """<?xml version='1.0' encoding='utf-8'?>
+<style xmlns="http://purl.org/net/xbiblio/csl" default-locale="en-GB" version="1.0">
+  <!-- Example:
+       <group>
+         <text value="a"/>
+       </group>
+  -->
+  <citation><layout><text value="a — b"/></layout></citation>
+</style>
+"""
+
+
+def test_to_bytes_writes_the_canonical_format():
+    pruner = CSLPruner.from_bytes(CANONICAL_XML.encode("utf-8"))
+    pruner.notice_comment = None
+    assert pruner.root is not None
+    before = etree.tostring(pruner.root)
+
+    assert pruner.to_bytes() == (
+        b'<?xml version="1.0" encoding="utf-8"?>\n'
+        b'<style xmlns="http://purl.org/net/xbiblio/csl" version="1.0" '
+        b'default-locale="en-GB">\n'
+        b"  <!-- Example:\n"
+        b'       <group><text value="a"/></group>\n'
+        b"  -->\n"
+        b"  <citation>\n"
+        b"    <layout>\n"
+        b'      <text value="a &#8212; b"/>\n'
+        b"    </layout>\n"
+        b"  </citation>\n"
+        b"</style>\n"
+    )
+    # The tree is left as it was
+    assert etree.tostring(pruner.root) == before
+
+
+CHAINED_XML = """<?xml version="1.0"?>
+<style xmlns="http://purl.org/net/xbiblio/csl">
+  <macro name="chain-1"><text macro="chain-2"/></macro>
+  <macro name="chain-2"><text macro="chain-3"/></macro>
+  <macro name="chain-3"><text value="end"/></macro>
+  <macro name="cycle-1"><text macro="cycle-2"/></macro>
+  <macro name="cycle-2"><text macro="cycle-1"/></macro>
+  <macro name="shared"><text value="shared"/></macro>
+  <macro name="shared"><text macro="chain-3"/></macro>
+  <macro name="dup"><text value="duplicate"/></macro>
+  <macro name="dup"><text value="duplicate"/></macro>
+  <citation>
+    <layout>
+      <text macro="shared"/>
+    </layout>
+  </citation>
+</style>
+"""
+
+
+def test_prune_removes_unused_chains_and_keeps_cycles():
+    pruner = CSLPruner.from_bytes(CHAINED_XML.encode("utf-8"))
+    pruner.prune_macros()
+
+    assert pruner.root is not None
+    macros = [m.get("name") for m in pruner.root.iter(_tag("macro"))]
+    # Macros only used by unused macros go too, but cycles are still
+    # referred to and all definitions of a used name stay
+    assert macros == ["chain-3", "cycle-1", "cycle-2", "shared", "shared"]
+    assert set(pruner.macro_defs) == set(macros)
+    assert pruner.modified
+
+
+INLINE_XML = """<?xml version="1.0" encoding="utf-8"?>
+<style xmlns="http://purl.org/net/xbiblio/csl">
+  <macro name="title"><text variable="title" font-style="italic"/></macro>
+  <macro name="year"><date variable="issued" form="numeric"/></macro>
+  <macro name="author-year">
+    <text macro="author"/>
+    <text macro="year" prefix=" "/>
+  </macro>
+  <macro name="author"><names variable="author"/></macro>
+  <macro name="pages"><group><text variable="page"/></group></macro>
+  <macro name="volume"><text variable="volume"/><text variable="issue"/></macro>
+  <macro name="loop"><text macro="loop"/></macro>
+  <citation>
+    <layout delimiter="; ">
+      <group><text macro="author-year"/></group>
+      <text macro="title" prefix="(" suffix=")"/>
+      <text macro="title" font-style="normal"/>
+      <text macro="volume"/>
+      <group delimiter=", ">
+        <text macro="pages" suffix="."/>
+        <text macro="pages" suffix="."/>
+      </group>
+      <text macro="loop"/>
+    </layout>
+  </citation>
+</style>
+"""
+
+
+def _attributes(parent):
+    return [dict(element.attrib) for element in parent.iterchildren(etree.Element)]
+
+
+def test_inline_macros_inlines_single_use_and_trivial_macros():
+    pruner = CSLPruner.from_bytes(INLINE_XML.encode("utf-8"))
+    assert pruner.inline_macros() == 4
+
+    assert pruner.root is not None
+    layout = pruner.root.find("csl:citation/csl:layout", NSMAP)
+    assert _attributes(layout) == [
+        {},
+        # Trivial, and the affixes of the call move to its element
+        {"variable": "title", "font-style": "italic", "prefix": "(", "suffix": ")"},
+        # The element already sets the formatting of the call
+        {"macro": "title", "font-style": "normal"},
+        # The delimiter of the layout would separate several elements
+        {"macro": "volume"},
+        {"delimiter": ", "},
+        {"macro": "loop"},
+    ]
+    # "author-year" is only called once, and "author" and "year" only by it
+    assert _attributes(layout[0]) == [
+        {"variable": "author"},
+        {"variable": "issued", "form": "numeric", "prefix": " "},
+    ]
+    assert sorted(pruner.macro_defs) == ["loop", "pages", "title", "volume"]
+    assert pruner.modified
+
+
+def test_inline_macros_keeps_choose_out_of_delimited_groups():
+    style = """<?xml version="1.0" encoding="utf-8"?>
+<style xmlns="http://purl.org/net/xbiblio/csl">
+  <macro name="pub">
+    <choose>
+      <if type="book">
+        <text variable="publisher"/>
+        <text variable="publisher-place"/>
+      </if>
+    </choose>
+  </macro>
+  <citation>
+    <layout>
+      <group delimiter=", "><text macro="pub"/></group>
+    </layout>
+  </citation>
+</style>
+"""
+    pruner = CSLPruner.from_bytes(style.encode("utf-8"))
+    # The delimiter would come between the elements of the branch
+    assert pruner.inline_macros() == 0
+
+    pruner = CSLPruner.from_bytes(style.replace(' delimiter=", "', "").encode())
+    assert pruner.inline_macros() == 1
+    assert pruner.root is not None
+    (group,) = pruner.root.iter(_tag("group"))
+    assert [child.tag for child in group] == [_tag("choose")]
+
+
+def test_inline_macros_leaves_nothing_to_inline():
+    pruner = CSLPruner.from_bytes(INLINE_XML.encode("utf-8"))
+    pruner.inline_macros()
+    inlined = pruner.to_bytes()
+    assert pruner.inline_macros() == 0
+    assert pruner.to_bytes() == inlined
+
+
+MERGE_XML = """<?xml version="1.0" encoding="utf-8"?>
+<style xmlns="http://purl.org/net/xbiblio/csl">
+  <macro name="title"><text variable="title" font-style="italic"/></macro>
+  <macro name="title-italic">
+    <!-- The same as "title" -->
+    <text font-style="italic" variable="title"/>
+  </macro>
+  <macro name="title-short"><text macro="title"/></macro>
+  <macro name="title-short-italic"><text macro="title-italic"/></macro>
+  <macro name="edition"><text variable="edition"/></macro>
+  <macro name="edition"><text variable="version"/></macro>
+  <macro name="version"><text variable="edition"/></macro>
+  <citation>
+    <layout>
+      <text macro="title-short"/>
+      <text macro="title-short-italic"/>
+      <text macro="edition"/>
+      <text macro="version"/>
+    </layout>
+  </citation>
+</style>
+"""
+
+
+def test_merge_duplicate_macros_merges_until_no_bodies_are_the_same():
+    pruner = CSLPruner.from_bytes(MERGE_XML.encode("utf-8"))
+    # "title-short-italic" only becomes the same as "title-short" once
+    # "title-italic" is merged into "title"
+    assert pruner.merge_duplicate_macros() == 2
+
+    assert pruner.root is not None
+    layout = pruner.root.find("csl:citation/csl:layout", NSMAP)
+    assert [call.get("macro") for call in layout] == [
+        "title-short",
+        "title-short",
+        "edition",
+        "version",
+    ]
+    # Macros defined more than once are neither merged nor merged into
+    assert [m.get("name") for m in pruner.root.iter(_tag("macro"))] == [
+        "title",
+        "title-short",
+        "edition",
+        "edition",
+        "version",
+    ]
+    assert pruner.modified
+    assert pruner.merge_duplicate_macros() == 0
+
+
+TERMS_XML = """<?xml version="1.0" encoding="utf-8"?>
+<style xmlns="http://purl.org/net/xbiblio/csl">
+  <locale>
+    <terms>
+      <term name="presented at">presented at</term>
+      <term name="available at">available at</term>
+      <term name="editor" form="short">ed.</term>
+      <term name="translator" form="short">trans.</term>
+      <term name="chapter" form="short">ch.</term>
+      <term name="et-al">and others</term>
+      <term name="month-01">Jan.</term>
+    </terms>
+  </locale>
+  <locale xml:lang="de">
+    <terms>
+      <term name="in press">im Druck</term>
+    </terms>
+  </locale>
+  <citation>
+    <layout>
+      <text term="presented at"/>
+      <names variable="author editor"><label form="short"/></names>
+      <label variable="locator"/>
+    </layout>
+  </citation>
+</style>
+"""
+
+
+def test_prune_locale_terms_keeps_used_and_implicit_terms():
+    pruner = CSLPruner.from_bytes(TERMS_XML.encode("utf-8"))
+    assert pruner.prune_locale_terms() == 3
+
+    assert pruner.root is not None
+    assert [term.get("name") for term in pruner.root.iter(_tag("term"))] == [
+        "presented at",
+        # The label of a variable
+        "editor",
+        # The label of a type of locator
+        "chapter",
+        # Used by processors without a reference
+        "et-al",
+        "month-01",
+    ]
+    # The list of terms left empty is removed
+    assert [len(locale) for locale in pruner.root.iter(_tag("locale"))] == [1, 0]
+    assert pruner.modified
+
+
+def test_prune_handles_deeply_nested_styles():
+    depth = 2000
+    body = "<group>" * depth + '<text macro="used"/>' + "</group>" * depth
+    xml = (
+        '<style xmlns="http://purl.org/net/xbiblio/csl">'
+        '<macro name="used"/><macro name="unused"/>'
+        f"<citation><layout>{body}</layout></citation></style>"
+    )
+    pruner = CSLPruner()
+    pruner.tree = etree.ElementTree(
+        etree.fromstring(xml, etree.XMLParser(huge_tree=True))
+    )
+    pruner.root = pruner.tree.getroot()
+    pruner.collect_macro_definitions()
+    pruner.prune_macros()
+
+    assert list(pruner.macro_defs) == ["used"]
+
+
+TEMPLATE_XML = """<?xml version="1.0"?>
+<style xmlns="http://purl.org/net/xbiblio/csl">
+  <info>
+    <title>Template</title>
+  </info>
+  <macro name="author">
+    <text macro="names"/>
+  </macro>
+  <macro name="names">
+    <text variable="author"/>
+  </macro>
+  <macro name="title">
+    <text variable="title"/>
+  </macro>
+  <macro name="note-title">
+    <text macro="title"/>
+  </macro>
+  <macro name="cycle-1">
+    <text macro="cycle-2"/>
+  </macro>
+  <macro name="cycle-2">
+    <text macro="cycle-1"/>
+  </macro>
+  <citation>
+    <layout>
+      <text macro="author"/>
+    </layout>
+  </citation>
+  <bibliography>
+    <layout>
+      <text macro="author"/>
+      <text macro="title"/>
+    </layout>
+  </bibliography>
+</style>
+"""
+
+
+@pytest.mark.parametrize(
+    "edits",
+    [
+        # A new entry point
+        [('<text macro="author"/>', '<text macro="note-title"/>')],
+        # A macro that is no longer used, along with the one it used
+        [('<text macro="names"/>', '<text value="anonymous"/>')],
+        # A renamed macro
+        [('name="title"', 'name="short"'), ('macro="title"', 'macro="short"')],
+        # A new macro, and one that is removed
+        [
+            (
+                "  <citation>",
+                '  <macro name="new">\n    <text macro="cycle-1"/>\n'
+                "  </macro>\n  <citation>",
+            ),
+            ('<text variable="title"/>', '<text macro="new"/>'),
+            ('  <macro name="names">\n    <text variable="author"/>\n', ""),
+            ("  </macro>\n  <macro name=\"title\">", '  <macro name="title">'),
+        ],
+        # A cycle that is broken
+        [('<text macro="cycle-1"/>', "<text/>")],
+    ],
+)
+def test_incremental_prune_matches_full_prune(edits):
+    variant = TEMPLATE_XML
+    for old, new in edits:
+        assert old in variant
+        variant = variant.replace(old, new)
+    diff = "".join(
+        difflib.unified_diff(
+            TEMPLATE_XML.splitlines(True), variant.splitlines(True), "a", "b"
+        )
+    ).encode("utf-8")
+    template = TEMPLATE_XML.encode("utf-8")
+    graph = MacroGraph.from_bytes(template)
+    assert graph is not None
+    line_map = LineMap()
+    patched = b"".join(
+        apply_unified_diff(split_lines(template), diff, line_map=line_map)
+    )
+
+    full = CSLPruner.from_bytes(patched)
+    full.flatten_layout_macros()
+    full.prune_macros()
+    incremental = CSLPruner.from_bytes(patched)
+    incremental.flatten_layout_macros()
+    incremental.prune_macros(graph, line_map)
+
+    assert incremental.to_bytes() == full.to_bytes()
+    assert incremental.macro_defs.keys() == full.macro_defs.keys()
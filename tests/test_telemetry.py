@@ -0,0 +1,51 @@
+from style_variant_builder.telemetry import (
+    TaskTimings,
+    TimingReport,
+    percentile,
+)
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(value) for value in range(1, 21)]
+
+    assert percentile(values, 50) == 10.0
+    assert percentile(values, 95) == 19.0
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_report_aggregates_stages_per_family():
+    report = TimingReport()
+    for name, wall in (("one", 1.0), ("two", 3.0)):
+        timings = TaskTimings(
+            stages={"patch": [wall, wall / 2], "prune": [1.0, 1.0]},
+            sizes={"output": 10},
+        )
+        report.add("alpha", name, timings)
+    report.add_cached("alpha")
+
+    data = report.to_dict()
+
+    assert list(data["variants"]) == ["alpha/one", "alpha/two"]
+    assert data["variants"]["alpha/two"]["wall"] == 4.0
+    family = data["families"]["alpha"]
+    assert (family["count"], family["cached"]) == (2, 1)
+    assert family["stages"]["patch"]["wall"] == {
+        "total": 4.0,
+        "p50": 1.0,
+        "p95": 3.0,
+    }
+    assert family["bytes"] == {"output": 20}
+    assert data["total"] == family
+
+
+def test_stage_accumulates_time_when_the_stage_raises():
+    timings = TaskTimings()
+    try:
+        with timings.stage("patch"):
+            raise ValueError
+    except ValueError:
+        pass
+
+    assert list(timings.stages) == ["patch"]
+    assert timings.wall >= 0
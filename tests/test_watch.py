@@ -0,0 +1,30 @@
+import os
+
+from style_variant_builder.watch import DirectoryWatcher
+
+
+def test_poll_reports_created_modified_and_deleted_files(tmp_path):
+    kept = tmp_path / "kept.diff"
+    removed = tmp_path / "removed.diff"
+    kept.write_text("old")
+    removed.write_text("old")
+    (tmp_path / "ignored.txt").write_text("old")
+    watcher = DirectoryWatcher([(tmp_path, ".diff")])
+
+    assert watcher.poll() == set()
+
+    kept.write_text("new content")
+    os.utime(kept, ns=(1, 1))
+    removed.unlink()
+    created = tmp_path / "created.diff"
+    created.write_text("new")
+    (tmp_path / "ignored.txt").write_text("new content")
+
+    assert watcher.poll() == {kept, removed, created}
+    assert watcher.poll() == set()
+
+
+def test_missing_directories_are_ignored(tmp_path):
+    watcher = DirectoryWatcher([(tmp_path / "missing", ".csl")])
+
+    assert watcher.poll() == set()